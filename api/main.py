@@ -1,13 +1,35 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+# Routers import their services (faiss, models, crawler, boto3) on first use
 from api.routes.crawl import router as crawl_router
 from api.routes.chat import router as chat_router
-from fastapi.middleware.cors import CORSMiddleware
 from api.routes.kb_update import router as kb_update_router
+from api.routes.admin import router as admin_router
+from api.routes.jobs import router as jobs_router
+from api.routes.kb import router as kb_router
+from core.jobs.job_store import fail_interrupted_jobs
+from utils.executors import shutdown_executors
+from utils.metrics import render_metrics
+from utils.startup import startup, startup_mode
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Once per process: only jobs of dead processes, other workers keep theirs
+    fail_interrupted_jobs()
+    # STARTUP_MODE=warm preloads models / hot KBs in the background (see /ready)
+    startup.begin(startup_mode())
+    yield
+    shutdown_executors()
 
-app = FastAPI(title="RAG Headless Backend")
+
+app = FastAPI(title="RAG Headless Backend", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], 
@@ -19,7 +41,22 @@ app.add_middleware(
 app.include_router(crawl_router)
 app.include_router(chat_router)
 app.include_router(kb_update_router)
+app.include_router(kb_router)
+app.include_router(jobs_router)
+app.include_router(admin_router)
 
 @app.get("/health")
-def health():
+async def health():
     return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready():
+    """200 once warm-up has finished (immediately in lazy mode), 503 before / on failure"""
+    return JSONResponse(startup.status(), status_code=200 if startup.ready else 503)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Per-stage latency histograms in the Prometheus text format"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,45 @@
+from fastapi import APIRouter
+from core.kb.catalog import kb_catalog
+
+# RAG subsystems are imported when first queried, not at app start
+router = APIRouter(prefix="/api/admin", tags=["Admin"])
+
+
+@router.get("/cache")
+def cache_stats_api():
+    from core.rag.registry import kb_cache
+    return kb_cache.stats()
+
+
+@router.get("/catalog")
+def catalog_stats_api():
+    """KB catalog size, age and storage lookups for unknown kb_ids"""
+    return kb_catalog.stats()
+
+
+@router.get("/answer-cache")
+def answer_cache_stats_api():
+    """Semantic answer cache hit rate and LLM time saved"""
+    from core.rag.answer_cache import answer_cache
+    return answer_cache.stats()
+
+
+@router.get("/query-embedder")
+def query_embedder_stats_api():
+    """Query embedding LRU hits and micro-batch sizes"""
+    from core.rag.query_embedder import get_query_embedder
+    return get_query_embedder().stats()
+
+
+@router.get("/reranker")
+def reranker_stats_api():
+    """Cross-encoder rerank cost per pair and budget fallbacks"""
+    from core.rag.reranker import get_reranker
+    return get_reranker().stats()
+
+
+@router.get("/memory")
+def memory_stats_api():
+    """Per-KB resident / proportional (shared) bytes in this worker"""
+    from core.rag.registry import kb_cache
+    return kb_cache.memory()
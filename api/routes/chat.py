@@ -1,16 +1,95 @@
-from fastapi import APIRouter, HTTPException
-from schemas.chat import ChatRequest, ChatResponse
-from services.chat_service import ask_question
+import json
+import time
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from schemas.chat import ChatBatchRequest, ChatBatchResponse, ChatRequest, ChatResponse
+from utils.metrics import collect_timings, observe
 
 router = APIRouter(prefix="/api", tags=["Chat"])
 
 
 @router.post("/chat", response_model=ChatResponse)
-def chat_api(req: ChatRequest):
+async def chat_api(req: ChatRequest):
+    # Services (faiss, models, LLM client) are imported on first use
+    from services.chat_service import ask_question_async
+
+    started = time.perf_counter()
     try:
-        answer, sources = ask_question(req.kb_id, req.question)
-        return ChatResponse(answer=answer, sources=sources)
+        with collect_timings() as timings:
+            answer, sources, context = await ask_question_async(req.kb_id, req.question)
+        total = time.perf_counter() - started
+        observe("chat_total", total)
+        timings["total_ms"] = round(total * 1000, 3)
+        return ChatResponse(
+            answer=answer,
+            sources=sources,
+            context=context,
+            timings=timings if req.include_timings else None
+        )
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="KB not found")
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/chat/batch", response_model=ChatBatchResponse)
+async def chat_batch_api(req: ChatBatchRequest):
+    from services.chat_service import ask_questions_batch
+
+    try:
+        results, timings = await ask_questions_batch(
+            [item.model_dump() for item in req.questions],
+            max_concurrency=req.max_concurrency
+        )
+        return ChatBatchResponse(results=results, timings=timings)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _sse(event: dict) -> str:
+    payload = {key: value for key, value in event.items() if key != "type"}
+    return f"event: {event['type']}\ndata: {json.dumps(payload)}\n\n"
+
+
+def _ndjson(event: dict) -> str:
+    return json.dumps(event) + "\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream_api(req: ChatRequest, request: Request, format: str = "sse"):
+    """
+    Stream an answer: a "sources" event as soon as retrieval is done, then
+    "token" events as the LLM produces them, then "done" with timings.
+    ``format`` is "sse" (text/event-stream) or "ndjson".
+    """
+    from services.chat_service import stream_question
+
+    if format not in ("sse", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be 'sse' or 'ndjson'")
+    encode = _sse if format == "sse" else _ndjson
+
+    try:
+        events = await stream_question(req.kb_id, req.question)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="KB not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def body():
+        try:
+            async for event in events:
+                # Stop generating (and paying for tokens) once the client is gone
+                if await request.is_disconnected():
+                    break
+                yield encode(event)
+        except Exception as e:
+            yield encode({"type": "error", "detail": str(e)})
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream" if format == "sse" else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
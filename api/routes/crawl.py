@@ -1,11 +1,33 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
 from schemas.crawl import CrawlRequest, CrawlResponse
-from services.crawl_service import crawl_and_build_kb
+from utils.executors import run_blocking
+from utils.storage_factory import get_storage_backend
+from utils.url_hash import generate_kb_id
 
 router = APIRouter(prefix="/api", tags=["Crawl"])
 
 
 @router.post("/crawl", response_model=CrawlResponse)
-def crawl_website_api(req: CrawlRequest):
-    result = crawl_and_build_kb(req.url)
-    return result
+async def crawl_website_api(req: CrawlRequest, response: Response):
+    # Crawler / indexing stack (playwright, faiss, splitters) loads on first crawl
+    from services.job_service import get_job_manager
+
+    kb_id = generate_kb_id(str(req.url))
+
+    storage = get_storage_backend()
+    if await run_blocking("io", storage.kb_exists, kb_id):
+        return CrawlResponse(
+            status="exists",
+            kb_id=kb_id,
+            message="Knowledge base already exists. Reusing cached data."
+        )
+
+    # Crawl runs as a background job; poll GET /api/jobs/{job_id}
+    job = await run_blocking("io", get_job_manager().submit_crawl, req.url)
+    response.status_code = 202
+    return CrawlResponse(
+        status=job["status"],
+        kb_id=kb_id,
+        job_id=job["id"],
+        message=f"Crawl job accepted. Poll /api/jobs/{job['id']} for progress."
+    )
@@ -0,0 +1,15 @@
+from fastapi import APIRouter, HTTPException
+from schemas.jobs import JobStatusResponse
+from utils.executors import run_blocking
+
+router = APIRouter(prefix="/api", tags=["Jobs"])
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def job_status_api(job_id: str):
+    from services.job_service import get_job_manager, job_status
+
+    job = await run_blocking("io", get_job_manager().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_status(job)
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, HTTPException, Query
+from core.kb.catalog import kb_catalog
+from schemas.kb import KBInfo, KBListResponse
+from utils.executors import run_blocking
+
+router = APIRouter(prefix="/api/kb", tags=["Knowledge Base"])
+
+
+@router.get("", response_model=KBListResponse)
+async def list_kbs_api(offset: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=500)):
+    """Known KBs from the in-process catalog, ordered by kb_id"""
+    total, items = await run_blocking("io", kb_catalog.list, offset, limit)
+    return KBListResponse(total=total, offset=offset, limit=limit, items=items)
+
+
+@router.get("/{kb_id}", response_model=KBInfo)
+async def kb_info_api(kb_id: str):
+    entry = kb_catalog.get(kb_id) or await run_blocking("io", kb_catalog.resolve, kb_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="KB not found")
+    return entry
@@ -1,10 +1,21 @@
 from fastapi import APIRouter
 from schemas.kb_update import KBUpdateRequest, KBUpdateResponse
-from services.crawl_service import update_knowledge_base
+from utils.executors import run_blocking
+from utils.url_hash import generate_kb_id
 
 router = APIRouter(prefix="/api/kb", tags=["Knowledge Base"])
 
 
-@router.post("/update", response_model=KBUpdateResponse)
-def update_kb_api(req: KBUpdateRequest):
-    return update_knowledge_base(req.url)
+@router.post("/update", response_model=KBUpdateResponse, status_code=202)
+async def update_kb_api(req: KBUpdateRequest):
+    from services.job_service import get_job_manager
+
+    # Runs as a background job (coalesced with any crawl of the same KB);
+    # poll GET /api/jobs/{job_id}
+    job = await run_blocking("io", get_job_manager().submit_update, req.url, req.incremental)
+    return KBUpdateResponse(
+        status=job["status"],
+        kb_id=generate_kb_id(str(req.url)),
+        job_id=job["id"],
+        message=f"KB update job accepted. Poll /api/jobs/{job['id']} for progress."
+    )
@@ -0,0 +1,84 @@
+"""
+Recall@k vs. query latency for the KB index types (Flat / HNSW / IVF-PQ).
+
+Uses synthetic clustered vectors (MiniLM-sized by default) so results are
+reproducible without a crawl. Ground truth is exact Flat search.
+
+Usage:
+    python -m benchmarks.ann_benchmark --sizes 10000 100000 --dim 384
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from core.kb.index_factory import INDEX_FLAT, INDEX_HNSW, INDEX_IVFPQ, build_index, search_params
+
+
+def clustered_vectors(n: int, dim: int, clusters: int, rng) -> np.ndarray:
+    centers = rng.normal(size=(clusters, dim)).astype("float32")
+    labels = rng.integers(0, clusters, size=n)
+    vectors = centers[labels] + 0.35 * rng.normal(size=(n, dim)).astype("float32")
+    return vectors.astype("float32")
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def run(index, queries, k, params):
+    latencies = []
+    results = []
+    for query in queries:
+        started = time.perf_counter()
+        _, ids = index.search(query[None, :], k, params=params)
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append(ids[0])
+    return np.array(results), np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 32, 64, 128])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16, 64])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'n':>8} {'index':>7} {'param':>12} {'build s':>8} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8}")
+
+    for n in args.sizes:
+        vectors = clustered_vectors(n + args.queries, args.dim, clusters=max(10, n // 500), rng=rng)
+        base, queries = vectors[:n], vectors[n:]
+        ids = np.arange(n, dtype="int64")
+
+        started = time.perf_counter()
+        flat = build_index(base, ids, INDEX_FLAT)
+        flat_build = time.perf_counter() - started
+        truth, p50, p99 = run(flat, queries, args.k, None)
+        print(f"{n:>8} {'flat':>7} {'-':>12} {flat_build:>8.2f} {1.0:>9.3f} {p50:>8.3f} {p99:>8.3f}")
+
+        sweeps = [
+            (INDEX_HNSW, "efSearch", args.ef_search, lambda index, v: search_params(index, ef_search=v)),
+            (INDEX_IVFPQ, "nprobe", args.nprobe, lambda index, v: search_params(index, nprobe=v)),
+        ]
+        for index_type, name, values, make_params in sweeps:
+            started = time.perf_counter()
+            index = build_index(base, ids, index_type)
+            build_seconds = time.perf_counter() - started
+            for value in values:
+                found, p50, p99 = run(index, queries, args.k, make_params(index, value))
+                label = f"{name}={value}"
+                print(
+                    f"{n:>8} {index_type:>7} {label:>12} {build_seconds:>8.2f} "
+                    f"{recall_at_k(found, truth):>9.3f} {p50:>8.3f} {p99:>8.3f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
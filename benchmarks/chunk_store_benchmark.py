@@ -0,0 +1,118 @@
+"""
+Load time and RSS of pickled metadata.pkl vs. the memory-mapped chunk store.
+
+Writes a synthetic KB (600-char chunks spread over a few thousand source
+URLs) in both formats, then loads each in a fresh interpreter and fetches
+``k`` random chunks the way RAGBot.retrieve does.
+
+Usage:
+    python -m benchmarks.chunk_store_benchmark --chunks 100000
+"""
+
+import argparse
+import json
+import pickle
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from core.kb.chunk_store import ChunkStore
+
+_PROBE = r"""
+import json, pickle, sys, time
+import numpy as np
+
+def rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+
+fmt, path, k = sys.argv[1], sys.argv[2], int(sys.argv[3])
+from core.kb.chunk_store import ChunkStore
+rng = np.random.default_rng(1)
+
+before = rss_kb()
+started = time.perf_counter()
+if fmt == "pickle":
+    with open(path, "rb") as f:
+        data = pickle.load(f)
+    load_s = time.perf_counter() - started
+    row_by_id = {chunk_id: row for row, chunk_id in enumerate(data["ids"])}
+    ids = rng.integers(0, len(data["ids"]), size=k)
+    started = time.perf_counter()
+    hits = [(data["texts"][row_by_id[i]], data["metadatas"][row_by_id[i]]["source"]) for i in ids]
+else:
+    data = ChunkStore.open(path)
+    load_s = time.perf_counter() - started
+    ids = rng.integers(0, len(data), size=k)
+    started = time.perf_counter()
+    hits = [(data.text(row), data.source(row)) for row in data.rows_for_ids(ids)]
+fetch_ms = (time.perf_counter() - started) * 1000
+print(json.dumps({"load_s": load_s, "fetch_ms": fetch_ms, "rss_mb": (rss_kb() - before) / 1024}))
+"""
+
+
+def synthetic_metadata(chunks: int, sources: int, chunk_chars: int, rng) -> dict:
+    words = np.array(["alpha", "beta", "gamma", "delta", "pricing", "support", "service", "contact"])
+    texts = []
+    for _ in range(chunks):
+        text = " ".join(rng.choice(words, size=chunk_chars // 6))
+        texts.append(text[:chunk_chars])
+    source_urls = [f"https://example.com/page/{i}" for i in range(sources)]
+    return {
+        "texts": texts,
+        "metadatas": [{"source": source_urls[i]} for i in rng.integers(0, sources, size=chunks)],
+        "ids": list(range(chunks)),
+    }
+
+
+def probe(fmt: str, path: Path, k: int) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE, fmt, str(path), str(k)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--sources", type=int, default=2000)
+    parser.add_argument("--chunk-chars", type=int, default=600)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    metadata = synthetic_metadata(args.chunks, args.sources, args.chunk_chars, np.random.default_rng(0))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        pickle_path = tmp / "metadata.pkl"
+        with open(pickle_path, "wb") as f:
+            pickle.dump(metadata, f)
+        store_path = tmp / "store"
+        ChunkStore.write_metadata(store_path, metadata)
+
+        pickle_bytes = pickle_path.stat().st_size
+        store_bytes = sum(p.stat().st_size for p in store_path.iterdir())
+        print(f"{args.chunks} chunks | pickle {pickle_bytes / 1e6:.1f} MB | chunk store {store_bytes / 1e6:.1f} MB")
+        print(f"{'format':>12} {'load ms':>9} {'fetch k ms':>11} {'RSS MB':>8}")
+
+        for fmt, path in (("pickle", pickle_path), ("chunk_store", store_path)):
+            runs = [probe(fmt, path, args.k) for _ in range(args.repeats)]
+            print(
+                f"{fmt:>12} "
+                f"{np.median([r['load_s'] for r in runs]) * 1000:>9.1f} "
+                f"{np.median([r['fetch_ms'] for r in runs]):>11.3f} "
+                f"{np.median([r['rss_mb'] for r in runs]):>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Crawler throughput benchmark against a local static-site fixture.
+
+Generates a small site on disk, serves it over HTTP from a background
+thread and reports pages/sec for several browser tab counts (browser
+tier only, http_first=False), then for the HTTP-first tier as a
+separate run. Each row shows how many pages each tier fetched.
+
+Usage:
+    python -m benchmarks.crawl_benchmark --pages 60 --tabs 1 2 4 8
+"""
+
+import argparse
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from core.crawler.playwright_crawler import crawl_website_playwright
+
+LOREM = (
+    "Our consulting team delivers cloud migration, data engineering and "
+    "managed services for enterprises across finance, retail and healthcare. "
+)
+
+
+def build_site(root: Path, num_pages: int, fanout: int = 6) -> None:
+    """Write num_pages HTML files linked as a tree (page i links to its children)"""
+    for i in range(num_pages):
+        children = [c for c in range(i * fanout + 1, i * fanout + fanout + 1) if c < num_pages]
+        links = "".join(f'<li><a href="/page{c}.html">Page {c}</a></li>' for c in children)
+        body = f"<p>{LOREM * 8}</p>" * 2
+        html = (
+            f"<html><head><title>Page {i}</title></head>"
+            f"<body><h1>Page {i}</h1>{body}<ul>{links}</ul></body></html>"
+        )
+        name = "index.html" if i == 0 else f"page{i}.html"
+        (root / name).write_text(html, encoding="utf-8")
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(root: Path) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=str(root)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=60)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--tabs", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--contexts", type=int, default=1)
+    parser.add_argument("--skip-http", action="store_true", help="Only run the browser tab sweep")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        build_site(root, args.pages)
+        server = serve(root)
+        start_url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+        print(f"🧪 Crawling {args.pages}-page fixture at {start_url}")
+        print(f"{'tier':>8} {'tabs':>6} {'pages':>6} {'http':>6} {'browser':>8} {'seconds':>8} {'pages/sec':>10}")
+        runs = [("browser", tabs, False) for tabs in args.tabs]
+        if not args.skip_http:
+            runs.append(("http", args.tabs[-1], True))
+        for tier, tabs, http_first in runs:
+            stats = {}
+            started = time.perf_counter()
+            pages = crawl_website_playwright(
+                start_url,
+                max_pages=args.pages,
+                max_depth=args.depth,
+                stats=stats,
+                tabs=tabs,
+                contexts=args.contexts,
+                http_first=http_first,
+            )
+            elapsed = time.perf_counter() - started
+            print(
+                f"{tier:>8} {tabs:>6} {len(pages):>6} {stats['http']['pages']:>6} "
+                f"{stats['browser']['pages']:>8} {elapsed:>8.2f} {len(pages) / elapsed:>10.2f}"
+            )
+
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Embedding backends on CPU: torch vs. ONNX Runtime (fp32) vs. ONNX int8.
+
+Each backend runs in its own process so model RSS is measured cleanly.
+Reports chunks/sec over crawler-sized chunks, model RSS (after load) and
+peak RSS (after encoding), and checks every backend's embeddings against
+torch: the minimum cosine similarity must reach --tolerance (fp32) or
+--int8-tolerance (int8), else the run exits non-zero.
+
+Usage:
+    python -m benchmarks.embedder_backend_benchmark --chunks 2000 --batch-size 64
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from benchmarks.embedding_benchmark import synthetic_pages
+from core.rag.registry import EMBEDDING_BACKENDS, load_embedder
+from utils.memory import process_memory
+
+
+def corpus(num_chunks: int):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=600, chunk_overlap=100)
+    chunks = []
+    pages = 50
+    while len(chunks) < num_chunks:
+        chunks = [c for text in synthetic_pages(pages) for c in splitter.split_text(text)]
+        pages *= 2
+    return chunks[:num_chunks]
+
+
+def worker(backend: str, num_chunks: int, batch_size: int, output: str) -> None:
+    chunks = corpus(num_chunks)
+    rss_before = process_memory().get("rss_bytes", 0)
+
+    load_started = time.perf_counter()
+    embedder = load_embedder(backend)
+    embedder.encode(["warm up"], show_progress_bar=False)
+    load_seconds = time.perf_counter() - load_started
+    rss_model = process_memory().get("rss_bytes", 0)
+
+    started = time.perf_counter()
+    vectors = np.asarray(
+        embedder.encode(chunks, batch_size=batch_size, show_progress_bar=False),
+        dtype="float32"
+    )
+    elapsed = time.perf_counter() - started
+
+    np.save(output, vectors)
+    print(json.dumps({
+        "load_seconds": load_seconds,
+        "chunks_per_sec": len(chunks) / elapsed,
+        "model_rss_mb": (rss_model - rss_before) / 2 ** 20,
+        "peak_rss_mb": process_memory().get("rss_bytes", 0) / 2 ** 20,
+    }))
+
+
+def min_cosine(a: np.ndarray, b: np.ndarray) -> float:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return float(np.min(np.sum(a * b, axis=1)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backends", nargs="+", default=list(EMBEDDING_BACKENDS))
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--tolerance", type=float, default=0.999, help="Min cosine vs. torch (fp32 backends)")
+    parser.add_argument("--int8-tolerance", type=float, default=0.98, help="Min cosine vs. torch (int8)")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.chunks, args.batch_size, args.output)
+        return
+
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in backends:
+            output = str(Path(tmp) / f"{backend}.npy")
+            proc = subprocess.run(
+                [sys.executable, "-m", "benchmarks.embedder_backend_benchmark",
+                 "--worker", backend, "--output", output,
+                 "--chunks", str(args.chunks), "--batch-size", str(args.batch_size)],
+                capture_output=True, text=True
+            )
+            if proc.returncode != 0:
+                print(f"❌ {backend} failed:\n{proc.stderr.strip()[-2000:]}")
+                continue
+            results[backend] = json.loads(proc.stdout.strip().splitlines()[-1])
+            results[backend]["vectors"] = np.load(output)
+
+    if "torch" not in results:
+        sys.exit("torch backend is required as the reference")
+
+    print(f"🧪 {args.chunks} chunks, batch size {args.batch_size}")
+    print(f"{'backend':>10} {'chunks/sec':>11} {'speedup':>8} {'load s':>7} "
+          f"{'model MB':>9} {'peak MB':>8} {'min cos':>8} {'ok':>4}")
+    reference = results["torch"]
+    failed = False
+    for backend, result in results.items():
+        cosine = min_cosine(result["vectors"], reference["vectors"])
+        tolerance = args.int8_tolerance if backend.endswith("int8") else args.tolerance
+        ok = cosine >= tolerance
+        failed |= not ok
+        print(
+            f"{backend:>10} {result['chunks_per_sec']:>11.1f} "
+            f"{result['chunks_per_sec'] / reference['chunks_per_sec']:>7.2f}x "
+            f"{result['load_seconds']:>7.2f} {result['model_rss_mb']:>9.1f} "
+            f"{result['peak_rss_mb']:>8.1f} {cosine:>8.5f} {'✅' if ok else '❌':>4}"
+        )
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
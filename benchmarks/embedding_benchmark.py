@@ -0,0 +1,78 @@
+"""
+Embedding throughput: per-page encode calls vs. the batched pipeline.
+
+Builds a synthetic corpus of pages with skewed lengths (many short pages,
+a few long ones), chunks it like the crawl service does, then measures
+chunks/sec for
+  - per-page: one embedder.encode(chunks) call per page (old path)
+  - batched:  EmbeddingPipeline with cross-page, length-sorted batches
+
+The embedding cache is bypassed so every chunk is really encoded.
+
+Usage:
+    python -m benchmarks.embedding_benchmark --pages 200 --batch-sizes 32 64 128
+"""
+
+import argparse
+import random
+import time
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from core.kb.embed_pipeline import EmbeddingPipeline
+from core.rag.registry import get_embedder
+
+WORDS = (
+    "cloud data platform migration analytics services customers pricing "
+    "support team engineering security compliance integration solutions "
+    "managed enterprise retail finance healthcare product delivery"
+).split()
+
+
+def synthetic_pages(num_pages: int, seed: int = 7):
+    rng = random.Random(seed)
+    pages = []
+    for _ in range(num_pages):
+        # Heavy-tailed: most pages are short, a few are long docs
+        words = int(min(4000, 80 + rng.paretovariate(1.2) * 60))
+        pages.append(" ".join(rng.choice(WORDS) for _ in range(words)))
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[32, 64, 128])
+    args = parser.parse_args()
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=600, chunk_overlap=100)
+    page_chunks = [splitter.split_text(text) for text in synthetic_pages(args.pages)]
+    total_chunks = sum(len(chunks) for chunks in page_chunks)
+
+    embedder = get_embedder()
+    embedder.encode(["warm up"], show_progress_bar=False)
+
+    print(f"🧪 {args.pages} pages, {total_chunks} chunks")
+    print(f"{'path':>16} {'seconds':>8} {'chunks/sec':>11}")
+
+    started = time.perf_counter()
+    for chunks in page_chunks:
+        if chunks:
+            embedder.encode(chunks, show_progress_bar=False)
+    elapsed = time.perf_counter() - started
+    print(f"{'per-page':>16} {elapsed:>8.2f} {total_chunks / elapsed:>11.1f}")
+
+    for batch_size in args.batch_sizes:
+        started = time.perf_counter()
+        pipeline = EmbeddingPipeline(embedder, on_batch=lambda vectors, payloads: None, batch_size=batch_size)
+        for chunks in page_chunks:
+            if chunks:
+                pipeline.add(chunks, [None] * len(chunks))
+        pipeline.close()
+        elapsed = time.perf_counter() - started
+        label = f"batched({batch_size})"
+        print(f"{label:>16} {elapsed:>8.2f} {total_chunks / elapsed:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Query embedding under concurrent load: direct encode vs. the shared
+QueryEmbedder (micro-batching, LRU disabled so every query is encoded).
+
+Each of N concurrent callers issues --requests unique queries back to back;
+reports throughput and per-call p50 / p99 latency for N in --concurrency.
+
+Usage:
+    python -m benchmarks.query_embed_benchmark --concurrency 1 8 64 --window-ms 3
+"""
+
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from core.rag.query_embedder import QueryEmbedder
+from core.rag.registry import get_embedder
+
+WORDS = (
+    "what services pricing support contact team cloud migration security "
+    "do you offer how much does cost where is the office hours plans"
+).split()
+
+
+def queries(count: int, seed: int):
+    rng = np.random.default_rng(seed)
+    return [" ".join(rng.choice(WORDS, size=rng.integers(4, 12))) + f" #{seed}-{i}" for i in range(count)]
+
+
+def run(encode, concurrency: int, requests: int):
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(concurrency + 1)
+
+    def caller(seed: int):
+        own = []
+        barrier.wait()
+        for query in queries(requests, seed):
+            started = time.perf_counter()
+            encode([query])
+            own.append((time.perf_counter() - started) * 1000)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=caller, args=(seed,)) for seed in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return len(latencies) / elapsed, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--requests", type=int, default=50, help="Queries per caller")
+    parser.add_argument("--window-ms", type=float, default=3.0)
+    parser.add_argument("--max-batch", type=int, default=64)
+    args = parser.parse_args()
+
+    embedder = get_embedder()
+    embedder.encode(["warm up"], show_progress_bar=False)
+
+    def direct(texts):
+        return embedder.encode(texts, show_progress_bar=False)
+
+    print(f"{'callers':>8} {'mode':>8} {'queries/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'avg batch':>10}")
+    for concurrency in args.concurrency:
+        throughput, p50, p99 = run(direct, concurrency, args.requests)
+        print(f"{concurrency:>8} {'direct':>8} {throughput:>10.1f} {p50:>8.2f} {p99:>8.2f} {1:>10.1f}")
+
+        service = QueryEmbedder(embedder, max_entries=0, window_ms=args.window_ms, max_batch=args.max_batch)
+        throughput, p50, p99 = run(service.encode, concurrency, args.requests)
+        avg_batch = service.stats()["avg_batch_size"]
+        print(f"{concurrency:>8} {'batched':>8} {throughput:>10.1f} {p50:>8.2f} {p99:>8.2f} {avg_batch:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
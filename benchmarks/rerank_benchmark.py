@@ -0,0 +1,56 @@
+"""
+Cross-encoder rerank cost on CPU per candidate count.
+
+Scores one query against N synthetic ~600-char chunks (the crawler's
+chunk size) and reports p50 / p95 latency and cost per candidate, i.e.
+what RERANK_CANDIDATES costs against RERANK_BUDGET_MS.
+
+Usage:
+    python -m benchmarks.rerank_benchmark --candidates 10 20 30 50 100 --batch-size 32
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from core.rag.registry import RERANK_MODEL_NAME, get_cross_encoder
+
+WORDS = (
+    "our team delivers cloud migration security audits managed services "
+    "pricing plans support hours contact office enterprise customers data "
+    "platform integration consulting training onboarding compliance"
+).split()
+
+
+def passages(count: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    return [" ".join(rng.choice(WORDS, size=90))[:600] for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--candidates", type=int, nargs="+", default=[10, 20, 30, 50, 100])
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    model = get_cross_encoder()
+    query = "what does a cloud migration cost for enterprise customers"
+    model.predict([(query, "warm up")], show_progress_bar=False)
+
+    print(f"model: {RERANK_MODEL_NAME}, batch size {args.batch_size}")
+    print(f"{'candidates':>10} {'p50 ms':>8} {'p95 ms':>8} {'ms/cand':>8}")
+    for count in args.candidates:
+        pairs = [(query, passage) for passage in passages(count)]
+        latencies = []
+        for _ in range(args.repeats):
+            started = time.perf_counter()
+            model.predict(pairs, batch_size=args.batch_size, show_progress_bar=False)
+            latencies.append((time.perf_counter() - started) * 1000)
+        p50 = np.percentile(latencies, 50)
+        print(f"{count:>10} {p50:>8.2f} {np.percentile(latencies, 95):>8.2f} {p50 / count:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Cold start per STARTUP_MODE: lazy vs. warm.
+
+For each mode, measures in fresh processes:
+- import time of ``api.main``
+- process start -> /health answering, and -> /ready (warm-up done)
+- first /api/chat/stream request for --kb-id: time to the "sources"
+  event (retrieval) and to "done" (answer), and the same measured from
+  process start (time-to-first-answer).
+
+Warm mode preloads --kb-id (WARM_KB_IDS), and the request is sent once
+/ready reports ready. Lazy mode sends it right after /health, so its
+latency includes imports and model / KB loading. Answers need
+GROQ_API_KEY; without it only the retrieval timings are meaningful.
+
+Usage:
+    python -m benchmarks.startup_benchmark --kb-id example_com --question "What do you offer?"
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+MODES = ("lazy", "warm")
+
+
+def import_seconds() -> float:
+    code = "import time; t = time.perf_counter(); import api.main; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def wait_for(url: str, started: float, timeout: float, accept=(200,)) -> float:
+    """Seconds from ``started`` until ``url`` answers with an accepted status"""
+    deadline = started + timeout
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                if response.status in accept:
+                    return time.perf_counter() - started
+        except urllib.error.HTTPError as e:
+            if e.code in accept:
+                return time.perf_counter() - started
+            if e.code == 503 and json.loads(e.read() or b"{}").get("status") == "failed":
+                raise RuntimeError(f"warm-up failed: {url}")
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(f"{url} not up after {timeout}s")
+
+
+def first_answer(base: str, kb_id: str, question: str):
+    """(ms to sources event, ms to done event or None, error or None)"""
+    request = urllib.request.Request(
+        f"{base}/api/chat/stream?format=ndjson",
+        data=json.dumps({"kb_id": kb_id, "question": question}).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    started = time.perf_counter()
+    sources_ms = None
+    try:
+        response = urllib.request.urlopen(request, timeout=300)
+    except urllib.error.HTTPError as e:
+        return None, None, f"HTTP {e.code}: {e.read()[:200].decode('utf-8', 'replace')}"
+    with response:
+        for line in response:
+            event = json.loads(line)
+            elapsed = (time.perf_counter() - started) * 1000
+            if event["type"] == "sources" and sources_ms is None:
+                sources_ms = elapsed
+            elif event["type"] == "done":
+                return sources_ms, elapsed, None
+            elif event["type"] == "error":
+                return sources_ms, None, event.get("detail")
+    return sources_ms, None, "stream ended without done"
+
+
+def run_mode(mode: str, args) -> dict:
+    env = dict(os.environ, STARTUP_MODE=mode, WARM_KB_IDS=args.kb_id)
+    base = f"http://127.0.0.1:{args.port}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--port", str(args.port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        result = {"mode": mode, "health_s": wait_for(f"{base}/health", started, args.timeout)}
+        try:
+            result["ready_s"] = wait_for(f"{base}/ready", started, args.timeout)
+        except RuntimeError as e:
+            return dict(result, ready_s=None, sources_ms=None, answer_ms=None, first_answer_s=None, error=str(e))
+        request_started = time.perf_counter() - started
+        sources_ms, answer_ms, error = first_answer(base, args.kb_id, args.question)
+        result.update(
+            sources_ms=sources_ms,
+            answer_ms=answer_ms,
+            first_answer_s=(request_started + answer_ms / 1000) if answer_ms is not None else None,
+            error=error,
+        )
+        return result
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def fmt(value, spec: str) -> str:
+    # "-" for missing values, aligned like the numbers
+    return format(value, spec) if value is not None else format("-", spec.split(".")[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--kb-id", required=True, help="Existing KB to query (and preload in warm mode)")
+    parser.add_argument("--question", default="What is this website about?")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    print(f"🧪 import api.main: {import_seconds():.3f}s")
+    print(f"{'mode':>5} {'health s':>9} {'ready s':>8} {'sources ms':>11} {'answer ms':>10} {'1st answer s':>13}")
+    for mode in args.modes:
+        r = run_mode(mode, args)
+        print(
+            f"{mode:>5} {r['health_s']:>9.2f} {fmt(r['ready_s'], '>8.2f')} {fmt(r['sources_ms'], '>11.1f')} "
+            f"{fmt(r['answer_ms'], '>10.1f')} {fmt(r['first_answer_s'], '>13.2f')}"
+        )
+        if r["error"]:
+            print(f"      ⚠️ {r['error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+from selectolax.lexbor import LexborHTMLParser
+
+# Pages with less visible text than this are treated as junk / SPA shells
+MIN_TEXT_CHARS = 400
+
+# Elements whose text is never visible to a reader
+_INVISIBLE_TAGS = "script, style, noscript, template, svg, head, iframe"
+
+# Inline styles that hide content
+_HIDDEN_STYLE = re.compile(r"display\s*:\s*none|visibility\s*:\s*hidden", re.I)
+
+# noscript messages typical of client-rendered apps
+_NOSCRIPT_JS_REQUIRED = re.compile(r"enable\s+javascript|requires\s+javascript|javascript\s+(is\s+)?(required|disabled)", re.I)
+
+# Mount points of common SPA frameworks
+_SPA_ROOT_SELECTORS = ("#root", "#app", "#__next", "#__nuxt", "[ng-version]", "app-root")
+
+try:
+    import h2  # noqa: F401
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+
+@dataclass
+class ParsedPage:
+    title: str
+    text: str
+    links: List[str] = field(default_factory=list)
+    spa_shell: bool = False
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status_code: int
+    html: Optional[str] = None
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+def parse_html(html: str) -> ParsedPage:
+    """
+    Extract title, visible text and hrefs from server-rendered HTML
+    and flag pages that look like empty SPA shells.
+    """
+    tree = LexborHTMLParser(html)
+
+    title_node = tree.css_first("title")
+    title = title_node.text(strip=True) if title_node else ""
+
+    links = [
+        node.attributes.get("href")
+        for node in tree.css("a[href]")
+        if node.attributes.get("href")
+    ]
+
+    noscript_js_required = any(
+        _NOSCRIPT_JS_REQUIRED.search(node.text() or "")
+        for node in tree.css("noscript")
+    )
+
+    empty_spa_root = False
+    for selector in _SPA_ROOT_SELECTORS:
+        root = tree.css_first(selector)
+        if root is not None and not root.text(strip=True):
+            empty_spa_root = True
+            break
+
+    for node in tree.css(_INVISIBLE_TAGS):
+        node.decompose()
+    for node in tree.css("[hidden], [aria-hidden=true]"):
+        node.decompose()
+    for node in tree.css("[style]"):
+        if _HIDDEN_STYLE.search(node.attributes.get("style") or ""):
+            node.decompose()
+
+    body = tree.body
+    text = " ".join(body.text(separator=" ").split()) if body is not None else ""
+
+    spa_shell = (
+        len(text) < MIN_TEXT_CHARS
+        or noscript_js_required
+        or empty_spa_root
+    )
+
+    return ParsedPage(title=title, text=text, links=links, spa_shell=spa_shell)
+
+
+class HttpFetcher:
+    """
+    Pooled async HTTP client (keep-alive, HTTP/2 when h2 is installed,
+    gzip/deflate/br via httpx) for the fast crawl tier.
+    """
+
+    def __init__(self, max_connections: int = 16, timeout: float = 15.0):
+        self.client = httpx.AsyncClient(
+            http2=_HTTP2_AVAILABLE,
+            follow_redirects=True,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            ),
+            headers={
+                "User-Agent": (
+                    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+                    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+                ),
+                "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+            },
+        )
+
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> FetchResult:
+        response = await self.client.get(url, headers=headers)
+        content_type = response.headers.get("content-type", "")
+        html = None
+        if response.status_code == 200 and "html" in content_type:
+            html = response.text
+        return FetchResult(
+            url=str(response.url),
+            status_code=response.status_code,
+            html=html,
+            headers=dict(response.headers),
+        )
+
+    async def close(self) -> None:
+        await self.client.aclose()
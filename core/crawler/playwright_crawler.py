@@ -1,6 +1,24 @@
-from playwright.sync_api import sync_playwright
-from urllib.parse import urljoin, urlparse
-from collections import deque
+import asyncio
+import contextvars
+import inspect
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urldefrag, urljoin, urlparse
+
+from playwright.async_api import async_playwright
+
+from core.crawler.http_fetcher import MIN_TEXT_CHARS, HttpFetcher, parse_html
+from utils.metrics import log_event, observe, timed
+
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet"}
+
+# HTTP statuses worth retrying in a real browser (bot walls, rate limits)
+ESCALATE_STATUS_CODES = {403, 429, 503}
 
 
 def is_same_domain(base_url, target_url):
@@ -13,133 +31,539 @@ def clean_url(base_url, href):
     href = href.strip()
     if href.startswith(("#", "mailto:", "javascript:")):
         return None
-    return urljoin(base_url, href)
+    # Fragments never change server content; drop them so we don't refetch
+    return urldefrag(urljoin(base_url, href))[0]
+
+
+EXTRACT_VISIBLE_TEXT_JS = """() => {
+    const walker = document.createTreeWalker(
+        document.body,
+        NodeFilter.SHOW_TEXT,
+        null,
+        false
+    );
 
+    let text = "";
+    let node;
+    while ((node = walker.nextNode())) {
+        const parent = node.parentElement;
+        if (!parent) continue;
 
-def extract_visible_text(page):
+        const style = window.getComputedStyle(parent);
+        if (style.display === "none" || style.visibility === "hidden") continue;
+
+        const value = node.textContent.trim();
+        if (value) text += value + " ";
+    }
+    return text;
+}"""
+
+EXTRACT_LINKS_JS = """() => Array.from(document.querySelectorAll('a[href]'))
+    .map(a => a.getAttribute('href'))"""
+
+# Resolves once the DOM has seen no mutations for quietMs, or after capMs.
+DOM_QUIESCENCE_JS = """([quietMs, capMs]) => new Promise(resolve => {
+    let quietTimer = null;
+    const finish = () => {
+        observer.disconnect();
+        clearTimeout(quietTimer);
+        clearTimeout(capTimer);
+        resolve();
+    };
+    const observer = new MutationObserver(() => {
+        clearTimeout(quietTimer);
+        quietTimer = setTimeout(finish, quietMs);
+    });
+    const capTimer = setTimeout(finish, capMs);
+    quietTimer = setTimeout(finish, quietMs);
+    observer.observe(document.documentElement, {
+        childList: true, subtree: true, characterData: true
+    });
+})"""
+
+
+async def extract_visible_text(page):
     """
     Extract only visible text from rendered page
     """
-    return page.evaluate(
-        """() => {
-            const walker = document.createTreeWalker(
-                document.body,
-                NodeFilter.SHOW_TEXT,
-                null,
-                false
-            );
-
-            let text = "";
-            let node;
-            while ((node = walker.nextNode())) {
-                const parent = node.parentElement;
-                if (!parent) continue;
-
-                const style = window.getComputedStyle(parent);
-                if (style.display === "none" || style.visibility === "hidden") continue;
-
-                const value = node.textContent.trim();
-                if (value) text += value + " ";
-            }
-            return text;
-        }"""
-    )
+    return await page.evaluate(EXTRACT_VISIBLE_TEXT_JS)
 
 
-def crawl_website_playwright(
+async def settle_page(page, mode: str, quiet_ms: int, cap_ms: int) -> None:
+    """
+    Wait for SPA hydration to finish instead of sleeping a fixed amount.
+
+    mode="dom": wait until the DOM is quiet for quiet_ms (capped at cap_ms)
+    mode="networkidle": wait for Playwright's network-idle state (capped)
+    mode="none": don't wait beyond domcontentloaded
+    """
+    if mode == "none":
+        return
+    try:
+        if mode == "networkidle":
+            await page.wait_for_load_state("networkidle", timeout=cap_ms)
+        else:
+            await page.evaluate(DOM_QUIESCENCE_JS, [quiet_ms, cap_ms])
+    except Exception:
+        # Settling is best effort; extract whatever has rendered
+        pass
+
+
+class Frontier:
+    """
+    BFS crawl frontier.
+
+    URLs are handed out strictly by depth (all of depth d before d+1 among
+    what is queued), skipping hosts that already have ``per_host_limit``
+    fetches in flight.
+    """
+
+    def __init__(self, max_depth: int, per_host_limit: int):
+        self.max_depth = max_depth
+        self.per_host_limit = per_host_limit
+        self._levels: Dict[int, deque] = defaultdict(deque)
+        self._seen = set()
+        self._in_flight: Dict[str, int] = defaultdict(int)
+        self._changed = asyncio.Condition()
+        self.closed = False
+
+    def add(self, url: str, depth: int) -> bool:
+        if depth > self.max_depth or url in self._seen:
+            return False
+        self._seen.add(url)
+        self._levels[depth].append(url)
+        return True
+
+    def _pop_ready(self) -> Optional[Tuple[str, int]]:
+        for depth in sorted(self._levels):
+            level = self._levels[depth]
+            for _ in range(len(level)):
+                url = level.popleft()
+                host = urlparse(url).netloc
+                if self._in_flight[host] < self.per_host_limit:
+                    self._in_flight[host] += 1
+                    return url, depth
+                level.append(url)
+            if not level:
+                del self._levels[depth]
+        return None
+
+    def _pending(self) -> bool:
+        return any(self._levels.values())
+
+    def _busy(self) -> bool:
+        return any(self._in_flight.values())
+
+    async def next(self) -> Optional[Tuple[str, int]]:
+        """Next URL to fetch, or None once the crawl is finished"""
+        async with self._changed:
+            while True:
+                if self.closed:
+                    return None
+                item = self._pop_ready()
+                if item is not None:
+                    return item
+                if not self._pending() and not self._busy():
+                    return None
+                await self._changed.wait()
+
+    async def done(self, url: str, links: Tuple[Tuple[str, int], ...] = ()) -> None:
+        async with self._changed:
+            self._in_flight[urlparse(url).netloc] -= 1
+            for link, depth in links:
+                self.add(link, depth)
+            self._changed.notify_all()
+
+    async def close(self) -> None:
+        async with self._changed:
+            self.closed = True
+            self._changed.notify_all()
+
+
+class BrowserPool:
+    """
+    Lazily-launched Chromium with ``contexts`` contexts and a pool of
+    ``tabs`` pages. Nothing is started until the first page is escalated.
+    """
+
+    def __init__(self, tabs: int, contexts: int, settle: str, settle_quiet_ms: int, settle_cap_ms: int):
+        self.tabs = tabs
+        self.contexts = contexts
+        self.settle = settle
+        self.settle_quiet_ms = settle_quiet_ms
+        self.settle_cap_ms = settle_cap_ms
+
+        self._playwright = None
+        self._browser = None
+        self._browser_contexts = []
+        self._pages: Optional[asyncio.Queue] = None
+        self._start_lock = asyncio.Lock()
+
+    @staticmethod
+    async def _block_heavy(route, request):
+        if request.resource_type in BLOCKED_RESOURCE_TYPES:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _start(self) -> None:
+        async with self._start_lock:
+            if self._pages is not None:
+                return
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(
+                headless=True,
+                args=["--no-sandbox", "--disable-dev-shm-usage"]
+            )
+
+            # 🚀 Block heavy resources in every context
+            for _ in range(self.contexts):
+                context = await self._browser.new_context()
+                await context.route("**/*", self._block_heavy)
+                self._browser_contexts.append(context)
+
+            # ✅ Tabs spread round-robin over contexts
+            pages = asyncio.Queue()
+            for i in range(self.tabs):
+                pages.put_nowait(await self._browser_contexts[i % self.contexts].new_page())
+            self._pages = pages
+
+    async def render(self, url: str) -> Tuple[str, str, List[str]]:
+        """Render url in a pooled tab; returns (title, visible text, hrefs)"""
+        await self._start()
+        page = await self._pages.get()
+        try:
+            with timed("fetch", backend="browser"):
+                await page.goto(url, wait_until="domcontentloaded", timeout=20000)
+                await settle_page(page, self.settle, self.settle_quiet_ms, self.settle_cap_ms)
+
+            with timed("extract", backend="browser"):
+                text = await extract_visible_text(page)
+                title = await page.title() or ""
+                hrefs = await page.evaluate(EXTRACT_LINKS_JS)
+            return title, text, hrefs
+        finally:
+            self._pages.put_nowait(page)
+
+    async def close(self) -> None:
+        for context in self._browser_contexts:
+            await context.close()
+        if self._browser is not None:
+            await self._browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+
+
+def _new_tier_stats() -> Dict[str, Any]:
+    return {"pages": 0, "seconds": 0.0}
+
+
+async def crawl_website_async(
     start_url: str,
     max_pages: int = 50,
     max_depth: int = 2,
-):
+    on_page: Optional[Callable[[dict], None]] = None,
+    stats: Optional[Dict[str, Any]] = None,
+    known_pages: Optional[Dict[str, Dict[str, Any]]] = None,
+    collect: bool = True,
+    cancel: Optional[threading.Event] = None,
+    tabs: Optional[int] = None,
+    contexts: Optional[int] = None,
+    per_host_limit: Optional[int] = None,
+    http_first: Optional[bool] = None,
+    http_concurrency: Optional[int] = None,
+    settle: Optional[str] = None,
+    settle_quiet_ms: Optional[int] = None,
+    settle_cap_ms: Optional[int] = None,
+) -> List[dict]:
     """
-    Optimized Playwright crawler
-    - Single browser
-    - Controlled parallel tabs (2)
-    - Resource blocking
-    - Fast DOM-based wait
+    Tiered concurrent crawler
+    - Tier 1: pooled async HTTP fetch + fast HTML parse
+    - Tier 2: Playwright render, only for pages that look like SPA shells
+      (single lazily-launched browser, ``contexts`` contexts, ``tabs`` tabs)
+    - BFS frontier with per-host concurrency caps
+    - Resource blocking + adaptive settle instead of a fixed sleep
     - Graceful failure
+
+    ``on_page`` is called with each accepted page as soon as it is extracted;
+    if it returns an awaitable, that fetch worker waits on it (backpressure).
+    With ``collect=False`` pages are only passed to ``on_page`` and not
+    kept, so memory does not grow with ``max_pages``. Setting ``cancel``
+    stops the crawl after in-flight pages finish.
+    If ``stats`` is given it is filled with per-tier counts and timings.
+
+    ``known_pages`` maps url -> {"etag", "last_modified", "links"} from a
+    previous crawl. Those URLs are fetched conditionally; a 304 yields
+    ``{"url", "not_modified": True, "links"}`` and the stored links are
+    followed without re-parsing. Every other page carries its same-domain
+    ``links`` and, when the server sent them, ``etag`` / ``last_modified``.
     """
+    known_pages = known_pages or {}
+    tabs = tabs or int(os.getenv("CRAWL_TABS", "4"))
+    contexts = max(1, min(contexts or int(os.getenv("CRAWL_CONTEXTS", "1")), tabs))
+    if http_first is None:
+        http_first = os.getenv("CRAWL_HTTP_FIRST", "1") != "0"
+    http_concurrency = http_concurrency or int(os.getenv("CRAWL_HTTP_CONCURRENCY", "8"))
+    workers = max(tabs, http_concurrency) if http_first else tabs
+    per_host_limit = per_host_limit or int(os.getenv("CRAWL_PER_HOST_LIMIT", str(workers)))
 
-    visited = set()
-    queue = deque([(start_url, 0)])
-    pages_data = []
+    browser = BrowserPool(
+        tabs=tabs,
+        contexts=contexts,
+        settle=settle or os.getenv("CRAWL_SETTLE", "dom"),
+        settle_quiet_ms=settle_quiet_ms or int(os.getenv("CRAWL_SETTLE_QUIET_MS", "150")),
+        settle_cap_ms=settle_cap_ms or int(os.getenv("CRAWL_SETTLE_CAP_MS", "1500")),
+    )
+    fetcher = HttpFetcher(max_connections=http_concurrency) if http_first else None
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(
-            headless=True,
-            args=["--no-sandbox", "--disable-dev-shm-usage"]
-        )
-        context = browser.new_context()
-
-        # 🚀 Block heavy resources
-        context.route(
-            "**/*",
-            lambda route, request: (
-                route.abort()
-                if request.resource_type in {"image", "media", "font", "stylesheet"}
-                else route.continue_()
-            )
-        )
+    if stats is None:
+        stats = {}
+    stats.update({
+        "http": _new_tier_stats(),
+        "browser": _new_tier_stats(),
+        "escalated": 0,
+        "not_modified": 0,
+        "skipped": 0,
+    })
 
-        # ✅ Page pool (parallel tabs)
-        page_pool = [context.new_page() for _ in range(2)]
-        page_index = 0
+    start_url = urldefrag(start_url)[0]
+    frontier = Frontier(max_depth=max_depth, per_host_limit=per_host_limit)
+    frontier.add(start_url, 0)
+    pages_data: List[dict] = []
+    accepted = 0
 
-        while queue and len(pages_data) < max_pages:
-            url, depth = queue.popleft()
+    async def fetch_http(url: str) -> Optional[Dict[str, Any]]:
+        """Tier 1. Returns None when the page must be rendered in a browser."""
+        known = known_pages.get(url) or {}
+        headers = {}
+        if known.get("etag"):
+            headers["If-None-Match"] = known["etag"]
+        if known.get("last_modified"):
+            headers["If-Modified-Since"] = known["last_modified"]
 
-            if url in visited or depth > max_depth:
-                continue
+        started = time.perf_counter()
+        try:
+            result = await fetcher.fetch(url, headers=headers or None)
+        finally:
+            elapsed = time.perf_counter() - started
+            stats["http"]["seconds"] += elapsed
+            observe("fetch", elapsed, backend="http")
 
-            page = page_pool[page_index % len(page_pool)]
-            page_index += 1
+        if result.status_code == 304 and known:
+            stats["not_modified"] += 1
+            return {"not_modified": True, "links": known.get("links", [])}
+        if result.status_code in ESCALATE_STATUS_CODES:
+            return None
+        if result.html is None:
+            # Non-HTML or error response: nothing a browser would add
+            return {"title": "", "text": "", "hrefs": []}
 
-            try:
-                page.goto(url, wait_until="domcontentloaded", timeout=20000)
+        started = time.perf_counter()
+        parsed = parse_html(result.html)
+        elapsed = time.perf_counter() - started
+        stats["http"]["seconds"] += elapsed
+        observe("extract", elapsed, backend="http")
+        if parsed.spa_shell:
+            return None
 
-                # Small settle time for SPA hydration
-                page.wait_for_timeout(700)
+        stats["http"]["pages"] += 1
+        return {
+            "title": parsed.title,
+            "text": parsed.text,
+            "hrefs": parsed.links,
+            "etag": result.headers.get("etag"),
+            "last_modified": result.headers.get("last-modified"),
+        }
 
-                text = extract_visible_text(page)
+    async def fetch_browser(url: str) -> Dict[str, Any]:
+        """Tier 2"""
+        started = time.perf_counter()
+        try:
+            title, text, hrefs = await browser.render(url)
+            return {"title": title, "text": text, "hrefs": hrefs}
+        finally:
+            stats["browser"]["pages"] += 1
+            stats["browser"]["seconds"] += time.perf_counter() - started
 
-                # Skip junk / shell pages
-                if len(text) < 400:
-                    visited.add(url)
-                    continue
+    async def worker():
+        nonlocal accepted
+        while True:
+            item = await frontier.next()
+            if item is None:
+                return
+            url, depth = item
+            links = ()
 
-                title = page.title() or ""
+            try:
+                fetched = await fetch_http(url) if fetcher else None
+                if fetched is None:
+                    if fetcher:
+                        stats["escalated"] += 1
+                    fetched = await fetch_browser(url)
 
-                pages_data.append(
-                    {
+                if fetched.get("not_modified"):
+                    # 304: content unchanged, reuse links from the last crawl
+                    page_links = fetched["links"]
+                    page_data = {"url": url, "not_modified": True, "links": page_links}
+                elif len(fetched["text"]) < MIN_TEXT_CHARS:
+                    # Skip junk / shell pages
+                    stats["skipped"] += 1
+                    page_data = None
+                else:
+                    page_links = []
+                    for href in fetched["hrefs"]:
+                        full_url = clean_url(url, href)
+                        if full_url and is_same_domain(start_url, full_url):
+                            page_links.append(full_url)
+                    page_data = {
                         "url": url,
-                        "title": title,
-                        "text": text,
+                        "title": fetched["title"],
+                        "text": fetched["text"],
+                        "links": page_links,
                     }
-                )
-
-                visited.add(url)
+                    for header in ("etag", "last_modified"):
+                        if fetched.get(header):
+                            page_data[header] = fetched[header]
 
-                # Collect links for BFS
-                if depth < max_depth:
-                    links = page.evaluate(
-                        """() => Array.from(document.querySelectorAll('a[href]'))
-                            .map(a => a.getAttribute('href'))"""
-                    )
+                if page_data is not None and accepted < max_pages:
+                    accepted += 1
+                    if collect:
+                        pages_data.append(page_data)
+                    if on_page:
+                        result = on_page(page_data)
+                        if inspect.isawaitable(result):
+                            await result
 
-                    for href in links:
-                        full_url = clean_url(start_url, href)
-                        if (
-                            full_url
-                            and full_url not in visited
-                            and is_same_domain(start_url, full_url)
-                        ):
-                            queue.append((full_url, depth + 1))
+                    # Collect links for BFS
+                    if depth < max_depth:
+                        links = tuple((link, depth + 1) for link in page_links)
 
             except Exception as e:
-                print(f"[SKIP] {url} → {e}")
-                visited.add(url)
+                log_event("crawl_page_skipped", logging.WARNING, url=url, error=str(e))
+                stats["skipped"] += 1
+
+            finally:
+                await frontier.done(url, links)
 
-        context.close()
-        browser.close()
+            if accepted >= max_pages or (cancel is not None and cancel.is_set()):
+                await frontier.close()
+                return
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(workers)))
+    finally:
+        if fetcher:
+            await fetcher.close()
+        await browser.close()
+
+    for tier in ("http", "browser"):
+        stats[tier]["seconds"] = round(stats[tier]["seconds"], 3)
+    stats["browser_renders_avoided"] = stats["http"]["pages"]
 
     return pages_data
+
+
+def crawl_website_playwright(
+    start_url: str,
+    max_pages: int = 50,
+    max_depth: int = 2,
+    on_page: Optional[Callable[[dict], None]] = None,
+    stats: Optional[Dict[str, Any]] = None,
+    known_pages: Optional[Dict[str, Dict[str, Any]]] = None,
+    **options,
+):
+    """
+    Synchronous entry point used by the crawl service (runs on a worker
+    thread). See crawl_website_async for the tuning ``options``.
+    """
+    return asyncio.run(
+        crawl_website_async(
+            start_url,
+            max_pages=max_pages,
+            max_depth=max_depth,
+            on_page=on_page,
+            stats=stats,
+            known_pages=known_pages,
+            **options
+        )
+    )
+
+
+def iter_website(
+    start_url: str,
+    max_pages: int = 50,
+    max_depth: int = 2,
+    stats: Optional[Dict[str, Any]] = None,
+    known_pages: Optional[Dict[str, Dict[str, Any]]] = None,
+    buffer_pages: Optional[int] = None,
+    **options,
+) -> Iterator[dict]:
+    """
+    Stream pages as they finish crawling.
+
+    The crawl runs on its own thread/event loop and hands pages over through
+    a queue of ``buffer_pages`` (CRAWL_BUFFER_PAGES). When the consumer
+    falls behind, fetch workers wait instead of piling pages up in memory.
+    Closing the generator early cancels the crawl.
+    """
+    buffer: "queue.Queue" = queue.Queue(
+        maxsize=buffer_pages or int(os.getenv("CRAWL_BUFFER_PAGES", "8"))
+    )
+    finished = object()
+    cancel = threading.Event()
+    errors: List[BaseException] = []
+
+    def put_page(page: dict) -> None:
+        buffer.put(page, timeout=0.5)
+
+    async def hand_over(page: dict) -> None:
+        # Blocks only this fetch worker; re-checks cancel every 0.5s
+        loop = asyncio.get_running_loop()
+        while not cancel.is_set():
+            try:
+                await loop.run_in_executor(None, put_page, page)
+                return
+            except queue.Full:
+                continue
+
+    def run() -> None:
+        try:
+            asyncio.run(
+                crawl_website_async(
+                    start_url,
+                    max_pages=max_pages,
+                    max_depth=max_depth,
+                    on_page=hand_over,
+                    stats=stats,
+                    known_pages=known_pages,
+                    collect=False,
+                    cancel=cancel,
+                    **options
+                )
+            )
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            while True:
+                try:
+                    buffer.put(finished, timeout=0.5)
+                    break
+                except queue.Full:
+                    if cancel.is_set():
+                        break
+
+    # Copied context: stage timings reach the caller's collect_timings()
+    producer = threading.Thread(target=contextvars.copy_context().run, args=(run,), name="crawler", daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            page = buffer.get()
+            if page is finished:
+                break
+            yield page
+        if errors:
+            raise errors[0]
+    finally:
+        cancel.set()
+        producer.join()
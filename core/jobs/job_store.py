@@ -0,0 +1,187 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from utils.metrics import log_event
+
+ACTIVE_STATUSES = ("queued", "running")
+
+_COLUMNS = (
+    "id", "kb_id", "url", "status", "phase", "pages_done", "chunks_done",
+    "created_at", "started_at", "finished_at", "result", "error", "owner",
+)
+
+
+def _boot_id() -> str:
+    # Changes on reboot, so jobs of processes from a previous boot count as gone
+    try:
+        return Path("/proc/sys/kernel/random/boot_id").read_text().strip()
+    except OSError:
+        return "boot"
+
+
+def process_owner() -> str:
+    """Owner tag of jobs created by this process: ``<boot id>:<pid>``"""
+    return f"{_boot_id()}:{os.getpid()}"
+
+
+def owner_alive(owner: Optional[str]) -> bool:
+    """Whether the process that owns a job is still running (on this box)"""
+    if not owner or ":" not in owner:
+        return False
+    boot_id, pid = owner.rsplit(":", 1)
+    if boot_id != _boot_id():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except PermissionError:
+        # Exists, owned by another user
+        return True
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+class JobStore:
+    """
+    SQLite-backed store for background crawl jobs.
+    Works on a single box without any external services.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.getenv("JOB_STORE_PATH", "storage/jobs.db")
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kb_id TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    phase TEXT,
+                    pages_done INTEGER DEFAULT 0,
+                    chunks_done INTEGER DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    result TEXT,
+                    error TEXT,
+                    owner TEXT
+                )"""
+            )
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if "owner" not in columns:
+                # Jobs store created before owners were recorded
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_jobs_kb_status ON jobs (kb_id, status)"
+            )
+
+    def create(self, kb_id: str, url: str) -> Tuple[Dict[str, Any], bool]:
+        """
+        Create a queued job owned by this process, unless the KB already
+        has an active one. Returns (job, created). Check and insert run in
+        one write transaction, so concurrent workers sharing the database
+        can't both start a crawl for the same KB.
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                active = self._find_active(kb_id)
+                if active is None:
+                    self._conn.execute(
+                        "INSERT INTO jobs (id, kb_id, url, status, phase, created_at, owner) "
+                        "VALUES (?, ?, ?, 'queued', 'queued', ?, ?)",
+                        (job_id, kb_id, url, time.time(), process_owner())
+                    )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        if active is not None:
+            return self._to_dict(active), False
+        return self.get(job_id), True
+
+    def update(self, job_id: str, **fields) -> None:
+        if not fields:
+            return
+        if "result" in fields and fields["result"] is not None:
+            fields["result"] = json.dumps(fields["result"])
+        unknown = set(fields) - set(_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown job fields: {sorted(unknown)}")
+
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ?",
+                (*fields.values(), job_id)
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._to_dict(row)
+
+    def find_active(self, kb_id: str) -> Optional[Dict[str, Any]]:
+        """Return the queued/running job for a KB, if any"""
+        with self._lock:
+            row = self._find_active(kb_id)
+        return self._to_dict(row)
+
+    def _find_active(self, kb_id: str):
+        return self._conn.execute(
+            "SELECT * FROM jobs WHERE kb_id = ? AND status IN (?, ?) "
+            "ORDER BY created_at LIMIT 1",
+            (kb_id, *ACTIVE_STATUSES)
+        ).fetchone()
+
+    def fail_interrupted(self) -> int:
+        """
+        Mark active jobs whose owning process is gone (crashed / restarted)
+        as failed. Jobs of live processes, e.g. other workers sharing the
+        database, are left alone.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, owner FROM jobs WHERE status IN (?, ?)", ACTIVE_STATUSES
+            ).fetchall()
+            orphaned = [row["id"] for row in rows if not owner_alive(row["owner"])]
+            if not orphaned:
+                return 0
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE jobs SET status = 'failed', error = 'Interrupted by server restart', "
+                    "finished_at = ? WHERE id = ? AND status IN (?, ?)",
+                    [(time.time(), job_id, *ACTIVE_STATUSES) for job_id in orphaned]
+                )
+        return len(orphaned)
+
+    @staticmethod
+    def _to_dict(row) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        if job.get("result"):
+            job["result"] = json.loads(job["result"])
+        return job
+
+
+def fail_interrupted_jobs() -> None:
+    """Startup sweep: fail crawl jobs whose owning process is gone"""
+    interrupted = JobStore().fail_interrupted()
+    if interrupted:
+        log_event("jobs_interrupted", logging.WARNING, jobs=interrupted)
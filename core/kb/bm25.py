@@ -0,0 +1,173 @@
+import json
+import os
+import re
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+META_FILE = "bm25.meta.json"
+OFFSETS_FILE = "bm25.offsets.npy"
+ROWS_FILE = "bm25.rows.npy"
+WEIGHTS_FILE = "bm25.weights.npy"
+
+BM25_FILES = (OFFSETS_FILE, ROWS_FILE, WEIGHTS_FILE, META_FILE)
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+_TOKEN_PARTS = re.compile(r"[-_./]")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the "
+    "this to was were will with you your we our".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased alphanumeric tokens. Compound tokens (SKUs, versions,
+    hyphenated names like "xr-200") are kept whole *and* split into parts.
+    """
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(p for p in _TOKEN_PARTS.split(token) if p and p not in _STOPWORDS)
+    return tokens
+
+
+def _save_replacing(path: Path, array: np.ndarray) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+class BM25Index:
+    """
+    On-disk BM25 inverted index over a KB's chunks.
+
+    Postings are stored CSR-style: for term t, rows[offsets[t]:offsets[t+1]]
+    are the chunk-store rows containing it and weights[...] the matching
+    BM25 term-frequency components, precomputed with document-length
+    normalization. A query is then one gather + ``np.bincount`` over the
+    postings of its terms (times idf), with no per-document Python work.
+
+    Rows follow the chunk store's order (ascending FAISS id).
+    """
+
+    def __init__(self, vocab: Dict[str, int], offsets, rows, weights, num_docs: int):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.rows = rows
+        self.weights = weights
+        self.num_docs = num_docs
+
+        df = np.diff(np.asarray(offsets))
+        self.idf = np.log1p((num_docs - df + 0.5) / (df + 0.5)).astype("float32")
+
+    @staticmethod
+    def write(
+        directory: Union[str, Path],
+        texts: Sequence[str],
+        ids: Optional[Sequence[int]] = None,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ) -> None:
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        n = len(texts)
+        order = range(n) if ids is None else np.argsort(np.asarray(ids, dtype="int64"), kind="stable")
+
+        vocab: Dict[str, int] = {}
+        # Compact columns: postings outnumber chunks by the average distinct terms per chunk
+        term_ids = array("q")
+        posting_rows = array("i")
+        tfs = array("f")
+        doc_lengths = np.zeros(n, dtype="float32")
+        for row, source_row in enumerate(order):
+            tokens = tokenize(texts[source_row])
+            doc_lengths[row] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                posting_rows.append(row)
+                tfs.append(tf)
+
+        term_ids = np.frombuffer(term_ids, dtype="int64") if term_ids else np.empty(0, dtype="int64")
+        posting_rows = np.frombuffer(posting_rows, dtype="int32") if posting_rows else np.empty(0, dtype="int32")
+        tfs = np.frombuffer(tfs, dtype="float32") if tfs else np.empty(0, dtype="float32")
+
+        avgdl = float(doc_lengths.mean()) if n else 0.0
+        norm = k1 * (1 - b + b * doc_lengths[posting_rows] / max(avgdl, 1e-9))
+        weights = (tfs * (k1 + 1) / (tfs + norm)).astype("float32")
+
+        # Group postings by term (stable: rows stay ascending within a term)
+        by_term = np.argsort(term_ids, kind="stable")
+        offsets = np.zeros(len(vocab) + 1, dtype="int64")
+        np.cumsum(np.bincount(term_ids, minlength=len(vocab)), out=offsets[1:])
+
+        _save_replacing(directory / OFFSETS_FILE, offsets)
+        _save_replacing(directory / ROWS_FILE, posting_rows[by_term])
+        _save_replacing(directory / WEIGHTS_FILE, weights[by_term])
+        tmp_path = directory / (META_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "num_docs": n, "avgdl": avgdl, "k1": k1, "b": b, "vocab": vocab}, f)
+        os.replace(tmp_path, directory / META_FILE)
+
+    @classmethod
+    def open(cls, directory: Union[str, Path]) -> Optional["BM25Index"]:
+        """Memory-map a KB's BM25 index (None if the KB has none)"""
+        directory = Path(directory)
+        if not all((directory / name).exists() for name in BM25_FILES):
+            return None
+        with open(directory / META_FILE, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(
+            vocab=meta["vocab"],
+            offsets=np.load(directory / OFFSETS_FILE, mmap_mode="r"),
+            rows=np.load(directory / ROWS_FILE, mmap_mode="r"),
+            weights=np.load(directory / WEIGHTS_FILE, mmap_mode="r"),
+            num_docs=meta["num_docs"],
+        )
+
+    def search(self, query: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (rows, scores) by BM25, best first"""
+        term_ids = {self.vocab[t] for t in tokenize(query) if t in self.vocab}
+        if not term_ids or self.num_docs == 0:
+            return np.empty(0, dtype="int64"), np.empty(0, dtype="float32")
+
+        rows, weights = [], []
+        for term_id in term_ids:
+            start, end = int(self.offsets[term_id]), int(self.offsets[term_id + 1])
+            rows.append(self.rows[start:end])
+            weights.append(self.weights[start:end] * self.idf[term_id])
+        rows = np.concatenate(rows)
+        scores = np.bincount(rows, weights=np.concatenate(weights), minlength=self.num_docs)
+
+        touched = np.flatnonzero(scores)
+        if len(touched) > k:
+            touched = touched[np.argpartition(-scores[touched], k - 1)[:k]]
+        best = touched[np.argsort(-scores[touched], kind="stable")]
+        return best.astype("int64"), scores[best].astype("float32")
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[int]],
+    weights: Sequence[float],
+    k: int,
+    rrf_k: float = 60.0,
+) -> List[int]:
+    """
+    Weighted RRF: score(d) = sum_i w_i / (rrf_k + rank_i(d)), ranks from 1.
+    Returns the top-k items, best first.
+    """
+    scores: Dict[int, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        if weight <= 0:
+            continue
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + weight / (rrf_k + rank)
+    return [item for item, _ in sorted(scores.items(), key=lambda kv: -kv[1])[:k]]
@@ -1,5 +1,5 @@
 import json
-from sentence_transformers import SentenceTransformer
+from core.kb.embedding_cache import get_cached_embedder
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from .vector_store import save_faiss_index
 
@@ -60,7 +60,7 @@ def build_knowledge_base(raw_pages_path: str, output_dir: str):
     if not chunks:
         raise ValueError("No meaningful text extracted. Knowledge base not created.")
 
-    model = SentenceTransformer("all-MiniLM-L6-v2")
+    model = get_cached_embedder()
     embeddings = model.encode(chunks, show_progress_bar=False)
 
     save_faiss_index(
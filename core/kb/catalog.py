@@ -0,0 +1,179 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.storage_factory import get_storage_backend
+from utils.metrics import log_event
+
+
+class KBCatalog:
+    """
+    In-process registry of known KBs: id, version, chunk / vector count,
+    dim, index type, size and build time, as recorded by storage when a
+    version is published.
+
+    Existence checks and listings are answered from memory. The catalog
+    is filled at startup (warm mode) or in the background on first use,
+    updated in place after this process saves a KB and refreshed in the
+    background every ``ttl_seconds`` (to pick up KBs built or deleted by
+    other workers). A kb_id that is not known is looked up in
+    storage once per ``miss_ttl_seconds`` at most, via ``resolve``.
+    """
+
+    def __init__(self, ttl_seconds: float, miss_ttl_seconds: float, max_misses: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.miss_ttl_seconds = miss_ttl_seconds
+        self.max_misses = max_misses
+
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        # Recently missed kb_id -> monotonic time of the storage lookup
+        self._misses: "OrderedDict[str, float]" = OrderedDict()
+        # kb_id -> monotonic time of the last single-KB update
+        self._updated: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshed_at: Optional[float] = None
+        self._background = False
+
+        self.refreshes = 0
+        self.storage_lookups = 0
+
+    def _stale(self) -> bool:
+        return self._refreshed_at is None or time.monotonic() - self._refreshed_at >= self.ttl_seconds
+
+    def _refresh_in_background(self) -> None:
+        # Never filled (lazy startup) counts as stale: the first use starts it
+        if not self._stale():
+            return
+        with self._lock:
+            if self._background:
+                return
+            self._background = True
+        threading.Thread(target=self._background_refresh, name="kb-catalog-refresh", daemon=True).start()
+
+    def _background_refresh(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            log_event("catalog_refresh_failed", logging.ERROR, error=str(e))
+        finally:
+            with self._lock:
+                self._background = False
+
+    def refresh(self, storage=None) -> None:
+        """Rebuild the catalog from storage (one refresh at a time)"""
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self._rebuild(storage)
+        finally:
+            self._refresh_lock.release()
+
+    def _ensure_loaded(self, storage=None) -> None:
+        """Block until a first snapshot exists (waiting on an in-flight refresh)"""
+        if self._refreshed_at is not None:
+            return
+        with self._refresh_lock:
+            if self._refreshed_at is None:
+                self._rebuild(storage)
+
+    def _rebuild(self, storage=None) -> None:
+        # Caller holds self._refresh_lock
+        storage = storage or get_storage_backend()
+        started = time.monotonic()
+        entries = {}
+        for kb_id in storage.list_kbs():
+            try:
+                entry = storage.describe_kb(kb_id)
+            except Exception as e:
+                log_event("catalog_describe_failed", logging.WARNING, kb_id=kb_id, error=str(e))
+                continue
+            if entry is not None:
+                entries[kb_id] = entry
+
+        with self._lock:
+            # Keep KBs saved / deleted while the listing was running
+            for kb_id, updated_at in self._updated.items():
+                if updated_at < started:
+                    continue
+                if kb_id in self._entries:
+                    entries[kb_id] = self._entries[kb_id]
+                else:
+                    entries.pop(kb_id, None)
+            self._entries = entries
+            self._updated.clear()
+            self._misses.clear()
+            self._refreshed_at = started
+            self.refreshes += 1
+        log_event("catalog_refreshed", kbs=len(entries), seconds=round(time.monotonic() - started, 3))
+
+    def get(self, kb_id: str) -> Optional[Dict[str, Any]]:
+        """Catalog entry for kb_id, or None if not known (no I/O)"""
+        self._refresh_in_background()
+        with self._lock:
+            return self._entries.get(kb_id)
+
+    def exists(self, kb_id: str) -> bool:
+        return self.get(kb_id) is not None
+
+    def resolve(self, kb_id: str, storage=None) -> Optional[Dict[str, Any]]:
+        """Like ``get``, but checks storage for a kb_id not (yet) in the catalog"""
+        entry = self.get(kb_id)
+        if entry is not None:
+            return entry
+        with self._lock:
+            missed_at = self._misses.get(kb_id)
+            if missed_at is not None and time.monotonic() - missed_at < self.miss_ttl_seconds:
+                return None
+            self.storage_lookups += 1
+        return self.update(kb_id, storage)
+
+    def update(self, kb_id: str, storage=None) -> Optional[Dict[str, Any]]:
+        """Re-read one KB from storage (after it was saved or deleted)"""
+        storage = storage or get_storage_backend()
+        entry = storage.describe_kb(kb_id)
+        with self._lock:
+            self._updated[kb_id] = time.monotonic()
+            if entry is None:
+                self._entries.pop(kb_id, None)
+                self._misses[kb_id] = time.monotonic()
+                self._misses.move_to_end(kb_id)
+                while len(self._misses) > self.max_misses:
+                    self._misses.popitem(last=False)
+            else:
+                self._entries[kb_id] = entry
+                self._misses.pop(kb_id, None)
+        return entry
+
+    def remove(self, kb_id: str) -> None:
+        with self._lock:
+            self._entries.pop(kb_id, None)
+            self._updated[kb_id] = time.monotonic()
+
+    def list(self, offset: int = 0, limit: int = 50) -> Tuple[int, List[Dict[str, Any]]]:
+        """(total, entries[offset:offset + limit]) ordered by kb_id"""
+        self._ensure_loaded()
+        self._refresh_in_background()
+        with self._lock:
+            kb_ids = sorted(self._entries)
+            return len(kb_ids), [self._entries[kb_id] for kb_id in kb_ids[offset:offset + limit]]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "kbs": len(self._entries),
+                "refreshes": self.refreshes,
+                "age_seconds": (time.monotonic() - self._refreshed_at) if self._refreshed_at is not None else None,
+                "ttl_seconds": self.ttl_seconds,
+                "storage_lookups": self.storage_lookups,
+                "recent_misses": len(self._misses),
+            }
+
+
+kb_catalog = KBCatalog(
+    ttl_seconds=float(os.getenv("KB_CATALOG_TTL_SECONDS", "60")),
+    miss_ttl_seconds=float(os.getenv("KB_CATALOG_MISS_TTL_SECONDS", "5")),
+)
@@ -0,0 +1,293 @@
+import json
+import mmap
+import os
+import pickle
+import shutil
+from array import array
+from contextlib import contextmanager
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+from core.kb.bm25 import BM25Index
+from utils.metrics import log_event
+
+TEXTS_FILE = "chunks.bin"
+OFFSETS_FILE = "chunks.offsets.npy"
+SOURCES_FILE = "chunks.sources.npy"
+IDS_FILE = "chunks.ids.npy"
+META_FILE = "chunks.meta.json"
+
+CHUNK_STORE_FILES = (TEXTS_FILE, OFFSETS_FILE, SOURCES_FILE, IDS_FILE, META_FILE)
+LEGACY_METADATA_FILE = "metadata.pkl"
+
+FORMAT_VERSION = 1
+
+
+@contextmanager
+def _replacing(path: Path, mode: str = "wb"):
+    """
+    Write to a temp file and rename it over ``path``. Readers that still map
+    the old file keep the old inode instead of seeing it truncated.
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, mode, encoding=None if "b" in mode else "utf-8") as f:
+        yield f
+    os.replace(tmp_path, path)
+
+
+class ChunkStore:
+    """
+    Columnar, memory-mapped chunk metadata for a KB.
+
+    - chunks.bin          all chunk texts as one contiguous UTF-8 blob
+    - chunks.offsets.npy  int64[n + 1] byte offsets into the blob
+    - chunks.sources.npy  int32[n] index into the interned source table
+    - chunks.ids.npy      int64[n] FAISS ids, ascending (rows are id-sorted)
+    - chunks.meta.json    source table + KB info (index type, ...)
+
+    Opening a store maps the files instead of deserializing them, so a
+    query only touches the k texts it returns.
+    """
+
+    def __init__(
+        self,
+        blob: Union[bytes, mmap.mmap],
+        offsets: np.ndarray,
+        source_ids: np.ndarray,
+        ids: np.ndarray,
+        sources: List[str],
+        info: Optional[Dict[str, Any]] = None,
+        path: Optional[Path] = None,
+    ):
+        self._blob = blob
+        self.offsets = offsets
+        self.source_ids = source_ids
+        self.ids = ids
+        self.sources = sources
+        self.info = info or {}
+        # Directory the store was mapped from (None if in-memory)
+        self.path = path
+        # Published KB version it belongs to (set by the storage backend)
+        self.version: Optional[str] = None
+
+    # ----------------------------
+    # Building / persisting
+    # ----------------------------
+    @staticmethod
+    def write(
+        directory: Union[str, Path],
+        texts: Sequence[str],
+        sources: Sequence[str],
+        ids: Optional[Sequence[int]] = None,
+        info: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Write chunk texts / per-chunk sources / FAISS ids as a chunk store"""
+        n = len(texts)
+        ids = np.arange(n, dtype="int64") if ids is None else np.asarray(ids, dtype="int64")
+        order = np.argsort(ids, kind="stable")
+
+        with ChunkStoreWriter(directory) as writer:
+            for row in order:
+                writer.add([texts[row]], [sources[row]], [int(ids[row])])
+            writer.close(info)
+
+    @staticmethod
+    def write_metadata(directory: Union[str, Path], metadata: Dict) -> None:
+        """Write a {"texts", "metadatas", "ids"?, "index"?} dict as a chunk store"""
+        ChunkStore.write(
+            directory,
+            metadata["texts"],
+            [m.get("source", "") for m in metadata["metadatas"]],
+            metadata.get("ids"),
+            info={"index": metadata["index"]} if "index" in metadata else None,
+        )
+
+    @staticmethod
+    def save(directory: Union[str, Path], chunks: Union[Dict, "ChunkStore"]) -> None:
+        """
+        Persist a KB's chunks into ``directory``: a metadata dict is written
+        as a chunk store, a store already written to disk (streamed by
+        ChunkStoreWriter) has its files copied.
+        """
+        if isinstance(chunks, dict):
+            ChunkStore.write_metadata(directory, chunks)
+            return
+        for filename in CHUNK_STORE_FILES:
+            shutil.copyfile(chunks.path / filename, Path(directory) / filename)
+
+    @classmethod
+    def open(cls, directory: Union[str, Path]) -> "ChunkStore":
+        """Memory-map an existing chunk store"""
+        directory = Path(directory)
+        with open(directory / META_FILE, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        blob: Union[bytes, mmap.mmap] = b""
+        if os.path.getsize(directory / TEXTS_FILE) > 0:
+            with open(directory / TEXTS_FILE, "rb") as f:
+                blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return cls(
+            blob=blob,
+            offsets=np.load(directory / OFFSETS_FILE, mmap_mode="r"),
+            source_ids=np.load(directory / SOURCES_FILE, mmap_mode="r"),
+            ids=np.load(directory / IDS_FILE, mmap_mode="r"),
+            sources=meta["sources"],
+            info=meta.get("info", {}),
+            path=directory,
+        )
+
+    @staticmethod
+    def exists(directory: Union[str, Path]) -> bool:
+        return all((Path(directory) / name).exists() for name in CHUNK_STORE_FILES)
+
+    # ----------------------------
+    # Lookups
+    # ----------------------------
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row: int) -> str:
+        # Sequence of texts, e.g. for BM25Index.write
+        return self.text(row)
+
+    @property
+    def index_type(self) -> Optional[str]:
+        return self.info.get("index", {}).get("index_type")
+
+    @cached_property
+    def bm25(self) -> Optional[BM25Index]:
+        """The KB's BM25 index next to the store (None if it has none)"""
+        return BM25Index.open(self.path) if self.path is not None else None
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            len(self._blob)
+            + self.offsets.nbytes
+            + self.source_ids.nbytes
+            + self.ids.nbytes
+        )
+
+    def rows_for_ids(self, chunk_ids: Sequence[int]) -> np.ndarray:
+        """Row of each FAISS id, -1 where unknown"""
+        chunk_ids = np.asarray(chunk_ids, dtype="int64")
+        if len(self) == 0:
+            return np.full(len(chunk_ids), -1, dtype="int64")
+        rows = np.searchsorted(self.ids, chunk_ids)
+        rows = np.minimum(rows, len(self) - 1)
+        return np.where(self.ids[rows] == chunk_ids, rows, -1)
+
+    def text(self, row: int) -> str:
+        return self._blob[int(self.offsets[row]):int(self.offsets[row + 1])].decode("utf-8")
+
+    def source(self, row: int) -> str:
+        return self.sources[int(self.source_ids[row])]
+
+    def iter_texts(self) -> Iterator[str]:
+        for row in range(len(self)):
+            yield self.text(row)
+
+    def to_metadata(self) -> Dict:
+        """Materialize as the in-memory {"texts", "metadatas", "ids"} dict"""
+        return {
+            "texts": list(self.iter_texts()),
+            "metadatas": [{"source": self.source(row)} for row in range(len(self))],
+            "ids": [int(i) for i in self.ids],
+        }
+
+
+class ChunkStoreWriter:
+    """
+    Streams chunks into a chunk store as they are produced: texts go
+    straight to chunks.bin, only the per-chunk offset / source / id
+    columns (16 bytes + source per chunk) stay in memory until ``close``.
+    Chunks must arrive in ascending id order.
+    """
+
+    def __init__(self, directory: Union[str, Path]):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._texts_path = self.directory / (TEXTS_FILE + ".tmp")
+        self._texts = open(self._texts_path, "wb")
+        self._offsets = array("q", [0])
+        self._source_ids = array("i")
+        self._ids = array("q")
+        self._source_table: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, texts: Sequence[str], sources: Sequence[str], ids: Sequence[int]) -> None:
+        for text, source, chunk_id in zip(texts, sources, ids):
+            if self._ids and chunk_id < self._ids[-1]:
+                raise ValueError(f"Chunk ids must be ascending ({chunk_id} after {self._ids[-1]})")
+            encoded = text.encode("utf-8")
+            self._texts.write(encoded)
+            self._offsets.append(self._offsets[-1] + len(encoded))
+            self._source_ids.append(self._source_table.setdefault(source, len(self._source_table)))
+            self._ids.append(chunk_id)
+
+    def close(self, info: Optional[Dict[str, Any]] = None) -> ChunkStore:
+        """Finish the store (meta file last) and map it"""
+        self._texts.close()
+        os.replace(self._texts_path, self.directory / TEXTS_FILE)
+        for filename, column, dtype in (
+            (OFFSETS_FILE, self._offsets, "int64"),
+            (SOURCES_FILE, self._source_ids, "int32"),
+            (IDS_FILE, self._ids, "int64"),
+        ):
+            with _replacing(self.directory / filename) as f:
+                np.save(f, np.frombuffer(column, dtype=dtype) if len(column) else np.empty(0, dtype=dtype))
+        # Written last: its presence marks a complete store
+        with _replacing(self.directory / META_FILE, "w") as f:
+            json.dump(
+                {
+                    "version": FORMAT_VERSION,
+                    "count": len(self._ids),
+                    "sources": list(self._source_table),
+                    "info": info or {},
+                },
+                f
+            )
+        return ChunkStore.open(self.directory)
+
+    def abort(self) -> None:
+        """Discard an unfinished store (no-op after ``close``)"""
+        self._texts.close()
+        self._texts_path.unlink(missing_ok=True)
+
+    def __enter__(self) -> "ChunkStoreWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.abort()
+
+
+def load_chunk_store(directory: Union[str, Path]) -> ChunkStore:
+    """
+    Open a KB's chunk store, migrating a legacy metadata.pkl in place
+    the first time it is loaded.
+    """
+    directory = Path(directory)
+    if ChunkStore.exists(directory):
+        return ChunkStore.open(directory)
+
+    legacy_path = directory / LEGACY_METADATA_FILE
+    if not legacy_path.exists():
+        raise FileNotFoundError(f"Chunk store not found: {directory}")
+
+    with open(legacy_path, "rb") as f:
+        metadata = pickle.load(f)
+    if isinstance(metadata, list):
+        raise ValueError(
+            "Legacy Knowledge Base detected. Please re-crawl the website to update the data structure."
+        )
+
+    log_event("chunk_store_migration", path=str(legacy_path))
+    ChunkStore.write_metadata(directory, metadata)
+    legacy_path.unlink()
+    return ChunkStore.open(directory)
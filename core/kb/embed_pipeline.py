@@ -0,0 +1,101 @@
+import contextvars
+import os
+import queue
+import threading
+from typing import Any, Callable, List, Optional
+
+import numpy as np
+
+from utils.metrics import timed
+
+_STOP = object()
+
+
+class EmbeddingPipeline:
+    """
+    Streaming embedding stage for KB builds.
+
+    Chunks from many pages are accumulated into fixed-size batches.
+    Every ``bucket_batches`` batches' worth of chunks is sorted by length
+    before being cut into batches, so each forward pass pads to similar
+    lengths. Batches are encoded on a dedicated worker thread (concurrently
+    with whatever produces the chunks) and handed to
+    ``on_batch(vectors, payloads)`` as soon as they complete.
+
+    ``max_pending_batches`` bounds the queue between producer and worker;
+    ``add`` blocks when the worker falls behind.
+    """
+
+    def __init__(
+        self,
+        embedder,
+        on_batch: Callable[[np.ndarray, List[Any]], None],
+        batch_size: Optional[int] = None,
+        bucket_batches: Optional[int] = None,
+        max_pending_batches: int = 4,
+    ):
+        self.embedder = embedder
+        self.on_batch = on_batch
+        self.batch_size = batch_size or int(os.getenv("EMBED_BATCH_SIZE", "64"))
+        self.bucket_batches = bucket_batches or int(os.getenv("EMBED_BUCKET_BATCHES", "4"))
+
+        self._buffer: List[tuple] = []
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending_batches)
+        self._error: Optional[BaseException] = None
+        # Copied context: stage timings reach the caller's collect_timings()
+        self._worker = threading.Thread(
+            target=contextvars.copy_context().run, args=(self._run,), name="embed-pipeline", daemon=True
+        )
+        self._worker.start()
+
+        self.chunks_embedded = 0
+        self.batches = 0
+
+    def add(self, texts: List[str], payloads: List[Any]) -> None:
+        """Queue chunks (and an opaque payload per chunk) for embedding"""
+        self._raise_worker_error()
+        self._buffer.extend(zip(texts, payloads))
+        if len(self._buffer) >= self.batch_size * self.bucket_batches:
+            self._dispatch(self.batch_size * self.bucket_batches)
+
+    def _dispatch(self, count: int) -> None:
+        bucket, self._buffer = self._buffer[:count], self._buffer[count:]
+        bucket.sort(key=lambda item: len(item[0]))
+        for start in range(0, len(bucket), self.batch_size):
+            batch = bucket[start:start + self.batch_size]
+            self._queue.put(([text for text, _ in batch], [payload for _, payload in batch]))
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            if self._error is not None:
+                # Drain so producers never block on a dead worker
+                continue
+            texts, payloads = item
+            try:
+                with timed("embed"):
+                    vectors = self.embedder.encode(
+                        texts,
+                        batch_size=len(texts),
+                        show_progress_bar=False
+                    )
+                    vectors = np.asarray(vectors, dtype="float32")
+                self.on_batch(vectors, payloads)
+                self.chunks_embedded += len(texts)
+                self.batches += 1
+            except BaseException as e:
+                self._error = e
+
+    def _raise_worker_error(self) -> None:
+        if self._error is not None:
+            raise RuntimeError("Embedding worker failed") from self._error
+
+    def close(self) -> None:
+        """Flush buffered chunks, wait for the worker and surface its errors"""
+        if self._buffer:
+            self._dispatch(len(self._buffer))
+        self._queue.put(_STOP)
+        self._worker.join()
+        self._raise_worker_error()
@@ -0,0 +1,306 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from core.rag.registry import EMBEDDING_MODEL_NAME, embedding_model_id, get_embedder
+from utils.metrics import log_event
+
+_WHITESPACE = re.compile(r"\s+")
+_SQL_BATCH = 500
+
+
+def chunk_key(text: str) -> bytes:
+    """Content address of a chunk: sha1 of its whitespace-normalized text"""
+    normalized = _WHITESPACE.sub(" ", text).strip()
+    return hashlib.sha1(normalized.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    On-disk, content-addressed embedding cache for one model.
+
+    Vectors live in a memory-mapped float32 file (``vectors.f32``); an
+    SQLite table maps chunk hash -> row and tracks last use. When the
+    number of entries exceeds ``max_entries`` the least recently used are
+    dropped and the vector file is compacted.
+    """
+
+    def __init__(
+        self,
+        model_name: str = EMBEDDING_MODEL_NAME,
+        cache_dir: Optional[str] = None,
+        max_entries: Optional[int] = None,
+    ):
+        root = Path(cache_dir or os.getenv("EMBEDDING_CACHE_DIR", "storage/embedding_cache"))
+        self.path = root / re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries or int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+        self._vectors_path = self.path / "vectors.f32"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.path / "index.sqlite"),
+            check_same_thread=False,
+            isolation_level=None,
+            timeout=30
+        )
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key BLOB PRIMARY KEY,
+                row INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries (last_used);
+            CREATE TABLE IF NOT EXISTS meta (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            """
+        )
+        self._vectors: Optional[np.memmap] = None
+        self._vectors_inode = None
+
+    # ----------------------------
+    # Internal helpers
+    # ----------------------------
+    def _meta(self, name: str) -> Optional[int]:
+        row = self._conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name: str, value: int) -> None:
+        self._conn.execute(
+            "INSERT INTO meta (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+            (name, value)
+        )
+
+    def _map(self, min_rows: int = 0) -> Optional[np.memmap]:
+        """(Re)map the vector file so it holds at least min_rows rows"""
+        dim = self._meta("dim")
+        if dim is None:
+            return None
+
+        if not self._vectors_path.exists():
+            self._vectors_path.touch()
+        stat = self._vectors_path.stat()
+        capacity = stat.st_size // (dim * 4)
+        if capacity < min_rows:
+            capacity = max(min_rows, capacity * 2, 1024)
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(capacity * dim * 4)
+
+        # Remap after growth here or compaction in another process
+        if (
+            self._vectors is None
+            or self._vectors.shape[0] != capacity
+            or self._vectors_inode != stat.st_ino
+        ):
+            self._vectors = np.memmap(self._vectors_path, dtype="float32", mode="r+", shape=(capacity, dim))
+            self._vectors_inode = stat.st_ino
+        return self._vectors
+
+    def _lookup(self, keys: Sequence[bytes]) -> Dict[bytes, int]:
+        rows = {}
+        for start in range(0, len(keys), _SQL_BATCH):
+            batch = keys[start:start + _SQL_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            for key, row in self._conn.execute(
+                f"SELECT key, row FROM entries WHERE key IN ({placeholders})", batch
+            ):
+                rows[key] = row
+        return rows
+
+    # ----------------------------
+    # Public API
+    # ----------------------------
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, np.ndarray]:
+        """Return cached vectors for the keys that are present"""
+        if not keys:
+            return {}
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._lookup(list(set(keys)))
+                found = {}
+                if rows:
+                    vectors = self._map(max(rows.values()) + 1)
+                    found = {key: np.array(vectors[row]) for key, row in rows.items()}
+                    now = time.time()
+                    self._conn.executemany(
+                        "UPDATE entries SET last_used = ? WHERE key = ?",
+                        [(now, key) for key in rows]
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return found
+
+    def put_many(self, keys: Sequence[bytes], vectors: np.ndarray) -> None:
+        if len(keys) == 0:
+            return
+        vectors = np.asarray(vectors, dtype="float32")
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._meta("dim") is None:
+                    self._set_meta("dim", vectors.shape[1])
+                    self._set_meta("next_row", 0)
+
+                existing = self._lookup(list(keys))
+                new_items = {}
+                for key, vector in zip(keys, vectors):
+                    if key not in existing:
+                        new_items[key] = vector
+
+                if new_items:
+                    next_row = self._meta("next_row")
+                    mapped = self._map(next_row + len(new_items))
+                    now = time.time()
+                    records = []
+                    for offset, (key, vector) in enumerate(new_items.items()):
+                        row = next_row + offset
+                        mapped[row] = vector
+                        records.append((key, row, now))
+                    mapped.flush()
+                    self._conn.executemany(
+                        "INSERT INTO entries (key, row, last_used) VALUES (?, ?, ?)", records
+                    )
+                    self._set_meta("next_row", next_row + len(new_items))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+            if self._count() > self.max_entries:
+                self._compact()
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._count()
+
+    def compact(self, keep: Optional[int] = None) -> int:
+        """
+        Evict least recently used entries down to ``keep`` (default 80% of
+        max_entries) and rewrite the vector file densely. Returns evictions.
+        """
+        with self._lock:
+            return self._compact(keep)
+
+    def _compact(self, keep: Optional[int] = None) -> int:
+        keep = int(self.max_entries * 0.8) if keep is None else keep
+
+        self._conn.execute("BEGIN EXCLUSIVE")
+        try:
+            survivors = self._conn.execute(
+                "SELECT key, row FROM entries ORDER BY last_used DESC LIMIT ?", (keep,)
+            ).fetchall()
+            evicted = self._count() - len(survivors)
+
+            dim = self._meta("dim")
+            old = self._map()
+            dense = np.empty((len(survivors), dim), dtype="float32")
+            for new_row, (_, old_row) in enumerate(survivors):
+                dense[new_row] = old[old_row]
+
+            self._vectors = None
+            del old
+            tmp_path = self._vectors_path.with_suffix(".tmp")
+            dense.tofile(tmp_path)
+            os.replace(tmp_path, self._vectors_path)
+
+            self._conn.execute("DELETE FROM entries")
+            now = time.time()
+            self._conn.executemany(
+                "INSERT INTO entries (key, row, last_used) VALUES (?, ?, ?)",
+                [(key, new_row, now - new_row * 1e-6) for new_row, (key, _) in enumerate(survivors)]
+            )
+            self._set_meta("next_row", len(survivors))
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+        log_event("embedding_cache_compacted", evicted=evicted, kept=len(survivors))
+        return evicted
+
+
+class CachedEmbedder:
+    """
+    Drop-in wrapper around a SentenceTransformer-like ``encode`` that
+    consults the embedding cache first and only encodes the misses.
+    Tracks hits / misses for the lifetime of the wrapper (one KB build).
+    """
+
+    def __init__(self, embedder, cache: Optional[EmbeddingCache]):
+        self.embedder = embedder
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    def encode(self, texts: List[str], **kwargs) -> np.ndarray:
+        if self.cache is None or not texts:
+            self.misses += len(texts)
+            return np.asarray(self.embedder.encode(texts, **kwargs), dtype="float32")
+
+        keys = [chunk_key(text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        # Unique misses only: repeated boilerplate within a batch is encoded once
+        misses = {}
+        for i, key in enumerate(keys):
+            if key not in cached and key not in misses:
+                misses[key] = i
+        self.hits += len(texts) - len(misses)
+        self.misses += len(misses)
+
+        if misses:
+            miss_keys = list(misses)
+            miss_texts = [texts[i] for i in misses.values()]
+            miss_vectors = np.asarray(self.embedder.encode(miss_texts, **kwargs), dtype="float32")
+            self.cache.put_many(miss_keys, miss_vectors)
+            for key, vector in zip(miss_keys, miss_vectors):
+                cached[key] = vector
+
+        return np.stack([cached[key] for key in keys]).astype("float32", copy=False)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Process-wide cache for the loaded model + backend (None if EMBEDDING_CACHE=0)"""
+    global _cache
+    if os.getenv("EMBEDDING_CACHE", "1") == "0":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache(model_name=embedding_model_id())
+    return _cache
+
+
+def get_cached_embedder() -> CachedEmbedder:
+    """Fresh hit/miss counters over the shared embedder + cache"""
+    return CachedEmbedder(get_embedder(), get_embedding_cache())
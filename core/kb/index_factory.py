@@ -0,0 +1,178 @@
+import logging
+import math
+import os
+from typing import Any, Dict, Optional
+
+import faiss
+import numpy as np
+
+from core.kb.shared_index import SharedFlatIndex
+from utils.metrics import log_event
+
+INDEX_FLAT = "flat"
+INDEX_HNSW = "hnsw"
+INDEX_IVFPQ = "ivfpq"
+
+# How saved indexes are brought into memory (FAISS_INDEX_LOAD)
+LOAD_MMAP = "mmap"  # map the index file; pages are shared via the page cache
+LOAD_SHM = "shm"    # Flat vectors in a shared-memory file (see shared_index)
+LOAD_HEAP = "heap"  # private copy per process
+
+
+def choose_index_type(num_vectors: int) -> str:
+    """
+    Index policy by KB size:
+    Flat below FAISS_HNSW_MIN_VECTORS, HNSW above it, IVF-PQ from
+    FAISS_IVFPQ_MIN_VECTORS. FAISS_INDEX_TYPE forces a type.
+    """
+    forced = os.getenv("FAISS_INDEX_TYPE")
+    if forced:
+        return forced.lower()
+    if num_vectors >= int(os.getenv("FAISS_IVFPQ_MIN_VECTORS", "500000")):
+        return INDEX_IVFPQ
+    if num_vectors >= int(os.getenv("FAISS_HNSW_MIN_VECTORS", "20000")):
+        return INDEX_HNSW
+    return INDEX_FLAT
+
+
+def _pq_subquantizers(dim: int) -> int:
+    # Largest divisor of dim giving >= 4 dims per sub-quantizer, capped at 64
+    for m in (64, 48, 32, 24, 16, 12, 8, 4, 2, 1):
+        if dim % m == 0 and dim // m >= 4:
+            return m
+    return 1
+
+
+def build_index(vectors: np.ndarray, ids: np.ndarray, index_type: str) -> Any:
+    """Build an ID-mapped index of ``index_type`` over vectors, training if needed"""
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    ids = np.ascontiguousarray(ids, dtype="int64")
+    n, dim = vectors.shape
+
+    if index_type == INDEX_HNSW:
+        inner = faiss.IndexHNSWFlat(dim, int(os.getenv("FAISS_HNSW_M", "32")))
+        inner.hnsw.efConstruction = int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "80"))
+    elif index_type == INDEX_IVFPQ:
+        nlist = max(1, min(int(4 * math.sqrt(n)), n // 39))
+        quantizer = faiss.IndexFlatL2(dim)
+        inner = faiss.IndexIVFPQ(quantizer, dim, nlist, _pq_subquantizers(dim), 8)
+        # 256 points per centroid is plenty for k-means; cap training cost
+        sample_size = min(n, max(nlist * 256, 256 * 256))
+        sample = vectors
+        if sample_size < n:
+            sample = vectors[np.random.default_rng(0).choice(n, sample_size, replace=False)]
+        inner.train(sample)
+    elif index_type == INDEX_FLAT:
+        inner = faiss.IndexFlatL2(dim)
+    else:
+        raise ValueError(f"Unknown FAISS index type: {index_type}")
+
+    index = faiss.IndexIDMap2(inner)
+    if n:
+        index.add_with_ids(vectors, ids)
+    return index
+
+
+def index_type_of(index: Any) -> str:
+    inner = faiss.downcast_index(index.index) if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)) else index
+    if isinstance(inner, faiss.IndexHNSW):
+        return INDEX_HNSW
+    if isinstance(inner, faiss.IndexIVF):
+        return INDEX_IVFPQ
+    return INDEX_FLAT
+
+
+def vectors_and_ids(index: Any):
+    """Exact (vectors, ids) of an ID-mapped Flat or HNSW-Flat index"""
+    vectors = index.index.reconstruct_n(0, index.ntotal)
+    ids = faiss.vector_to_array(index.id_map).astype("int64")
+    return vectors, ids
+
+
+def finalize_index(index: Any) -> Any:
+    """
+    Convert an ID-mapped Flat build index to the type the size policy asks
+    for. Builds accumulate into Flat so they can stream and remove ids;
+    conversion happens once at save time.
+    """
+    target = choose_index_type(index.ntotal)
+    if target == index_type_of(index):
+        return index
+    vectors, ids = vectors_and_ids(index)
+    return build_index(vectors, ids, target)
+
+
+def index_info(index: Any) -> Dict[str, Any]:
+    """Index description recorded in KB metadata"""
+    info = {"index_type": index_type_of(index), "ntotal": int(index.ntotal), "dim": int(index.d)}
+    if info["index_type"] == INDEX_IVFPQ:
+        info["nlist"] = int(faiss.extract_index_ivf(index).nlist)
+    return info
+
+
+def search_params(index: Any, ef_search: Optional[int] = None, nprobe: Optional[int] = None):
+    """Per-query search parameters (thread-safe, unlike mutating the index)"""
+    index_type = index_type_of(index)
+    if index_type == INDEX_HNSW:
+        return faiss.SearchParametersHNSW(
+            efSearch=ef_search or int(os.getenv("FAISS_EF_SEARCH", "64"))
+        )
+    if index_type == INDEX_IVFPQ:
+        return faiss.SearchParametersIVF(
+            nprobe=nprobe or int(os.getenv("FAISS_NPROBE", "16"))
+        )
+    return None
+
+
+def write_index(index: Any, path) -> None:
+    """
+    Write an index via temp file + rename, so processes that have the
+    previous version memory-mapped keep a valid (old) file.
+    """
+    path = str(path)
+    tmp_path = path + ".tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _mmap_flags(index_type: str) -> Optional[int]:
+    if index_type == INDEX_IVFPQ:
+        # Inverted lists are mapped; the quantizer is small
+        return faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    # Flat / HNSW codes ("IndexFlatCodes"); needs a recent FAISS build
+    flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+    return None if flag is None else flag | faiss.IO_FLAG_READ_ONLY
+
+
+def read_index(
+    path,
+    index_type: Optional[str] = None,
+    mode: Optional[str] = None,
+    shared_key: Optional[str] = None,
+) -> Any:
+    """
+    Load a saved index for querying.
+
+    ``mode`` (default FAISS_INDEX_LOAD, "mmap") picks between mapping the
+    file read-only, a shared-memory copy of Flat vectors for FAISS builds
+    that can't map Flat codes, and a private heap copy. Mapped indexes are
+    read-only: use mode="heap" for anything that adds or removes ids.
+    ``shared_key`` (the kb_id) groups shared-memory exports so a new KB
+    version replaces the previous one's.
+    """
+    mode = mode or os.getenv("FAISS_INDEX_LOAD", LOAD_MMAP)
+    index_type = index_type or INDEX_FLAT
+
+    if mode == LOAD_MMAP:
+        flags = _mmap_flags(index_type)
+        if flags is not None:
+            try:
+                return faiss.read_index(str(path), flags)
+            except RuntimeError as e:
+                log_event("index_mmap_failed", logging.WARNING, path=str(path), error=str(e))
+        mode = LOAD_SHM
+
+    if mode == LOAD_SHM and index_type == INDEX_FLAT:
+        return SharedFlatIndex.open(path, key=shared_key)
+
+    return faiss.read_index(str(path))
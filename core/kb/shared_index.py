@@ -0,0 +1,97 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+
+def _shared_dir() -> Path:
+    shared_dir = Path(os.getenv("FAISS_SHM_DIR", "/dev/shm/rag_kb"))
+    shared_dir.mkdir(parents=True, exist_ok=True)
+    return shared_dir
+
+
+def _export_flat(index: Any) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """(vectors, ids) of a Flat index, ids None for positional (legacy) KBs"""
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        inner = faiss.downcast_index(index.index)
+        ids = faiss.vector_to_array(index.id_map).astype("int64")
+    else:
+        inner, ids = index, None
+    if not isinstance(inner, faiss.IndexFlat):
+        raise ValueError(f"Shared-memory layout only supports Flat indexes, got {type(inner).__name__}")
+    return inner.reconstruct_n(0, inner.ntotal), ids
+
+
+def _save_replacing(path: Path, array: np.ndarray) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+class SharedFlatIndex:
+    """
+    Exact L2 search over Flat vectors kept in a shared-memory file.
+
+    The first worker to load a given index file exports its vectors (and
+    FAISS ids) to FAISS_SHM_DIR (tmpfs, /dev/shm by default); every worker
+    then maps the same file, so N workers hold one copy of the vectors.
+    Files are keyed by ``key`` (default: the index path) + index path,
+    mtime and size, so a rebuilt KB gets a fresh export and the previous
+    one is unlinked (mapped readers keep it alive until they drop it).
+
+    Exposes the subset of the FAISS index API that querying uses.
+    """
+
+    def __init__(self, vectors: np.ndarray, ids: Optional[np.ndarray], paths: List[str]):
+        self.vectors = vectors
+        self.ids = ids
+        self.shared_paths = paths
+
+    @property
+    def ntotal(self) -> int:
+        return int(self.vectors.shape[0])
+
+    @property
+    def d(self) -> int:
+        return int(self.vectors.shape[1])
+
+    def search(self, x: np.ndarray, k: int, params: Any = None):
+        distances, rows = faiss.knn(np.ascontiguousarray(x, dtype="float32"), self.vectors, k)
+        if self.ids is None:
+            return distances, rows
+        return distances, np.where(rows >= 0, self.ids[np.maximum(rows, 0)], -1)
+
+    @classmethod
+    def open(cls, index_path, key: Optional[str] = None) -> "SharedFlatIndex":
+        index_path = Path(index_path).resolve()
+        stat = index_path.stat()
+        prefix = hashlib.sha1((key or str(index_path)).encode("utf-8")).hexdigest()[:16]
+        path_hash = hashlib.sha1(str(index_path).encode("utf-8")).hexdigest()[:8]
+        name = f"{prefix}-{path_hash}-{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+        shared_dir = _shared_dir().resolve()
+        vectors_path = shared_dir / f"{name}.vectors.npy"
+        ids_path = shared_dir / f"{name}.ids.npy"
+
+        if not vectors_path.exists():
+            vectors, ids = _export_flat(faiss.read_index(str(index_path)))
+            if ids is not None:
+                _save_replacing(ids_path, ids)
+            # Vectors last: their presence marks a complete export
+            _save_replacing(vectors_path, np.ascontiguousarray(vectors, dtype="float32"))
+            del vectors
+
+            for stale in shared_dir.glob(f"{prefix}-*"):
+                if not stale.name.startswith(name):
+                    stale.unlink(missing_ok=True)
+
+        paths = [str(vectors_path)]
+        ids = None
+        if ids_path.exists():
+            ids = np.load(ids_path, mmap_mode="r")
+            paths.append(str(ids_path))
+        return cls(np.load(vectors_path, mmap_mode="r"), ids, paths)
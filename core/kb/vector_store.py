@@ -1,28 +1,37 @@
 import faiss
-import pickle
+import numpy as np
 import os
 
+from core.kb.chunk_store import ChunkStore, load_chunk_store
+from core.kb.index_factory import read_index, write_index
+
+
+def save_faiss_index(embeddings, texts, metadatas, output_dir: str):
+    """
+    Saves FAISS index and chunk store for a KB directory
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    embeddings = np.asarray(embeddings, dtype="float32")
+    index = faiss.IndexFlatL2(embeddings.shape[1])
+    index.add(embeddings)
+    write_index(index, os.path.join(output_dir, "faiss.index"))
+
+    ChunkStore.write(output_dir, texts, [m.get("source", "") for m in metadatas])
+
 
 def load_faiss_index(kb_dir: str):
     """
-    Loads FAISS index and metadata for querying
+    Loads FAISS index and chunk store for querying
     """
     index_path = os.path.join(kb_dir, "faiss.index")
-    meta_path = os.path.join(kb_dir, "metadata.pkl")
 
     if not os.path.exists(index_path):
         raise FileNotFoundError("FAISS index not found")
 
-    if not os.path.exists(meta_path):
-        raise FileNotFoundError("Metadata file not found")
-
-    index = faiss.read_index(index_path)
-
-    with open(meta_path, "rb") as f:
-        data = pickle.load(f)
+    # Migrates a legacy metadata.pkl on first load
+    data = load_chunk_store(kb_dir)
 
-    # Handle legacy format where only metadatas list was saved
-    if isinstance(data, list):
-        raise ValueError("Legacy Knowledge Base detected. Please re-crawl the website to update the data structure.")
+    index = read_index(index_path, data.index_type)
 
     return index, data
@@ -0,0 +1,206 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    return _WHITESPACE.sub(" ", question).strip().lower()
+
+
+class _Entry:
+    __slots__ = ("vector", "answer", "sources", "created", "llm_seconds")
+
+    def __init__(self, vector, answer, sources, llm_seconds):
+        self.vector = vector
+        self.answer = answer
+        self.sources = sources
+        self.created = time.monotonic()
+        self.llm_seconds = llm_seconds
+
+
+class _KBBucket:
+    def __init__(self, version: Optional[str] = None):
+        # KB version the answers were generated from
+        self.version = version
+        self.entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # Stacked entry vectors for similarity lookups, rebuilt lazily
+        self.keys: List[str] = []
+        self.matrix: Optional[np.ndarray] = None
+
+
+class AnswerCache:
+    """
+    Per-KB cache of generated answers.
+
+    Questions that normalize to the same text hit without embedding;
+    otherwise the query embedding is compared (cosine) against the KB's
+    cached questions and reused above ``similarity``. Each KB keeps at
+    most ``max_entries`` (LRU) and entries expire after ``ttl_seconds``.
+    Answers are tied to the KB version they came from and dropped once a
+    different version is looked up.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, similarity: float, enabled: bool = True):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+
+        self._buckets: Dict[str, _KBBucket] = {}
+        self._lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.saved_llm_seconds = 0.0
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype="float32").reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expired(self, entry: _Entry) -> bool:
+        return time.monotonic() - entry.created > self.ttl_seconds
+
+    def _drop(self, bucket: _KBBucket, key: str) -> None:
+        del bucket.entries[key]
+        bucket.matrix = None
+
+    def _hit(self, bucket: _KBBucket, key: str) -> Tuple[str, List[str]]:
+        entry = bucket.entries[key]
+        bucket.entries.move_to_end(key)
+        self.saved_llm_seconds += entry.llm_seconds
+        return entry.answer, list(entry.sources)
+
+    def _bucket(self, kb_id: str, version: Optional[str]) -> Optional[_KBBucket]:
+        # Caller holds self._lock
+        bucket = self._buckets.get(kb_id)
+        if bucket is not None and version is not None and bucket.version != version:
+            del self._buckets[kb_id]
+            self.invalidations += 1
+            return None
+        return bucket
+
+    def lookup(
+        self, kb_id: str, question: str, query_vec=None, version: Optional[str] = None
+    ) -> Optional[Tuple[str, List[str]]]:
+        """
+        Cached (answer, sources) or None. Without ``query_vec`` only exact
+        (normalized) matches are checked and a miss is not counted, so
+        callers can probe cheaply before embedding.
+        """
+        if not self.enabled:
+            return None
+        key = normalize_question(question)
+        with self._lock:
+            bucket = self._bucket(kb_id, version)
+            if bucket is not None:
+                entry = bucket.entries.get(key)
+                if entry is not None:
+                    if not self._expired(entry):
+                        self.exact_hits += 1
+                        return self._hit(bucket, key)
+                    self._drop(bucket, key)
+                    self.expirations += 1
+
+                if query_vec is not None and bucket.entries:
+                    if bucket.matrix is None:
+                        bucket.keys = list(bucket.entries)
+                        bucket.matrix = np.stack([bucket.entries[k].vector for k in bucket.keys])
+                    scores = bucket.matrix @ self._unit(query_vec)
+                    for row in np.argsort(-scores):
+                        if scores[row] < self.similarity:
+                            break
+                        candidate = bucket.keys[row]
+                        if self._expired(bucket.entries[candidate]):
+                            continue
+                        self.similar_hits += 1
+                        return self._hit(bucket, candidate)
+
+            if query_vec is not None:
+                self.misses += 1
+        return None
+
+    def put(
+        self,
+        kb_id: str,
+        question: str,
+        query_vec,
+        answer: str,
+        sources: List[str],
+        llm_seconds: float,
+        version: Optional[str] = None,
+    ) -> None:
+        if not self.enabled:
+            return
+        key = normalize_question(question)
+        with self._lock:
+            bucket = self._buckets.get(kb_id)
+            if bucket is None:
+                bucket = self._buckets[kb_id] = _KBBucket(version)
+            elif version is not None and bucket.version != version:
+                # Answer of a request that started before / after a publish:
+                # don't cache it, and leave version eviction to lookup
+                return
+            if key in bucket.entries:
+                del bucket.entries[key]
+            bucket.entries[key] = _Entry(self._unit(query_vec), answer, list(sources), llm_seconds)
+            bucket.matrix = None
+
+            while len(bucket.entries) > self.max_entries:
+                oldest = next(iter(bucket.entries))
+                entry = bucket.entries.pop(oldest)
+                if self._expired(entry):
+                    self.expirations += 1
+                else:
+                    self.evictions += 1
+
+    def invalidate(self, kb_id: str) -> None:
+        """Forget every answer for a KB (after rebuild or delete)"""
+        with self._lock:
+            if self._buckets.pop(kb_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.exact_hits + self.similar_hits
+            lookups = hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "kbs": len(self._buckets),
+                "entries": sum(len(b.entries) for b in self._buckets.values()),
+                "exact_hits": self.exact_hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": (hits / lookups) if lookups else 0.0,
+                "saved_llm_seconds": round(self.saved_llm_seconds, 3),
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "similarity": self.similarity,
+                "ttl_seconds": self.ttl_seconds,
+                "max_entries_per_kb": self.max_entries,
+            }
+
+
+answer_cache = AnswerCache(
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000")),
+    ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600")),
+    similarity=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95")),
+    enabled=os.getenv("ANSWER_CACHE", "1") != "0",
+)
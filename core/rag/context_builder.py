@@ -0,0 +1,154 @@
+import os
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+_WHITESPACE = re.compile(r"\s+")
+_WORD = re.compile(r"\w+")
+# Rough BPE estimate when tiktoken is unavailable: short letter runs,
+# up to 3 digits and each punctuation mark count as one token
+_TOKEN_PIECES = re.compile(r"[^\W\d_]{1,7}|\d{1,3}|[^\w\s]|_")
+
+SHINGLE_SIZE = 3
+# Longest chunk overlap looked for when merging neighbours (splitter uses 100)
+MAX_OVERLAP_CHARS = 300
+MIN_OVERLAP_CHARS = 12
+
+
+class ContextChunk(NamedTuple):
+    text: str
+    source: Optional[str]
+    chunk_id: int
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(os.getenv("CONTEXT_TOKENIZER", "cl100k_base"))
+    except Exception:
+        # Not installed, or the BPE file can't be fetched (offline)
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Prompt tokens of ``text`` (tiktoken when available, else a regex estimate)"""
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(_TOKEN_PIECES.findall(text))
+
+
+def _shingles(text: str) -> set:
+    words = _WORD.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _strip_overlap(left: str, right: str) -> str:
+    """``right`` without the prefix it shares with the end of ``left``"""
+    for size in range(min(len(left), len(right), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return right[size:].lstrip()
+    return right
+
+
+class _Block:
+    __slots__ = ("rank", "source", "first_id", "last_id", "text", "chunks")
+
+    def __init__(self, rank: int, chunk: ContextChunk):
+        self.rank = rank
+        self.source = chunk.source
+        self.first_id = self.last_id = chunk.chunk_id
+        self.text = chunk.text
+        self.chunks = 1
+
+
+def assemble_context(
+    chunks: Sequence[ContextChunk],
+    token_budget: Optional[int] = None,
+    similarity: Optional[float] = None,
+) -> Tuple[List[ContextChunk], Dict[str, Any]]:
+    """
+    Turn ranked retrieval hits into the context actually sent to the LLM.
+
+    1. Drop chunks whose word shingles are at least ``similarity``
+       contained in a better-ranked chunk (repeated boilerplate, overlap).
+    2. Merge chunks that are neighbours on the same page (consecutive
+       chunk ids) into one passage, removing the splitter overlap.
+    3. Greedily pack passages, best rank first, into ``token_budget``
+       prompt tokens (0 = unlimited). If not even the best passage fits,
+       it is cut to the budget.
+
+    Returns the packed passages (best first) and stats for the response.
+    """
+    if token_budget is None:
+        token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+    if similarity is None:
+        similarity = float(os.getenv("CONTEXT_DEDUP_SIMILARITY", "0.8"))
+
+    # 1️⃣ Near-duplicate removal
+    kept: List[ContextChunk] = []
+    kept_shingles: List[set] = []
+    seen_texts = set()
+    for chunk in chunks:
+        normalized = _WHITESPACE.sub(" ", chunk.text).strip().lower()
+        if not normalized or normalized in seen_texts:
+            continue
+        shingles = _shingles(normalized)
+        if any(len(shingles & other) >= similarity * len(shingles) for other in kept_shingles):
+            continue
+        seen_texts.add(normalized)
+        kept.append(chunk)
+        kept_shingles.append(shingles)
+
+    # 2️⃣ Merge page neighbours (walk each source in chunk-id order)
+    blocks: List[_Block] = []
+    by_position = sorted(
+        range(len(kept)),
+        key=lambda i: (kept[i].source is None, kept[i].source or "", kept[i].chunk_id)
+    )
+    previous: Optional[_Block] = None
+    for i in by_position:
+        chunk = kept[i]
+        if (
+            previous is not None
+            and chunk.source is not None
+            and chunk.source == previous.source
+            and chunk.chunk_id == previous.last_id + 1
+        ):
+            previous.text = f"{previous.text} {_strip_overlap(previous.text, chunk.text)}".rstrip()
+            previous.last_id = chunk.chunk_id
+            previous.rank = min(previous.rank, i)
+            previous.chunks += 1
+            continue
+        previous = _Block(i, chunk)
+        blocks.append(previous)
+    blocks.sort(key=lambda block: block.rank)
+
+    # 3️⃣ Pack into the token budget
+    packed: List[ContextChunk] = []
+    used_tokens = 0
+    for block in blocks:
+        tokens = count_tokens(block.text)
+        if token_budget and used_tokens + tokens > token_budget:
+            continue
+        packed.append(ContextChunk(block.text, block.source, block.first_id))
+        used_tokens += tokens
+
+    if not packed and blocks:
+        block = blocks[0]
+        text = block.text[:len(block.text) * token_budget // max(count_tokens(block.text), 1)]
+        packed.append(ContextChunk(text, block.source, block.first_id))
+        used_tokens = count_tokens(text)
+
+    return packed, {
+        "retrieved_chunks": len(chunks),
+        "duplicates_dropped": len(chunks) - len(kept),
+        "chunks_merged": len(kept) - len(blocks),
+        "passages_used": len(packed),
+        "context_tokens_before": sum(count_tokens(chunk.text) for chunk in chunks),
+        "context_tokens_after": used_tokens,
+        "token_budget": token_budget,
+    }
@@ -1,11 +1,29 @@
-from sentence_transformers import SentenceTransformer
-from langchain_groq import ChatGroq
+import os
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from core.kb.bm25 import reciprocal_rank_fusion
+from core.kb.index_factory import search_params
+from core.rag.context_builder import ContextChunk, assemble_context, count_tokens
+from core.rag.answer_cache import answer_cache
+from core.rag.query_embedder import get_query_embedder
+from core.rag.registry import get_llm, kb_cache
+from core.rag.reranker import get_reranker, rerank_settings
+from utils.executors import llm_semaphore, run_blocking
+from utils.metrics import observe, timed
+
+NO_ANSWER = "I don't know based on the website content."
 
 
 class RAGBot:
     def __init__(self, kb_id: str, storage):
         """
-        Initialize RAG bot with storage backend
+        Initialize RAG bot with storage backend.
+
+        The embedder, LLM client and loaded KB come from the process-wide
+        registry, so constructing a bot per request is cheap once warm.
         
         Args:
             kb_id: Knowledge base identifier
@@ -14,50 +32,103 @@ class RAGBot:
         self.kb_id = kb_id
         self.storage = storage
 
-        # Embedding model
-        self.embedder = SentenceTransformer("all-MiniLM-L6-v2")
+        # Query embeddings (shared LRU + micro-batching over the embedder)
+        self.embedder = get_query_embedder()
 
-        # Load FAISS index + metadata from storage
-        self.index, self.data = storage.load_kb(kb_id)
+        # FAISS index + metadata (LRU-cached per kb_id)
+        self.index, self.data = kb_cache.get(kb_id, storage)
+        # Cached answers are only reused for the version they came from
+        self.version = self.data.version
 
-        # LLM
-        self.llm = ChatGroq(
-            model="llama-3.1-8b-instant",
-            temperature=0.2
-        )
+        # LLM (shared)
+        self.llm = get_llm()
 
-    def retrieve(self, query: str, k: int = 10):
-        query_vec = self.embedder.encode([query])
-        distances, indices = self.index.search(query_vec, k)
+    def retrieve(self, query: str, k: int = 10, ef_search: int = None, nprobe: int = None):
+        with timed("query_embed"):
+            query_vec = self.embedder.encode([query])
+        return self.search(query_vec, k=k, ef_search=ef_search, nprobe=nprobe, queries=[query])[0]
 
-        texts = []
-        sources = set()
+    def search(
+        self,
+        query_vecs,
+        k: int = 10,
+        ef_search: int = None,
+        nprobe: int = None,
+        queries: Optional[List[str]] = None,
+        mode: Optional[str] = None,
+        vector_weight: Optional[float] = None,
+        lexical_weight: Optional[float] = None,
+    ):
+        """
+        One multi-row FAISS search for already-encoded queries.
+        Returns a (chunks, sources) pair per query row, chunks being
+        ContextChunk hits in rank order.
 
-        for idx in indices[0]:
-            idx = int(idx)  # FAISS → list index
+        In "hybrid" mode (RETRIEVAL_MODE, the default), when the query
+        texts are given and the KB has a BM25 index, the top
+        HYBRID_CANDIDATES of each retriever are fused with weighted
+        reciprocal rank fusion before taking the top k.
 
-            # Safety guard
-            if idx < 0 or idx >= len(self.data["texts"]):
-                continue
+        When reranking is enabled for the KB (see rerank_settings), the
+        top ``candidates`` are rescored with the cross-encoder and its
+        ``top_n`` kept; over the latency budget they keep retrieval order.
+        """
+        mode = mode or os.getenv("RETRIEVAL_MODE", "hybrid")
+        bm25 = self.data.bm25 if mode == "hybrid" and queries is not None else None
+        rerank = rerank_settings(self.kb_id) if queries is not None else None
+        fetch = max(k, rerank["candidates"]) if rerank is not None else k
+        candidates = max(fetch, int(os.getenv("HYBRID_CANDIDATES", "50"))) if bm25 is not None else fetch
 
-            texts.append(self.data["texts"][idx])
+        with timed("vector_search"):
+            distances, indices = self.index.search(
+                np.asarray(query_vecs, dtype="float32"),
+                candidates,
+                params=search_params(self.index, ef_search=ef_search, nprobe=nprobe)
+            )
 
-            metadata = self.data["metadatas"][idx]
-            source = metadata.get("source")
-            if source:
-                sources.add(source)
+        results = []
+        for i, chunk_ids in enumerate(indices):
+            # FAISS ids -> chunk store rows (-1 for padding / unknown ids)
+            rows = [int(row) for row in self.data.rows_for_ids(chunk_ids) if row >= 0]
+            if bm25 is not None:
+                with timed("lexical_search"):
+                    lexical_rows, _ = bm25.search(queries[i], candidates)
+                rows = reciprocal_rank_fusion(
+                    [rows, lexical_rows.tolist()],
+                    weights=[
+                        vector_weight if vector_weight is not None else float(os.getenv("HYBRID_VECTOR_WEIGHT", "1.0")),
+                        lexical_weight if lexical_weight is not None else float(os.getenv("HYBRID_LEXICAL_WEIGHT", "1.0")),
+                    ],
+                    k=fetch,
+                    rrf_k=float(os.getenv("HYBRID_RRF_K", "60")),
+                )
+            if rerank is not None:
+                rows = rows[:fetch]
+                with timed("rerank"):
+                    order = get_reranker().rerank(
+                        queries[i], [self.data.text(row) for row in rows], rerank["budget_ms"]
+                    )
+                if order is not None:
+                    rows = [rows[position] for position in order[:rerank["top_n"]]]
+            results.append(self._collect(rows[:k]))
+        return results
 
-        return texts, list(sources)
+    def _collect(self, rows):
+        chunks = []
+        sources = set()
 
-    def ask(self, question: str):
-        contexts, sources = self.retrieve(question)
+        for row in rows:
+            source = self.data.source(row)
+            chunks.append(ContextChunk(self.data.text(row), source, int(self.data.ids[row])))
+            if source:
+                sources.add(source)
 
-        if not contexts:
-            return "I don't know based on the website content.", []
+        return chunks, list(sources)
 
-        context_text = "\n\n".join(contexts)
+    def build_prompt(self, question: str, contexts):
+        context_text = "\n\n".join(chunk.text for chunk in contexts)
 
-        prompt = f"""
+        return f"""
 You are a helpful assistant answering questions about a website.
 
 Use ONLY the context below to answer.
@@ -74,7 +145,169 @@ Question:
 {question}
 """
 
-        response = self.llm.invoke(prompt)
+    def prepare_prompt(self, question: str, chunks):
+        """
+        Dedup / merge / budget-pack the retrieved chunks (see
+        assemble_context) and build the prompt.
+        Returns (prompt, sources of the packed passages, context stats).
+        """
+        with timed("context_build"):
+            packed, stats = assemble_context(chunks)
+            prompt = self.build_prompt(question, packed)
+            stats["prompt_tokens_before"] = count_tokens(self.build_prompt(question, chunks))
+            stats["prompt_tokens_after"] = count_tokens(prompt)
+        sources = list(dict.fromkeys(chunk.source for chunk in packed if chunk.source))
+        return prompt, sources, stats
+
+    def cached_or_search(self, question: str, query_vec):
+        """
+        Semantic answer-cache lookup, else search.
+        Returns (cached (answer, sources) or None, contexts, sources).
+        """
+        cached = answer_cache.lookup(self.kb_id, question, query_vec, version=self.version)
+        if cached is not None:
+            return cached, [], []
+        contexts, sources = self.search(query_vec[None, :], queries=[question])[0]
+        return None, contexts, sources
+
+    def retrieve_or_cached(self, question: str):
+        """Embed + cached_or_search(); returns (query_vec, cached, contexts, sources)"""
+        with timed("query_embed"):
+            query_vec = self.embedder.encode([question])[0]
+        return (query_vec, *self.cached_or_search(question, query_vec))
+
+    async def aretrieve_or_cached(self, question: str):
+        """Async retrieve_or_cached(): the embedding wait holds no executor thread"""
+        with timed("query_embed"):
+            query_vec = (await self.embedder.aencode([question]))[0]
+        result = await run_blocking("retrieval", self.cached_or_search, question, query_vec)
+        return (query_vec, *result)
+
+    def ask(self, question: str):
+        """
+        Returns (answer, sources, context stats); stats are None for
+        cached answers.
+        """
+        cached = answer_cache.lookup(self.kb_id, question, version=self.version)
+        if cached is not None:
+            return (*cached, None)
 
-        return response.content.strip(), sources
+        query_vec, cached, contexts, sources = self.retrieve_or_cached(question)
+        if cached is not None:
+            return (*cached, None)
+
+        if not contexts:
+            return NO_ANSWER, [], None
+
+        prompt, sources, stats = self.prepare_prompt(question, contexts)
+        started = time.perf_counter()
+        with timed("llm"):
+            response = self.llm.invoke(prompt)
+        answer = response.content.strip()
+
+        answer_cache.put(
+            self.kb_id, question, query_vec, answer, sources, time.perf_counter() - started,
+            version=self.version
+        )
+        return answer, sources, stats
+
+    async def aask(self, question: str):
+        """
+        Async variant of ask(): the query embedding is micro-batched with
+        concurrent requests, FAISS search runs on the bounded retrieval
+        executor and the Groq call goes through the async client.
+        """
+        cached = answer_cache.lookup(self.kb_id, question, version=self.version)
+        if cached is not None:
+            return (*cached, None)
+
+        query_vec, cached, contexts, sources = await self.aretrieve_or_cached(question)
+        if cached is not None:
+            return (*cached, None)
+        return await self.agenerate(question, contexts, sources, query_vec=query_vec)
+
+    async def agenerate(self, question: str, contexts, sources, query_vec=None):
+        """
+        LLM answer for already-retrieved contexts (cached if query_vec is
+        given). Returns (answer, sources, context stats).
+        """
+        if not contexts:
+            return NO_ANSWER, [], None
+
+        prompt, sources, stats = self.prepare_prompt(question, contexts)
+        async with llm_semaphore():
+            started = time.perf_counter()
+            with timed("llm"):
+                response = await self.llm.ainvoke(prompt)
+        answer = response.content.strip()
+
+        if query_vec is not None:
+            answer_cache.put(
+                self.kb_id, question, query_vec, answer, sources, time.perf_counter() - started,
+                version=self.version
+            )
+        return answer, sources, stats
+
+    async def astream(self, question: str):
+        """
+        Streaming variant of aask(). Yields events as dicts:
+        {"type": "sources"} once retrieval is done, then {"type": "token"}
+        per LLM chunk, then {"type": "done"} with timings and context
+        stats (prompt tokens before / after packing). Closing the
+        generator (client went away) cancels the in-flight LLM stream.
+        A cached answer arrives as a single token event.
+        """
+        started = time.perf_counter()
+        cached = answer_cache.lookup(self.kb_id, question, version=self.version)
+        if cached is None:
+            query_vec, cached, contexts, sources = await self.aretrieve_or_cached(question)
+        retrieval_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        if cached is not None:
+            answer, sources = cached
+            yield {"type": "sources", "sources": sources}
+            yield {"type": "token", "content": answer}
+            yield {"type": "done", "cached": True, "timings": {"retrieval_ms": retrieval_ms}}
+            return
+
+        if not contexts:
+            yield {"type": "sources", "sources": []}
+            yield {"type": "token", "content": NO_ANSWER}
+            yield {"type": "done", "timings": {"retrieval_ms": retrieval_ms}}
+            return
+
+        prompt, sources, stats = self.prepare_prompt(question, contexts)
+        yield {"type": "sources", "sources": sources}
+
+        first_token_ms = None
+        tokens = []
+        async with llm_semaphore():
+            llm_started = time.perf_counter()
+            stream = self.llm.astream(prompt)
+            try:
+                async for chunk in stream:
+                    if not chunk.content:
+                        continue
+                    if first_token_ms is None:
+                        first_token_ms = round((time.perf_counter() - started) * 1000, 2)
+                    tokens.append(chunk.content)
+                    yield {"type": "token", "content": chunk.content}
+            finally:
+                await stream.aclose()
+                observe("llm", time.perf_counter() - llm_started)
+
+        # Only complete answers are cached (not streams cut off by the client)
+        answer_cache.put(
+            self.kb_id, question, query_vec, "".join(tokens).strip(), sources,
+            time.perf_counter() - llm_started, version=self.version
+        )
 
+        yield {
+            "type": "done",
+            "context": stats,
+            "timings": {
+                "retrieval_ms": retrieval_ms,
+                "first_token_ms": first_token_ms,
+                "total_ms": round((time.perf_counter() - started) * 1000, 2),
+            },
+        }
@@ -0,0 +1,175 @@
+import asyncio
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from core.rag.registry import get_embedder
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    # Whitespace only: case can matter to cased embedding models
+    return _WHITESPACE.sub(" ", query).strip()
+
+
+class QueryEmbedder:
+    """
+    Shared encoder for chat queries.
+
+    Embeddings are memoized per normalized query (LRU, ``max_entries``).
+    Misses are queued for a single batcher thread, which waits up to
+    ``window_ms`` after the first request for more to arrive and encodes
+    them (deduplicated, at most ``max_batch``) in one forward pass, so
+    concurrent requests share a batch instead of each running a batch of one.
+
+    ``encode`` mirrors SentenceTransformer.encode for drop-in use from
+    threads; ``aencode`` waits without occupying an executor thread.
+    """
+
+    def __init__(
+        self,
+        embedder=None,
+        max_entries: Optional[int] = None,
+        window_ms: Optional[float] = None,
+        max_batch: Optional[int] = None,
+    ):
+        self._embedder = embedder
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("QUERY_EMBED_CACHE_SIZE", "10000"))
+        self.window_ms = window_ms if window_ms is not None else float(os.getenv("QUERY_EMBED_WINDOW_MS", "3"))
+        self.max_batch = max_batch or int(os.getenv("QUERY_EMBED_MAX_BATCH", "64"))
+
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+        self.batched_queries = 0
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            self._embedder = get_embedder()
+        return self._embedder
+
+    # ----------------------------
+    # Submission
+    # ----------------------------
+    def submit(self, query: str) -> Future:
+        """Future resolving to the float32 embedding of ``query``"""
+        key = normalize_query(query)
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                future: Future = Future()
+                future.set_result(vector)
+                return future
+
+            # Identical query already waiting for a batch
+            future = self._inflight.get(key)
+            if future is not None:
+                self.hits += 1
+                return future
+
+            self.misses += 1
+            future = Future()
+            self._inflight[key] = future
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="query-embedder", daemon=True)
+                self._worker.start()
+        self._queue.put(key)
+        return future
+
+    def encode(self, texts: List[str], **kwargs) -> np.ndarray:
+        futures = [self.submit(text) for text in texts]
+        return np.stack([future.result() for future in futures])
+
+    async def aencode(self, texts: List[str]) -> np.ndarray:
+        futures = [asyncio.wrap_future(self.submit(text)) for text in texts]
+        return np.stack(await asyncio.gather(*futures))
+
+    # ----------------------------
+    # Batcher
+    # ----------------------------
+    def _run(self) -> None:
+        while True:
+            keys = [self._queue.get()]
+            deadline = time.perf_counter() + self.window_ms / 1000
+            while len(keys) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    # Past the window, still take whatever is already queued
+                    if remaining > 0:
+                        keys.append(self._queue.get(timeout=remaining))
+                    else:
+                        keys.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._encode_batch(keys)
+
+    def _encode_batch(self, keys: List[str]) -> None:
+        try:
+            vectors = np.asarray(
+                self.embedder.encode(keys, batch_size=len(keys), show_progress_bar=False),
+                dtype="float32"
+            )
+        except Exception as e:
+            with self._lock:
+                futures = [self._inflight.pop(key) for key in keys]
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        with self._lock:
+            self.batches += 1
+            self.batched_queries += len(keys)
+            futures = []
+            for key, vector in zip(keys, vectors):
+                if self.max_entries > 0:
+                    self._cache[key] = vector
+                futures.append(self._inflight.pop(key))
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        for future, vector in zip(futures, vectors):
+            future.set_result(vector)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "batches": self.batches,
+                "avg_batch_size": (self.batched_queries / self.batches) if self.batches else 0.0,
+                "window_ms": self.window_ms,
+                "max_batch": self.max_batch,
+            }
+
+
+_query_embedder: Optional[QueryEmbedder] = None
+_query_embedder_lock = threading.Lock()
+
+
+def get_query_embedder() -> QueryEmbedder:
+    """Process-wide query embedding service over the shared embedder"""
+    global _query_embedder
+    if _query_embedder is None:
+        with _query_embedder_lock:
+            if _query_embedder is None:
+                _query_embedder = QueryEmbedder()
+    return _query_embedder
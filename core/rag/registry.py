@@ -0,0 +1,275 @@
+import logging
+import os
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from core.kb.catalog import kb_catalog
+from utils.memory import mapped_usage, process_memory, read_smaps
+from utils.metrics import log_event
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+LLM_MODEL_NAME = "llama-3.1-8b-instant"
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+DEFAULT_ONNX_FILES = {"onnx": "onnx/model.onnx", "onnx-int8": "onnx/model_quint8_avx2.onnx"}
+RERANK_MODEL_NAME = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+_model_lock = threading.Lock()
+_embedder = None
+_embedder_backend = None
+_cross_encoder = None
+_llm = None
+
+
+def load_embedder(backend: str):
+    """
+    SentenceTransformer for EMBEDDING_MODEL_NAME on an inference backend:
+    "torch" (full precision), "onnx" (ONNX Runtime, fp32) or "onnx-int8"
+    (ONNX Runtime, dynamically quantized weights). All expose the same
+    ``encode``; ONNX backends need ``sentence-transformers[onnx]``.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        return SentenceTransformer(EMBEDDING_MODEL_NAME)
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+
+    return SentenceTransformer(
+        EMBEDDING_MODEL_NAME,
+        device="cpu",
+        backend="onnx",
+        model_kwargs={
+            "file_name": onnx_file(backend),
+            "provider": "CPUExecutionProvider",
+        },
+    )
+
+
+def onnx_file(backend: str) -> str:
+    """ONNX export an ONNX backend loads (EMBEDDING_ONNX_FILE overrides the default)"""
+    return os.getenv("EMBEDDING_ONNX_FILE", DEFAULT_ONNX_FILES[backend])
+
+
+def get_embedder():
+    """Return the process-wide embedder (EMBEDDING_BACKEND), loading it on first use"""
+    global _embedder, _embedder_backend
+    if _embedder is None:
+        with _model_lock:
+            if _embedder is None:
+                backend = os.getenv("EMBEDDING_BACKEND", "torch")
+                try:
+                    _embedder = load_embedder(backend)
+                except Exception as e:
+                    if backend == "torch":
+                        raise
+                    log_event("embedding_backend_fallback", logging.WARNING, backend=backend, fallback="torch", error=str(e))
+                    backend = "torch"
+                    _embedder = load_embedder(backend)
+                _embedder_backend = backend
+    return _embedder
+
+
+def embedding_model_id() -> str:
+    """
+    Model + backend (+ ONNX file, when overridden) of the loaded embedder,
+    for namespacing stored embeddings (quantized vectors are close to, not
+    equal to, fp32 ones, and EMBEDDING_ONNX_FILE may point either backend
+    at any export).
+    """
+    get_embedder()
+    if _embedder_backend == "torch":
+        return EMBEDDING_MODEL_NAME
+    model_id = f"{EMBEDDING_MODEL_NAME}-{_embedder_backend}"
+    file_name = onnx_file(_embedder_backend)
+    if file_name != DEFAULT_ONNX_FILES[_embedder_backend]:
+        model_id += "-" + Path(file_name).stem
+    return model_id
+
+
+def get_cross_encoder():
+    """Return the process-wide reranking CrossEncoder, loading it on first use"""
+    global _cross_encoder
+    if _cross_encoder is None:
+        with _model_lock:
+            if _cross_encoder is None:
+                from sentence_transformers import CrossEncoder
+                _cross_encoder = CrossEncoder(RERANK_MODEL_NAME, device="cpu")
+    return _cross_encoder
+
+
+def get_llm():
+    """Return the process-wide ChatGroq client, creating it on first use"""
+    global _llm
+    if _llm is None:
+        with _model_lock:
+            if _llm is None:
+                from langchain_groq import ChatGroq
+                _llm = ChatGroq(
+                    model=LLM_MODEL_NAME,
+                    temperature=0.2
+                )
+    return _llm
+
+
+def estimate_kb_bytes(index: Any, data: Any) -> int:
+    """Approximate resident size of a loaded KB (vectors + chunk store)"""
+    vector_bytes = int(index.ntotal) * int(index.d) * 4
+    return vector_bytes + data.nbytes
+
+
+class KBCache:
+    """
+    Thread-safe LRU cache of loaded knowledge bases keyed by kb_id.
+
+    Entries are evicted least-recently-used first once the summed estimated
+    size exceeds ``max_bytes``. Concurrent misses for the same kb_id share a
+    single load. Each lookup checks the KB's live version (from the
+    in-process catalog, or storage for KBs it doesn't know yet), so a KB
+    republished by another process is reloaded once the catalog sees it.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Any, Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._generations: Dict[str, int] = {}
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.reloads = 0
+
+    def _lookup(self, kb_id: str, version: Optional[str]) -> Optional[Tuple[Any, Any, int]]:
+        # Caller holds self._lock
+        entry = self._entries.get(kb_id)
+        if entry is None:
+            return None
+        if version is not None and entry[1].version != version:
+            # Superseded by a newer published version
+            self._entries.pop(kb_id)
+            self._bytes -= entry[2]
+            self.reloads += 1
+            return None
+        self._entries.move_to_end(kb_id)
+        return entry
+
+    def get(self, kb_id: str, storage) -> Tuple[Any, Any]:
+        """Return (faiss_index, chunk_store) for kb_id, loading from storage on a miss"""
+        # Catalog: no storage I/O on the request path
+        known = kb_catalog.get(kb_id)
+        version = known["version"] if known is not None else storage.current_version(kb_id)
+        with self._lock:
+            entry = self._lookup(kb_id, version)
+            if entry is not None:
+                self.hits += 1
+                return entry[0], entry[1]
+            self.misses += 1
+            load_lock = self._load_locks.setdefault(kb_id, threading.Lock())
+
+        with load_lock:
+            # Another thread may have finished loading while we waited
+            with self._lock:
+                entry = self._lookup(kb_id, version)
+                if entry is not None:
+                    return entry[0], entry[1]
+                generation = self._generations.get(kb_id, 0)
+
+            try:
+                index, data = storage.load_kb(kb_id)
+                size = estimate_kb_bytes(index, data)
+
+                with self._lock:
+                    # Skip caching if the KB was invalidated during the load
+                    if self._generations.get(kb_id, 0) == generation:
+                        self._insert(kb_id, index, data, size)
+            finally:
+                with self._lock:
+                    self._load_locks.pop(kb_id, None)
+
+        return index, data
+
+    def _insert(self, kb_id: str, index: Any, data: Any, size: int) -> None:
+        previous = self._entries.pop(kb_id, None)
+        if previous is not None:
+            self._bytes -= previous[2]
+        if size > self.max_bytes:
+            return
+        while self._entries and self._bytes + size > self.max_bytes:
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+        self._entries[kb_id] = (index, data, size)
+        self._bytes += size
+
+    def invalidate(self, kb_id: str) -> None:
+        """Drop a KB from the cache (after rebuild or delete)"""
+        with self._lock:
+            self._generations[kb_id] = self._generations.get(kb_id, 0) + 1
+            entry = self._entries.pop(kb_id, None)
+            if entry is not None:
+                self._bytes -= entry[2]
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            for kb_id in list(self._entries):
+                self._generations[kb_id] = self._generations.get(kb_id, 0) + 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "kb_ids": list(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "reloads": self.reloads,
+            }
+
+    def memory(self) -> Dict[str, Any]:
+        """
+        Resident bytes of each cached KB in this process, from its mapped
+        files (index, chunk store, shared-memory vectors). pss_bytes well
+        below rss_bytes means the pages are shared with other workers;
+        heap_bytes estimates index data loaded privately instead.
+        """
+        with self._lock:
+            entries = [(kb_id, index, data) for kb_id, (index, data, _) in self._entries.items()]
+
+        mappings = read_smaps()
+        kbs = {}
+        for kb_id, index, data in entries:
+            shared_paths = list(getattr(index, "shared_paths", []))
+            index_files = set(shared_paths)
+            prefixes = list(shared_paths)
+            if data.path is not None:
+                kb_dir = Path(data.path).resolve()
+                index_files.add(str(kb_dir / "faiss.index"))
+                prefixes.append(str(kb_dir) + os.sep)
+            usage = mapped_usage(mappings, prefixes)
+            index_mapped = any(path in index_files for path, _ in mappings)
+            kbs[kb_id] = {
+                "index_type": data.index_type,
+                "vectors": int(index.ntotal),
+                "index_mapped": index_mapped,
+                **usage,
+                "heap_bytes": 0 if index_mapped else int(index.ntotal) * int(index.d) * 4,
+            }
+        return {"pid": os.getpid(), "process": process_memory(), "kbs": kbs}
+
+
+kb_cache = KBCache(
+    max_bytes=int(os.getenv("KB_CACHE_MAX_MB", "1024")) * 1024 * 1024
+)
@@ -0,0 +1,182 @@
+import json
+import logging
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from core.rag.registry import get_cross_encoder
+from utils.metrics import log_event
+
+# Weight of the newest measurement in the per-pair cost average
+COST_SMOOTHING = 0.2
+# Pairs scored after loading to seed the per-pair cost estimate
+CALIBRATION_PAIRS = 8
+CALIBRATION_PASSAGE = "calibration passage " * 40
+
+
+@lru_cache(maxsize=8)
+def _kb_overrides(raw: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        overrides = json.loads(raw) if raw else {}
+    except ValueError:
+        log_event("rerank_settings_invalid", logging.WARNING, setting="RERANK_KB_SETTINGS")
+        return {}
+    return overrides if isinstance(overrides, dict) else {}
+
+
+def rerank_settings(kb_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Rerank settings for a KB, or None when reranking is off for it.
+
+    Defaults come from RERANK / RERANK_CANDIDATES / RERANK_TOP_N /
+    RERANK_BUDGET_MS; RERANK_KB_SETTINGS (JSON object keyed by kb_id)
+    overrides any of them per KB, e.g.
+    {"docs_example_com": {"enabled": true, "top_n": 4, "budget_ms": 150}}.
+    """
+    settings = {
+        "enabled": os.getenv("RERANK", "0") == "1",
+        "candidates": int(os.getenv("RERANK_CANDIDATES", "30")),
+        "top_n": int(os.getenv("RERANK_TOP_N", "5")),
+        "budget_ms": float(os.getenv("RERANK_BUDGET_MS", "200")),
+    }
+    settings.update(_kb_overrides(os.getenv("RERANK_KB_SETTINGS", "")).get(kb_id, {}))
+    if not settings["enabled"]:
+        return None
+    return settings
+
+
+class Reranker:
+    """
+    Cross-encoder rerank stage over retrieval candidates.
+
+    Keeps a running average of the cost per (query, passage) pair so a
+    request can tell up front whether scoring its candidates fits the
+    latency budget: if not all of them fit, only the best-ranked prefix
+    that does is rescored; if fewer than two fit, the candidates keep
+    their retrieval order. The model loads in the background on first
+    use and is timed on a few calibration pairs before it serves, so the
+    budget holds from the first request; until then requests keep
+    retrieval order. A failed load is retried after RERANK_RETRY_SECONDS.
+    """
+
+    def __init__(self, model=None, batch_size: Optional[int] = None):
+        self._factory = (lambda: model) if model is not None else get_cross_encoder
+        self._model = None
+        self.batch_size = batch_size or int(os.getenv("RERANK_BATCH_SIZE", "32"))
+        self.retry_seconds = float(os.getenv("RERANK_RETRY_SECONDS", "60"))
+        self.ms_per_pair: Optional[float] = None
+
+        self._lock = threading.Lock()
+        self._loading = False
+        self._failed_at: Optional[float] = None
+        self.load_error: Optional[str] = None
+
+        self.reranked = 0
+        self.trimmed = 0
+        self.fallbacks = 0
+        self.scored_pairs = 0
+        self.rerank_ms = 0.0
+
+    def _calibrate(self, model) -> float:
+        """ms per pair on warm weights (the first predict pays for lazy init)"""
+        pairs = [("calibration query", CALIBRATION_PASSAGE)] * CALIBRATION_PAIRS
+        model.predict(pairs[:1], batch_size=self.batch_size, show_progress_bar=False)
+        started = time.perf_counter()
+        model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+        return max((time.perf_counter() - started) * 1000 / len(pairs), 1e-3)
+
+    def _load(self) -> None:
+        try:
+            model = self._factory()
+            ms_per_pair = self._calibrate(model)
+        except Exception as e:
+            log_event("rerank_load_failed", logging.ERROR, retry_seconds=self.retry_seconds, error=str(e))
+            with self._lock:
+                self._loading = False
+                self._failed_at = time.monotonic()
+                self.load_error = str(e)
+            return
+        with self._lock:
+            self.ms_per_pair = ms_per_pair
+            self._model = model
+            self._loading = False
+            self.load_error = None
+
+    def ready(self) -> bool:
+        """True once the model is loaded and calibrated; starts loading it otherwise"""
+        with self._lock:
+            if self._model is not None:
+                return True
+            backing_off = self._failed_at is not None and time.monotonic() - self._failed_at < self.retry_seconds
+            if not self._loading and not backing_off:
+                self._loading = True
+                threading.Thread(target=self._load, name="rerank-model", daemon=True).start()
+        return False
+
+    def rerank(self, query: str, passages: Sequence[str], budget_ms: float) -> Optional[List[int]]:
+        """
+        Positions of ``passages`` best first, or None to keep retrieval
+        order (model not ready, or the budget doesn't cover two pairs).
+        """
+        if len(passages) < 2:
+            return list(range(len(passages)))
+        if not self.ready():
+            with self._lock:
+                self.fallbacks += 1
+            return None
+
+        count = min(len(passages), int(budget_ms / self.ms_per_pair))
+        if count < 2:
+            with self._lock:
+                self.fallbacks += 1
+            return None
+
+        started = time.perf_counter()
+        scores = np.asarray(self._model.predict(
+            [(query, passage) for passage in passages[:count]],
+            batch_size=self.batch_size,
+            show_progress_bar=False
+        ), dtype="float32").reshape(-1)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        with self._lock:
+            cost = elapsed_ms / count
+            self.ms_per_pair = (1 - COST_SMOOTHING) * self.ms_per_pair + COST_SMOOTHING * cost
+            self.reranked += 1
+            self.trimmed += count < len(passages)
+            self.scored_pairs += count
+            self.rerank_ms += elapsed_ms
+
+        order = np.argsort(-scores, kind="stable").tolist()
+        return order + list(range(count, len(passages)))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "model_loaded": self._model is not None,
+                "load_error": self.load_error,
+                "reranked": self.reranked,
+                "trimmed_to_budget": self.trimmed,
+                "fallbacks": self.fallbacks,
+                "ms_per_pair": round(self.ms_per_pair, 3) if self.ms_per_pair is not None else None,
+                "avg_rerank_ms": round(self.rerank_ms / self.reranked, 2) if self.reranked else 0.0,
+                "avg_candidates": (self.scored_pairs / self.reranked) if self.reranked else 0.0,
+            }
+
+
+_reranker: Optional[Reranker] = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Reranker:
+    """Process-wide rerank stage over the shared cross-encoder"""
+    global _reranker
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                _reranker = Reranker()
+    return _reranker
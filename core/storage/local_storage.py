@@ -1,16 +1,39 @@
 import pickle
 import os
 import json
+import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
-import faiss
+from typing import Any, Dict, List, Optional, Tuple, Union
+import shutil
+import logging
+import threading
 
+from core.kb.index_factory import read_index, write_index
+from core.kb.chunk_store import LEGACY_METADATA_FILE, META_FILE, ChunkStore
+from utils.metrics import log_event, timed
+from core.storage.versions import (
+    LEGACY_VERSION,
+    POINTER_FILE,
+    VERSIONS_DIR,
+    describe_pointer,
+    expired_versions,
+    grace_seconds,
+    kb_info,
+    new_version_id,
+    next_pointer,
+)
 
 
 class LocalStorage:
     """
     Local file system storage backend for FAISS indexes and metadata.
     Used for development and testing.
+
+    Every save writes a new version directory (``<kb>/versions/<id>/``)
+    and then atomically replaces ``<kb>/current.json`` to point at it, so
+    readers see either the old or the new KB, never a mix, and a failed
+    build leaves the live version untouched. Superseded versions are
+    deleted after KB_VERSION_GRACE_SECONDS.
     """
 
     def __init__(self):
@@ -18,22 +41,82 @@ class LocalStorage:
         self.storage_root.mkdir(parents=True, exist_ok=True)
 
     def _get_kb_path(self, kb_id: str) -> Path:
-        """Get directory path for a knowledge base"""
-        kb_path = self.storage_root / kb_id
-        kb_path.mkdir(parents=True, exist_ok=True)
-        return kb_path
+        """Get directory path for a knowledge base (created by save_kb only)"""
+        return self.storage_root / kb_id
+
+    def _read_pointer(self, kb_path: Path) -> Optional[Dict]:
+        try:
+            with open(kb_path / POINTER_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+
+    def _write_pointer(self, kb_path: Path, pointer: Dict) -> None:
+        tmp_path = kb_path / f"{POINTER_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(pointer, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, kb_path / POINTER_FILE)
+
+    def _version_path(self, kb_path: Path, version: str) -> Path:
+        return kb_path if version == LEGACY_VERSION else kb_path / VERSIONS_DIR / version
+
+    def current_version(self, kb_id: str) -> Optional[str]:
+        """Live version of a KB ("legacy" for pre-versioning KBs), None if absent"""
+        kb_path = self._get_kb_path(kb_id)
+        pointer = self._read_pointer(kb_path)
+        if pointer is not None:
+            return pointer["version"]
+        return LEGACY_VERSION if (kb_path / "faiss.index").exists() else None
+
+    def _current_path(self, kb_id: str) -> Tuple[Optional[str], Path]:
+        kb_path = self._get_kb_path(kb_id)
+        version = self.current_version(kb_id)
+        return version, self._version_path(kb_path, version or LEGACY_VERSION)
 
     def kb_exists(self, kb_id: str) -> bool:
         """Check if a knowledge base exists locally"""
+        return self.current_version(kb_id) is not None
+
+    def describe_kb(self, kb_id: str) -> Optional[Dict]:
+        """Catalog entry (version, vectors, dim, index type, size, built-at), None if absent"""
         kb_path = self._get_kb_path(kb_id)
-        return (kb_path / "faiss.index").exists()
+        pointer = self._read_pointer(kb_path)
+        if pointer is not None and "info" in pointer:
+            return describe_pointer(kb_id, pointer)
+
+        # Legacy / pre-catalog version: derive from the files
+        version = self.current_version(kb_id)
+        if version is None:
+            return None
+        version_path = self._version_path(kb_path, version)
+        files = [path for path in version_path.iterdir() if path.is_file() and path.name != POINTER_FILE]
+        try:
+            with open(version_path / META_FILE, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            meta = {}
+        index = meta.get("info", {}).get("index", {})
+        return {
+            "kb_id": kb_id,
+            "version": version,
+            "built_at": (version_path / "faiss.index").stat().st_mtime,
+            "chunks": meta.get("count"),
+            "vectors": index.get("ntotal"),
+            "dim": index.get("dim"),
+            "index_type": index.get("index_type"),
+            "size_bytes": sum(path.stat().st_size for path in files),
+        }
 
+    @timed("storage_save", backend="local")
     def save_kb(
         self,
         kb_id: str,
         faiss_index: Any,
-        metadata: Dict,
-        raw_pages: Optional[List[Dict]] = None
+        metadata: Union[Dict, ChunkStore],
+        raw_pages: Optional[List[Dict]] = None,
+        extra_files: Optional[Dict[str, Union[bytes, str, Path]]] = None
     ) -> None:
         """
         Save knowledge base to local file system
@@ -41,50 +124,120 @@ class LocalStorage:
         Args:
             kb_id: Unique identifier for the knowledge base
             faiss_index: FAISS index object
-            metadata: Metadata dictionary (chunks, sources, etc.)
+            metadata: Metadata dictionary (chunks, sources, etc.) or a ChunkStore streamed to disk
             raw_pages: Optional raw page data
+            extra_files: Optional additional artifacts (filename -> bytes or path of a file to copy)
         """
-        kb_path = self._get_kb_path(kb_id)
+        kb_root = self._get_kb_path(kb_id)
+        version = new_version_id()
+        kb_path = self._version_path(kb_root, version)
+        kb_path.mkdir(parents=True)
         
         # Save FAISS index
         index_path = kb_path / "faiss.index"
-        faiss.write_index(faiss_index, str(index_path))
-        print(f"✅ Saved FAISS index locally: {index_path}")
+        write_index(faiss_index, index_path)
+        log_event("kb_artifact_saved", logging.DEBUG, backend="local", kb_id=kb_id, path=str(index_path))
         
-        # Save metadata
-        metadata_path = kb_path / "metadata.pkl"
-        with open(metadata_path, 'wb') as f:
-            pickle.dump(metadata, f)
-        print(f"✅ Saved metadata locally: {metadata_path}")
+        # Save chunk metadata as a columnar chunk store
+        ChunkStore.save(kb_path, metadata)
+        log_event("kb_artifact_saved", logging.DEBUG, backend="local", kb_id=kb_id, path=str(kb_path))
         
         # Save raw pages if provided
         if raw_pages:
             raw_pages_path = kb_path / "raw_pages.json"
             with open(raw_pages_path, 'w', encoding='utf-8') as f:
                 json.dump(raw_pages, f, indent=2)
-            print(f"✅ Saved raw pages locally: {raw_pages_path}")
+            log_event("kb_artifact_saved", logging.DEBUG, backend="local", kb_id=kb_id, path=str(raw_pages_path))
+
+        # Save additional artifacts if provided
+        for filename, content in (extra_files or {}).items():
+            if isinstance(content, (str, Path)):
+                shutil.copyfile(content, kb_path / filename)
+            else:
+                with open(kb_path / filename, 'wb') as f:
+                    f.write(content)
+            log_event("kb_artifact_saved", logging.DEBUG, backend="local", kb_id=kb_id, path=str(kb_path / filename))
+
+        size = sum(path.stat().st_size for path in kb_path.iterdir())
+        self._publish(kb_root, version, info=kb_info(metadata, size))
+
+    def _publish(self, kb_root: Path, version: str, info: Dict) -> None:
+        """Point the KB at ``version`` (atomic), then GC expired versions"""
+        previous = self._read_pointer(kb_root)
+        pointer = next_pointer(previous, version, info=info)
+        if previous is None and (kb_root / "faiss.index").exists():
+            # First versioned save over a legacy KB: retire the root files
+            pointer["retired"].append({"version": LEGACY_VERSION, "retired_at": time.time()})
+        expired, pointer["retired"] = expired_versions(pointer)
+        self._write_pointer(kb_root, pointer)
+        log_event("kb_published", backend="local", kb_id=kb_root.name, version=version, size_bytes=info["size_bytes"])
 
-    def load_kb(self, kb_id: str) -> Tuple[Any, Dict]:
+        for old in expired:
+            self._delete_version(kb_root, old)
+
+        # Builds that never got published (crashed / failed mid-save)
+        live = {version, *(entry["version"] for entry in pointer["retired"])}
+        for version_path in (kb_root / VERSIONS_DIR).iterdir():
+            if version_path.name not in live and time.time() - version_path.stat().st_mtime > grace_seconds():
+                self._delete_version(kb_root, version_path.name)
+
+    def _delete_version(self, kb_root: Path, version: str) -> None:
+        # Processes that still map the files keep them until they reload
+        if version == LEGACY_VERSION:
+            for path in kb_root.iterdir():
+                if path.is_file() and path.name != POINTER_FILE:
+                    path.unlink(missing_ok=True)
+        else:
+            shutil.rmtree(kb_root / VERSIONS_DIR / version, ignore_errors=True)
+        log_event("kb_version_removed", backend="local", kb_id=kb_root.name, version=version)
+
+    def get_file_path(self, kb_id: str, filename: str) -> Optional[Path]:
+        """Local path of a single artifact of the live version, or None if it does not exist"""
+        _, kb_path = self._current_path(kb_id)
+        file_path = kb_path / filename
+        return file_path if file_path.exists() else None
+
+    def load_file(self, kb_id: str, filename: str) -> Optional[bytes]:
+        """Load a single KB artifact, or None if it does not exist"""
+        file_path = self.get_file_path(kb_id, filename)
+        if file_path is None:
+            return None
+        with open(file_path, 'rb') as f:
+            return f.read()
+
+    @timed("storage_load", backend="local")
+    def load_kb(self, kb_id: str, load_mode: Optional[str] = None) -> Tuple[Any, ChunkStore]:
         """
         Load knowledge base from local file system
         
         Args:
             kb_id: Unique identifier for the knowledge base
+            load_mode: Index load mode ("mmap" / "shm" / "heap", default
+                FAISS_INDEX_LOAD). Mapped indexes are read-only.
             
         Returns:
-            Tuple of (faiss_index, metadata)
+            Tuple of (faiss_index, chunk_store)
         """
-        kb_path = self._get_kb_path(kb_id)
+        version, kb_path = self._current_path(kb_id)
         
-        # Load FAISS index
         index_path = kb_path / "faiss.index"
         if not index_path.exists():
             raise FileNotFoundError(f"FAISS index not found: {index_path}")
-        
-        faiss_index = faiss.read_index(str(index_path))
-        
-        # Load metadata
-        metadata_path = kb_path / "metadata.pkl"
+
+        # Migrate pickled metadata from older builds
+        if not ChunkStore.exists(kb_path):
+            self._migrate_metadata(kb_id, kb_path)
+        chunk_store = ChunkStore.open(kb_path)
+        chunk_store.version = version
+
+        # Load FAISS index (mapped read-only by default)
+        faiss_index = read_index(index_path, chunk_store.index_type, load_mode, shared_key=kb_id)
+
+        return faiss_index, chunk_store
+
+    def _migrate_metadata(self, kb_id: str, kb_path: Path) -> None:
+        """Convert a KB's metadata.pkl into a chunk store (one-time)"""
+        metadata_path = kb_path / LEGACY_METADATA_FILE
         if not metadata_path.exists():
             raise FileNotFoundError(f"Metadata not found: {metadata_path}")
         
@@ -93,7 +246,7 @@ class LocalStorage:
         
         # Handle legacy format (list of metadatas only)
         if isinstance(metadata, list):
-            print(f"⚠️  Converting legacy KB format for '{kb_id}'...")
+            log_event("kb_legacy_format", logging.WARNING, backend="local", kb_id=kb_id)
             # Try to load raw_pages to reconstruct texts
             raw_pages_path = kb_path / "raw_pages.json"
             if raw_pages_path.exists():
@@ -119,18 +272,15 @@ class LocalStorage:
                     "texts": texts,
                     "metadatas": metadata  # The list we loaded
                 }
-                
-                # Save in new format
-                with open(metadata_path, 'wb') as f:
-                    pickle.dump(metadata, f)
-                print(f"✅ Converted and saved KB '{kb_id}' in new format")
             else:
                 raise ValueError(
                     f"Legacy KB '{kb_id}' detected but cannot convert (missing raw_pages.json). "
                     "Please re-crawl the website."
                 )
-        
-        return faiss_index, metadata
+
+        ChunkStore.write_metadata(kb_path, metadata)
+        metadata_path.unlink()
+        log_event("kb_migrated", backend="local", kb_id=kb_id)
 
     def list_kbs(self) -> List[str]:
         """List all knowledge bases in local storage"""
@@ -139,7 +289,7 @@ class LocalStorage:
         
         kb_ids = []
         for kb_dir in self.storage_root.iterdir():
-            if kb_dir.is_dir() and (kb_dir / "faiss.index").exists():
+            if kb_dir.is_dir() and ((kb_dir / POINTER_FILE).exists() or (kb_dir / "faiss.index").exists()):
                 kb_ids.append(kb_dir.name)
         
         return kb_ids
@@ -148,6 +298,5 @@ class LocalStorage:
         """Delete a knowledge base from local storage"""
         kb_path = self._get_kb_path(kb_id)
         if kb_path.exists():
-            import shutil
             shutil.rmtree(kb_path)
-            print(f"✅ Deleted KB locally: {kb_id}")
+            log_event("kb_deleted", backend="local", kb_id=kb_id)
@@ -1,191 +1,702 @@
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+import hashlib
 import pickle
 import os
 import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
-import faiss
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+import shutil
+import logging
+
+import zstandard
+
+from core.kb.bm25 import BM25_FILES
+from core.kb.index_factory import read_index, write_index
+from core.kb.chunk_store import CHUNK_STORE_FILES, LEGACY_METADATA_FILE, ChunkStore
+from utils.metrics import log_event, timed
+from core.storage.versions import (
+    LEGACY_VERSION, VERSIONS_DIR, describe_pointer, expired_versions, grace_seconds, kb_info,
+    new_version_id, next_pointer
+)
+
+INDEX_FILE = "faiss.index"
+# Pointer to the live version: its artifacts (keys, sha256, sizes) + retired versions
+MANIFEST_FILE = "manifest.json"
+MANIFEST_SCHEMA = 2
+# Local record of the manifest (and its ETag) the cached files match
+CACHE_STATE_FILE = ".cache_state.json"
+COMPRESSED_SUFFIX = ".zst"
+
+_COPY_BLOCK = 1 << 20
+
+# Shared by every S3Storage instance (one is created per request)
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+# kb_id -> [lock, holders + waiters]; entries only exist while in use
+_kb_locks: Dict[str, list] = {}
+_kb_locks_lock = threading.Lock()
+# KB cache dir -> monotonic time of the last manifest revalidation (existing KBs only)
+_revalidated: Dict[str, float] = {}
+
+
+def _transfer_pool(max_workers: int) -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="s3-transfer")
+    return _pool
+
+
+@contextmanager
+def _kb_lock(kb_id: str) -> Iterator[None]:
+    """
+    Per-KB lock. Reference counted and dropped once unused, so lookups of
+    arbitrary (unknown) kb_ids don't accumulate locks.
+    """
+    with _kb_locks_lock:
+        entry = _kb_locks.setdefault(kb_id, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _kb_locks_lock:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _kb_locks[kb_id]
+
+
+def _not_found(e: ClientError) -> bool:
+    return e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+
+def _manifest_version(manifest: Dict) -> str:
+    # Unversioned manifests keep their artifacts at the KB root, like legacy KBs
+    return manifest["version"] if manifest.get("schema", 1) >= MANIFEST_SCHEMA else LEGACY_VERSION
+
+
+def _tmp_name(path: Path) -> Path:
+    # Unique per process / thread: several workers may fill the same cache
+    return path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def _compress(src: Path, dst: Path, level: int) -> Tuple[str, int]:
+    """zstd-compress ``src`` into ``dst``; returns (sha256, size) of ``src``"""
+    digest = hashlib.sha256()
+    size = 0
+    compressor = zstandard.ZstdCompressor(level=level)
+    with open(src, 'rb') as f_in, open(dst, 'wb') as f_out:
+        with compressor.stream_writer(f_out, closefd=False) as writer:
+            for block in iter(lambda: f_in.read(_COPY_BLOCK), b""):
+                digest.update(block)
+                size += len(block)
+                writer.write(block)
+    return digest.hexdigest(), size
+
+
+def _decompress(src: Path, dst: Path) -> str:
+    """Decompress zstd ``src`` into ``dst``; returns the sha256 of the output"""
+    digest = hashlib.sha256()
+    with open(src, 'rb') as f_in, open(dst, 'wb') as f_out:
+        with zstandard.ZstdDecompressor().stream_reader(f_in) as reader:
+            for block in iter(lambda: reader.read(_COPY_BLOCK), b""):
+                digest.update(block)
+                f_out.write(block)
+    return digest.hexdigest()
 
 
 class S3Storage:
     """
     S3-based storage backend for FAISS indexes and metadata.
     Provides persistent storage for knowledge bases in AWS.
+
+    Every save is a new version: zstd-compressed artifacts under
+    ``<kb_id>/versions/<version>/``, then ``manifest.json`` (sha256 / sizes
+    per artifact) is overwritten as the commit point, so readers see either
+    the old or the new version, never a mix. Superseded versions are kept
+    for KB_VERSION_GRACE_SECONDS before being deleted.
+
+    Loads revalidate the local cache with a conditional GET on the
+    manifest (at most every S3_REVALIDATE_SECONDS) and only re-fetch
+    artifacts whose checksum changed. The cache directory is bounded
+    (S3_CACHE_MAX_MB) with least-recently-used KBs evicted first.
+
+    KBs saved before manifests existed (plain objects) still load as-is.
     """
 
     def __init__(self):
         self.s3_client = boto3.client('s3')
         self.bucket_name = os.getenv('S3_BUCKET_NAME')
-        
+
         if not self.bucket_name:
             raise ValueError(
                 "S3_BUCKET_NAME environment variable is required for S3 storage backend"
             )
-        
+
         # Local cache directory
-        self.cache_dir = Path("/tmp/rag_cache")
+        self.cache_dir = Path(os.getenv("S3_CACHE_DIR", "/tmp/rag_cache"))
         self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.cache_max_bytes = int(os.getenv("S3_CACHE_MAX_MB", "4096")) * 1024 * 1024
+        self.revalidate_seconds = float(os.getenv("S3_REVALIDATE_SECONDS", "5"))
+        self.compression_level = int(os.getenv("S3_ZSTD_LEVEL", "3"))
+
+        # Files transfer concurrently; large ones also in multipart parts
+        self.max_concurrency = int(os.getenv("S3_MAX_CONCURRENCY", "8"))
+        part_size = int(os.getenv("S3_MULTIPART_CHUNK_MB", "16")) * 1024 * 1024
+        self.transfer_config = TransferConfig(
+            multipart_threshold=part_size,
+            multipart_chunksize=part_size,
+            max_concurrency=self.max_concurrency,
+            use_threads=True
+        )
 
     def _get_s3_key(self, kb_id: str, filename: str) -> str:
         """Generate S3 key for a file"""
         return f"{kb_id}/{filename}"
 
     def _get_cache_path(self, kb_id: str) -> Path:
-        """Get local cache directory for a KB"""
-        cache_path = self.cache_dir / kb_id
-        cache_path.mkdir(parents=True, exist_ok=True)
-        return cache_path
+        """Get local cache directory for a KB (created once something is cached)"""
+        return self.cache_dir / kb_id
 
     def kb_exists(self, kb_id: str) -> bool:
         """Check if a knowledge base exists in S3"""
+        return self.current_version(kb_id) is not None
+
+    # ----------------------------
+    # Cache state
+    # ----------------------------
+    def _read_state(self, cache_path: Path) -> Dict:
+        try:
+            with open(cache_path / CACHE_STATE_FILE, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {"schema": MANIFEST_SCHEMA, "etag": None, "manifest": None, "legacy": False, "files": {}}
+        if state.get("schema") != MANIFEST_SCHEMA:
+            # Cached before versioning: start over (the files are pruned on next sync)
+            return {"schema": MANIFEST_SCHEMA, "etag": None, "manifest": None, "legacy": False, "files": {}}
+        return state
+
+    def _write_state(self, cache_path: Path, state: Dict) -> None:
+        state_path = cache_path / CACHE_STATE_FILE
+        tmp_path = _tmp_name(state_path)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+
+    def _evict_cache(self, keep: str) -> None:
+        """Drop least-recently-used KB caches until under S3_CACHE_MAX_MB"""
+        entries = []
+        total = 0
+        for kb_dir in self.cache_dir.iterdir():
+            if not kb_dir.is_dir():
+                continue
+            try:
+                size = sum(f.stat().st_size for f in kb_dir.rglob("*") if f.is_file())
+                last_used = kb_dir.stat().st_mtime
+            except FileNotFoundError:
+                # Evicted / being written by another worker
+                continue
+            total += size
+            if kb_dir.name != keep:
+                entries.append((last_used, size, kb_dir))
+
+        for _, size, kb_dir in sorted(entries):
+            if total <= self.cache_max_bytes:
+                break
+            # Files mapped by a loaded KB stay valid until it is dropped
+            shutil.rmtree(kb_dir, ignore_errors=True)
+            _revalidated.pop(str(kb_dir), None)
+            total -= size
+            log_event("kb_cache_evicted", backend="s3", kb_id=kb_dir.name)
+
+    # ----------------------------
+    # Transfers
+    # ----------------------------
+    def _upload_artifact(self, kb_id: str, version_path: Path, filename: str) -> Dict:
+        compressed_path = _tmp_name(version_path / (filename + COMPRESSED_SUFFIX))
         try:
-            self.s3_client.head_object(
+            sha256, size = _compress(version_path / filename, compressed_path, self.compression_level)
+            key = self._get_s3_key(kb_id, f"{VERSIONS_DIR}/{version_path.name}/{filename}{COMPRESSED_SUFFIX}")
+            self.s3_client.upload_file(
+                str(compressed_path),
+                self.bucket_name,
+                key,
+                Config=self.transfer_config
+            )
+            return {
+                "key": key,
+                "sha256": sha256,
+                "size": size,
+                "compressed_size": compressed_path.stat().st_size,
+            }
+        finally:
+            compressed_path.unlink(missing_ok=True)
+
+    def _download_artifact(self, version_path: Path, filename: str, entry: Dict) -> bool:
+        """
+        Fetch + decompress one artifact into the cache. It only replaces the
+        cached file if its sha256 matches the manifest entry (other
+        processes may open it at any time); returns whether it did.
+        """
+        file_path = version_path / filename
+        compressed_path = _tmp_name(version_path / (filename + COMPRESSED_SUFFIX))
+        tmp_path = _tmp_name(file_path)
+        try:
+            self.s3_client.download_file(
+                self.bucket_name,
+                entry["key"],
+                str(compressed_path),
+                Config=self.transfer_config
+            )
+            if _decompress(compressed_path, tmp_path) != entry["sha256"]:
+                return False
+            # Temp file + rename: other processes may have the old file mapped
+            os.replace(tmp_path, file_path)
+            return True
+        finally:
+            compressed_path.unlink(missing_ok=True)
+            tmp_path.unlink(missing_ok=True)
+
+    def _fetch_manifest(self, kb_id: str, state: Dict) -> Optional[Dict]:
+        """
+        Current manifest via a conditional GET (the cached one on 304),
+        or None if the KB has no manifest (legacy layout / missing).
+        """
+        kwargs = {}
+        if state.get("etag") and state.get("manifest"):
+            kwargs["IfNoneMatch"] = state["etag"]
+        try:
+            response = self.s3_client.get_object(
                 Bucket=self.bucket_name,
-                Key=self._get_s3_key(kb_id, "faiss.index")
+                Key=self._get_s3_key(kb_id, MANIFEST_FILE),
+                **kwargs
             )
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("304", "NotModified"):
+                return state["manifest"]
+            if not _not_found(e):
+                raise
+            state.update(etag=None, manifest=None, legacy=self._head(kb_id, INDEX_FILE))
+            return None
+        state.update(etag=response["ETag"], manifest=json.loads(response["Body"].read()), legacy=False)
+        return state["manifest"]
+
+    def _head(self, kb_id: str, filename: str) -> bool:
+        try:
+            self.s3_client.head_object(Bucket=self.bucket_name, Key=self._get_s3_key(kb_id, filename))
             return True
-        except:
-            return False
+        except ClientError as e:
+            if _not_found(e):
+                return False
+            raise
+
+    def _revalidate(self, kb_id: str, cache_path: Path, state: Dict, force: bool = False) -> Optional[Dict]:
+        """Manifest, re-checked against S3 at most every S3_REVALIDATE_SECONDS"""
+        now = time.monotonic()
+        if force or now - _revalidated.get(str(cache_path), float("-inf")) >= self.revalidate_seconds:
+            self._fetch_manifest(kb_id, state)
+            if state.get("manifest") is not None or state.get("legacy"):
+                _revalidated[str(cache_path)] = now
+            else:
+                # Absent KB: nothing to remember (ids may be client-supplied)
+                _revalidated.pop(str(cache_path), None)
+        return state.get("manifest")
+
+    def _current_state(self, kb_id: str) -> Dict:
+        """Cache state with a (revalidated) manifest, without downloading artifacts"""
+        cache_path = self._get_cache_path(kb_id)
+        with _kb_lock(kb_id):
+            state = self._read_state(cache_path)
+            known = (state.get("etag"), state.get("legacy"))
+            manifest = self._revalidate(kb_id, cache_path, state)
+            # Persist only what revalidation changed (not on every request);
+            # unknown kb_ids leave no cache directory behind
+            changed = (state.get("etag"), state.get("legacy")) != known
+            if changed and (manifest is not None or state.get("legacy")):
+                cache_path.mkdir(parents=True, exist_ok=True)
+                self._write_state(cache_path, state)
+        return state
+
+    def current_version(self, kb_id: str) -> Optional[str]:
+        """Live version of a KB ("legacy" for pre-versioning KBs), None if absent"""
+        state = self._current_state(kb_id)
+        if state.get("manifest") is not None:
+            return _manifest_version(state["manifest"])
+        return LEGACY_VERSION if state.get("legacy") else None
+
+    def describe_kb(self, kb_id: str) -> Optional[Dict]:
+        """Catalog entry (version, vectors, dim, index type, size, built-at), None if absent"""
+        state = self._current_state(kb_id)
+        manifest = state.get("manifest")
+        if manifest is not None and "info" in manifest:
+            return describe_pointer(kb_id, manifest)
+        if manifest is None and not state.get("legacy"):
+            return None
 
+        # Legacy / pre-catalog manifest: only what is known without downloading
+        return {
+            "kb_id": kb_id,
+            "version": _manifest_version(manifest) if manifest else LEGACY_VERSION,
+            "built_at": manifest.get("published_at") if manifest else None,
+            "chunks": None,
+            "vectors": None,
+            "dim": None,
+            "index_type": None,
+            "size_bytes": sum(entry["size"] for entry in manifest["files"].values()) if manifest else None,
+        }
+
+    def _sync(self, kb_id: str, filenames: Optional[List[str]] = None) -> Tuple[Optional[Dict], Path]:
+        """
+        Make the cached copies of ``filenames`` (default: all artifacts)
+        of the live version match its manifest. Files unchanged since a
+        previously cached version are hard-linked instead of downloaded.
+        Returns (manifest or None for legacy KBs, local version directory).
+        """
+        cache_path = self._get_cache_path(kb_id)
+        cache_path.mkdir(parents=True, exist_ok=True)
+        with _kb_lock(kb_id):
+            state = self._read_state(cache_path)
+            for attempt in range(2):
+                manifest = self._revalidate(kb_id, cache_path, state, force=attempt > 0)
+                if manifest is None:
+                    version_path = cache_path / LEGACY_VERSION
+                    version_path.mkdir(exist_ok=True)
+                    self._prune_versions(cache_path, state, keep=LEGACY_VERSION)
+                    self._write_state(cache_path, state)
+                    return None, version_path
+
+                version = _manifest_version(manifest)
+                version_path = cache_path / version
+                version_path.mkdir(exist_ok=True)
+                artifacts = manifest["files"]
+                cached = state["files"].setdefault(version, {})
+                stale = [
+                    filename for filename in (filenames or list(artifacts))
+                    if filename in artifacts and (
+                        cached.get(filename) != artifacts[filename]["sha256"]
+                        or not (version_path / filename).exists()
+                    )
+                ]
+
+                missing, mismatched = [], []
+                for filename in stale:
+                    if self._link_cached(cache_path, state, version, filename, artifacts[filename]["sha256"]):
+                        cached[filename] = artifacts[filename]["sha256"]
+                    else:
+                        missing.append(filename)
+                if missing:
+                    log_event("kb_download", backend="s3", kb_id=kb_id, version=version, artifacts=len(missing))
+                    pool = _transfer_pool(self.max_concurrency)
+                    verified = list(pool.map(
+                        lambda filename: self._download_artifact(version_path, filename, artifacts[filename]),
+                        missing
+                    ))
+                    for filename, ok in zip(missing, verified):
+                        if ok:
+                            cached[filename] = artifacts[filename]["sha256"]
+                        else:
+                            mismatched.append(filename)
+                self._prune_versions(cache_path, state, keep=version)
+                self._write_state(cache_path, state)
+                if not mismatched:
+                    os.utime(cache_path)
+                    return manifest, version_path
+                log_event("kb_checksum_mismatch", logging.WARNING, backend="s3", kb_id=kb_id, version=version, file=mismatched)
+            raise ValueError(f"KB '{kb_id}' changed during download, please retry")
+
+    def _link_cached(self, cache_path: Path, state: Dict, version: str, filename: str, sha256: str) -> bool:
+        """Hard-link an identical artifact from another cached version"""
+        for other, files in state["files"].items():
+            source = cache_path / other / filename
+            if other == version or files.get(filename) != sha256 or not source.exists():
+                continue
+            tmp_path = _tmp_name(cache_path / version / filename)
+            try:
+                os.link(source, tmp_path)
+                os.replace(tmp_path, cache_path / version / filename)
+                return True
+            except OSError:
+                tmp_path.unlink(missing_ok=True)
+        return False
+
+    def _prune_versions(self, cache_path: Path, state: Dict, keep: str) -> None:
+        """Keep the live version and the one before it (may still be mapped / loading)"""
+        previous = state.get("cached_version")
+        if previous == keep:
+            return
+        for path in cache_path.iterdir():
+            if path.name in (keep, previous, CACHE_STATE_FILE) or path.name.endswith(".tmp"):
+                continue
+            if path.is_dir():
+                # Unknown dirs may be a version being written by save_kb
+                if path.name in state["files"] or path.name == LEGACY_VERSION:
+                    shutil.rmtree(path, ignore_errors=True)
+            else:
+                # Files cached at the KB root before versioning
+                path.unlink(missing_ok=True)
+            state["files"].pop(path.name, None)
+        state["cached_version"] = keep
+
+    @timed("storage_save", backend="s3")
     def save_kb(
         self,
         kb_id: str,
         faiss_index: Any,
-        metadata: Dict,
-        raw_pages: Optional[List[Dict]] = None
+        metadata: Union[Dict, ChunkStore],
+        raw_pages: Optional[List[Dict]] = None,
+        extra_files: Optional[Dict[str, Union[bytes, str, Path]]] = None
     ) -> None:
         """
-        Save knowledge base to S3
-        
+        Save knowledge base to S3 as a new version and publish it
+
         Args:
             kb_id: Unique identifier for the knowledge base
             faiss_index: FAISS index object
-            metadata: Metadata dictionary (chunks, sources, etc.)
+            metadata: Metadata dictionary (chunks, sources, etc.) or a ChunkStore streamed to disk
             raw_pages: Optional raw page data
+            extra_files: Optional additional artifacts (filename -> bytes or path of a file to copy)
         """
         cache_path = self._get_cache_path(kb_id)
-        
-        # Save FAISS index locally first
-        index_path = cache_path / "faiss.index"
-        faiss.write_index(faiss_index, str(index_path))
-        
-        # Upload FAISS index to S3
-        self.s3_client.upload_file(
-            str(index_path),
-            self.bucket_name,
-            self._get_s3_key(kb_id, "faiss.index")
-        )
-        print(f"✅ Uploaded FAISS index to S3: {kb_id}/faiss.index")
-        
-        # Save and upload metadata
-        metadata_path = cache_path / "metadata.pkl"
-        with open(metadata_path, 'wb') as f:
-            pickle.dump(metadata, f)
-        
-        self.s3_client.upload_file(
-            str(metadata_path),
-            self.bucket_name,
-            self._get_s3_key(kb_id, "metadata.pkl")
-        )
-        print(f"✅ Uploaded metadata to S3: {kb_id}/metadata.pkl")
-        
-        # Save and upload raw pages if provided
+        version = new_version_id()
+        version_path = cache_path / version
+        version_path.mkdir(parents=True)
+
+        # Write every artifact into the local cache first
+        write_index(faiss_index, version_path / INDEX_FILE)
+        ChunkStore.save(version_path, metadata)
+        filenames = [INDEX_FILE, *CHUNK_STORE_FILES]
+
         if raw_pages:
-            raw_pages_path = cache_path / "raw_pages.json"
-            with open(raw_pages_path, 'w', encoding='utf-8') as f:
-                json.dump(raw_pages, f, indent=2)
-            
+            with open(version_path / "raw_pages.json", 'w', encoding='utf-8') as f:
+                json.dump(raw_pages, f)
+            filenames.append("raw_pages.json")
+
+        for filename, content in (extra_files or {}).items():
+            if isinstance(content, (str, Path)):
+                shutil.copyfile(content, version_path / filename)
+            else:
+                with open(version_path / filename, 'wb') as f:
+                    f.write(content)
+            filenames.append(filename)
+
+        # Compress + upload concurrently under the version prefix
+        started = time.perf_counter()
+        pool = _transfer_pool(self.max_concurrency)
+        entries = list(pool.map(lambda filename: self._upload_artifact(kb_id, version_path, filename), filenames))
+
+        # Swap the pointer: readers move to the new version on next access
+        with _kb_lock(kb_id):
+            state = self._read_state(cache_path)
+            previous = self._fetch_manifest(kb_id, state)
+            if (previous is None and state.get("legacy")) or (previous and _manifest_version(previous) == LEGACY_VERSION):
+                # Objects at the KB root stay readable during the grace period too
+                previous = {"version": LEGACY_VERSION}
+            manifest = next_pointer(
+                previous, version,
+                schema=MANIFEST_SCHEMA,
+                files=dict(zip(filenames, entries)),
+                info=kb_info(metadata, sum(entry["size"] for entry in entries))
+            )
+            expired, manifest["retired"] = expired_versions(manifest)
+            response = self.s3_client.put_object(
+                Bucket=self.bucket_name,
+                Key=self._get_s3_key(kb_id, MANIFEST_FILE),
+                Body=json.dumps(manifest).encode("utf-8"),
+                ContentType="application/json"
+            )
+
+            state.update(etag=response["ETag"], manifest=manifest, legacy=False)
+            state["files"][version] = {filename: entry["sha256"] for filename, entry in manifest["files"].items()}
+            self._prune_versions(cache_path, state, keep=version)
+            self._write_state(cache_path, state)
+            _revalidated[str(cache_path)] = time.monotonic()
+
+        size = sum(entry["size"] for entry in entries)
+        compressed = sum(entry["compressed_size"] for entry in entries)
+        log_event(
+            "kb_published", backend="s3", kb_id=kb_id, version=version, artifacts=len(entries),
+            size=size, compressed_size=compressed, seconds=round(time.perf_counter() - started, 3)
+        )
+
+        self._collect_versions(kb_id, manifest, expired)
+        self._evict_cache(keep=kb_id)
+
+    def _collect_versions(self, kb_id: str, manifest: Dict, expired: List[str]) -> None:
+        """Delete versions past the grace period and never-published leftovers"""
+        live = {manifest["version"], *(entry["version"] for entry in manifest["retired"])}
+        cutoff = time.time() - grace_seconds()
+        keys = []
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=self._get_s3_key(kb_id, "")):
+            for obj in page.get("Contents", []):
+                relative = obj["Key"][len(kb_id) + 1:]
+                parts = relative.split("/")
+                if parts[0] == VERSIONS_DIR and len(parts) > 2:
+                    version = parts[1]
+                    if version in expired or (version not in live and obj["LastModified"].timestamp() < cutoff):
+                        keys.append(obj["Key"])
+                elif len(parts) == 1 and relative != MANIFEST_FILE and LEGACY_VERSION not in live:
+                    # Pre-versioning objects at the KB root
+                    keys.append(obj["Key"])
+
+        for start in range(0, len(keys), 1000):
+            self.s3_client.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={"Objects": [{"Key": key} for key in keys[start:start + 1000]]}
+            )
+        if keys:
+            log_event("kb_version_removed", backend="s3", kb_id=kb_id, objects=len(keys))
+
+    def get_file_path(self, kb_id: str, filename: str) -> Optional[Path]:
+        """Local (cached) path of a single artifact of the live version, or None if it does not exist"""
+        manifest, version_path = self._sync(kb_id, [filename])
+        file_path = version_path / filename
+        if manifest is not None:
+            return file_path if filename in manifest["files"] else None
+
+        # Legacy layout: plain objects, cached as-is
+        if not file_path.exists():
+            try:
+                self.s3_client.download_file(
+                    self.bucket_name,
+                    self._get_s3_key(kb_id, filename),
+                    str(file_path),
+                    Config=self.transfer_config
+                )
+            except ClientError as e:
+                if _not_found(e):
+                    return None
+                raise
+        return file_path
+
+    def load_file(self, kb_id: str, filename: str) -> Optional[bytes]:
+        """Load a single KB artifact, or None if it does not exist"""
+        file_path = self.get_file_path(kb_id, filename)
+        if file_path is None:
+            return None
+        with open(file_path, 'rb') as f:
+            return f.read()
+
+    def _upload_chunk_store(self, kb_id: str, cache_path: Path) -> None:
+        for filename in CHUNK_STORE_FILES:
             self.s3_client.upload_file(
-                str(raw_pages_path),
+                str(cache_path / filename),
                 self.bucket_name,
-                self._get_s3_key(kb_id, "raw_pages.json")
+                self._get_s3_key(kb_id, filename),
+                Config=self.transfer_config
             )
-            print(f"✅ Uploaded raw pages to S3: {kb_id}/raw_pages.json")
 
-    def load_kb(self, kb_id: str) -> Tuple[Any, Dict]:
+    @timed("storage_load", backend="s3")
+    def load_kb(self, kb_id: str, load_mode: Optional[str] = None) -> Tuple[Any, ChunkStore]:
         """
         Load knowledge base from S3
-        
+
         Args:
             kb_id: Unique identifier for the knowledge base
-            
+            load_mode: Index load mode ("mmap" / "shm" / "heap", default
+                FAISS_INDEX_LOAD). Mapped indexes are read-only.
+
         Returns:
-            Tuple of (faiss_index, metadata)
+            Tuple of (faiss_index, chunk_store)
         """
-        cache_path = self._get_cache_path(kb_id)
-        
-        # Download FAISS index
-        index_path = cache_path / "faiss.index"
+        # Revalidate against the manifest; fetch only changed artifacts
+        manifest, version_path = self._sync(kb_id, [INDEX_FILE, *CHUNK_STORE_FILES, *BM25_FILES])
+        if manifest is None:
+            self._load_legacy(kb_id, version_path)
+
+        # Load FAISS index (mapped from the local cache by default)
+        chunk_store = ChunkStore.open(version_path)
+        chunk_store.version = version_path.name
+        faiss_index = read_index(version_path / INDEX_FILE, chunk_store.index_type, load_mode, shared_key=kb_id)
+
+        self._evict_cache(keep=kb_id)
+        return faiss_index, chunk_store
+
+    def _load_legacy(self, kb_id: str, version_path: Path) -> None:
+        """Cache a KB saved as plain objects (no manifest)"""
+        index_path = version_path / INDEX_FILE
         if not index_path.exists():
-            print(f"📥 Downloading FAISS index from S3: {kb_id}/faiss.index")
+            log_event("kb_download", backend="s3", kb_id=kb_id, version=LEGACY_VERSION, file=INDEX_FILE)
             self.s3_client.download_file(
                 self.bucket_name,
-                self._get_s3_key(kb_id, "faiss.index"),
-                str(index_path)
+                self._get_s3_key(kb_id, INDEX_FILE),
+                str(index_path),
+                Config=self.transfer_config
             )
-        
-        # Download metadata
-        metadata_path = cache_path / "metadata.pkl"
-        if not metadata_path.exists():
-            print(f"📥 Downloading metadata from S3: {kb_id}/metadata.pkl")
-            self.s3_client.download_file(
-                self.bucket_name,
-                self._get_s3_key(kb_id, "metadata.pkl"),
-                str(metadata_path)
-            )
-        
-        # Load FAISS index
-        faiss_index = faiss.read_index(str(index_path))
-        
-        # Load metadata
+
+        # Download chunk store (memory-mapped from the local cache)
+        if not ChunkStore.exists(version_path):
+            log_event("kb_download", backend="s3", kb_id=kb_id, version=LEGACY_VERSION, file="chunk_store")
+            if not all(self.get_file_path(kb_id, filename) for filename in CHUNK_STORE_FILES):
+                self._migrate_metadata(kb_id, version_path)
+
+        # BM25 index (optional: KBs built before hybrid retrieval have none)
+        for filename in BM25_FILES:
+            self.get_file_path(kb_id, filename)
+
+    def _migrate_metadata(self, kb_id: str, cache_path: Path) -> None:
+        """Convert a KB's metadata.pkl into a chunk store and upload it (one-time)"""
+        metadata_path = self.get_file_path(kb_id, LEGACY_METADATA_FILE)
+        if metadata_path is None:
+            raise FileNotFoundError(f"Metadata not found in S3: {kb_id}")
+
         with open(metadata_path, 'rb') as f:
             metadata = pickle.load(f)
-        
-        return faiss_index, metadata
+        if isinstance(metadata, list):
+            raise ValueError(
+                f"Legacy KB '{kb_id}' detected. Please re-crawl the website."
+            )
+
+        ChunkStore.write_metadata(cache_path, metadata)
+        metadata_path.unlink()
+        self._upload_chunk_store(kb_id, cache_path)
+        log_event("kb_migrated", backend="s3", kb_id=kb_id)
 
     def list_kbs(self) -> List[str]:
         """List all knowledge bases in S3"""
         try:
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.bucket_name,
-                Delimiter='/'
-            )
-            
+            # One page holds at most 1000 prefixes
+            paginator = self.s3_client.get_paginator("list_objects_v2")
             kb_ids = []
-            if 'CommonPrefixes' in response:
-                for prefix in response['CommonPrefixes']:
-                    kb_id = prefix['Prefix'].rstrip('/')
-                    kb_ids.append(kb_id)
-            
+            for page in paginator.paginate(Bucket=self.bucket_name, Delimiter='/'):
+                for prefix in page.get('CommonPrefixes', []):
+                    kb_ids.append(prefix['Prefix'].rstrip('/'))
+
             return kb_ids
         except Exception as e:
-            print(f"❌ Error listing KBs from S3: {e}")
+            log_event("kb_list_failed", logging.ERROR, backend="s3", error=str(e))
             return []
 
     def delete_kb(self, kb_id: str) -> None:
         """Delete a knowledge base from S3"""
         try:
-            # List all objects with the kb_id prefix
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.bucket_name,
-                Prefix=f"{kb_id}/"
-            )
-            
-            if 'Contents' in response:
-                # Delete all objects
-                objects_to_delete = [{'Key': obj['Key']} for obj in response['Contents']]
-                self.s3_client.delete_objects(
-                    Bucket=self.bucket_name,
-                    Delete={'Objects': objects_to_delete}
-                )
-                print(f"✅ Deleted KB from S3: {kb_id}")
-            
+            # Delete all objects with the kb_id prefix, one listing page (<= 1000 keys) at a time
+            paginator = self.s3_client.get_paginator("list_objects_v2")
+            deleted = 0
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix=f"{kb_id}/"):
+                objects_to_delete = [{'Key': obj['Key']} for obj in page.get('Contents', [])]
+                if objects_to_delete:
+                    self.s3_client.delete_objects(
+                        Bucket=self.bucket_name,
+                        Delete={'Objects': objects_to_delete}
+                    )
+                    deleted += len(objects_to_delete)
+            if deleted:
+                log_event("kb_deleted", backend="s3", kb_id=kb_id)
+
             # Clean up local cache
             cache_path = self._get_cache_path(kb_id)
             if cache_path.exists():
-                import shutil
                 shutil.rmtree(cache_path)
-                
+            _revalidated.pop(str(cache_path), None)
+
         except Exception as e:
-            print(f"❌ Error deleting KB from S3: {e}")
+            log_event("kb_delete_failed", logging.ERROR, backend="s3", kb_id=kb_id, error=str(e))
             raise
@@ -0,0 +1,76 @@
+import os
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+# Pointer to a KB's live version (JSON), swapped atomically on publish
+POINTER_FILE = "current.json"
+VERSIONS_DIR = "versions"
+# KBs saved before versioning keep their artifacts at the KB root
+LEGACY_VERSION = "legacy"
+
+
+def new_version_id() -> str:
+    """Sortable, unique version id (build start time + random suffix)"""
+    return f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{uuid.uuid4().hex[:8]}"
+
+
+def grace_seconds() -> float:
+    """How long a superseded version stays readable before GC"""
+    return float(os.getenv("KB_VERSION_GRACE_SECONDS", "900"))
+
+
+def next_pointer(previous: Optional[Dict], version: str, **fields) -> Dict:
+    """
+    Pointer for a newly published ``version``. The version it replaces is
+    added to ``retired`` (with the time it stopped being current) so it
+    can be garbage-collected once the grace period has passed.
+    """
+    now = time.time()
+    retired = list((previous or {}).get("retired", []))
+    if previous and previous.get("version") and previous["version"] != version:
+        retired.append({"version": previous["version"], "retired_at": now})
+    return {"version": version, "published_at": now, "retired": retired, **fields}
+
+
+def expired_versions(pointer: Dict, grace: Optional[float] = None) -> Tuple[List[str], List[Dict]]:
+    """(versions past the grace period, retired entries still in grace)"""
+    grace = grace_seconds() if grace is None else grace
+    now = time.time()
+    expired, remaining = [], []
+    for entry in pointer.get("retired", []):
+        if entry["version"] == pointer["version"]:
+            continue
+        if now - entry["retired_at"] >= grace:
+            expired.append(entry["version"])
+        else:
+            remaining.append(entry)
+    return expired, remaining
+
+
+def kb_info(metadata, size_bytes: int) -> Dict:
+    """
+    Catalog fields recorded in the pointer when a version is published
+    (``metadata``: the save_kb metadata dict or a streamed ChunkStore)
+    """
+    if isinstance(metadata, dict):
+        index, chunks = metadata.get("index") or {}, len(metadata.get("texts", []))
+    else:
+        index, chunks = metadata.info.get("index") or {}, len(metadata)
+    return {
+        "chunks": chunks,
+        "vectors": index.get("ntotal"),
+        "dim": index.get("dim"),
+        "index_type": index.get("index_type"),
+        "size_bytes": size_bytes,
+    }
+
+
+def describe_pointer(kb_id: str, pointer: Dict) -> Dict:
+    """Catalog entry for a KB from its pointer"""
+    return {
+        "kb_id": kb_id,
+        "version": pointer["version"],
+        "built_at": pointer.get("published_at"),
+        **pointer.get("info", {}),
+    }
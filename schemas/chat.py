@@ -1,11 +1,58 @@
 from pydantic import BaseModel
+from typing import Dict, List, Optional
 
 
 class ChatRequest(BaseModel):
     kb_id: str
     question: str
+    # Attach per-stage timings (ms) to the response
+    include_timings: bool = False
+
+
+class ContextStats(BaseModel):
+    """How the retrieved chunks were packed into the prompt"""
+    retrieved_chunks: int
+    duplicates_dropped: int
+    chunks_merged: int
+    passages_used: int
+    context_tokens_before: int
+    context_tokens_after: int
+    token_budget: int
+    prompt_tokens_before: int
+    prompt_tokens_after: int
 
 
 class ChatResponse(BaseModel):
     answer: str
     sources: list[str]
+    # None for cached answers and when nothing was retrieved
+    context: Optional[ContextStats] = None
+    # Per-stage ms (query_embed, vector_search, llm, ...) when include_timings
+    timings: Optional[Dict[str, float]] = None
+
+
+class BatchQuestion(BaseModel):
+    kb_id: str
+    question: str
+
+
+class ChatBatchRequest(BaseModel):
+    questions: List[BatchQuestion]
+    # Concurrent LLM calls for this batch (default CHAT_BATCH_CONCURRENCY)
+    max_concurrency: Optional[int] = None
+
+
+class BatchAnswer(BaseModel):
+    kb_id: str
+    question: str
+    answer: Optional[str] = None
+    sources: List[str] = []
+    error: Optional[str] = None
+    cached: bool = False
+    context: Optional[ContextStats] = None
+    timings: Dict[str, float] = {}
+
+
+class ChatBatchResponse(BaseModel):
+    results: List[BatchAnswer]
+    timings: Dict[str, float]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, HttpUrl
-from typing import Optional
+from typing import Any, Dict, Optional
 
 
 class CrawlRequest(BaseModel):
@@ -9,8 +9,13 @@ class CrawlRequest(BaseModel):
 class CrawlResponse(BaseModel):
     status: str
     kb_id: str
+    job_id: Optional[str] = None
 
     pages_crawled: Optional[int] = None
     chunks_created: Optional[int] = None
     reason: Optional[str] = None
+    index_type: Optional[str] = None
+    fetch_stats: Optional[Dict[str, Any]] = None
+    embedding_cache: Optional[Dict[str, Any]] = None
+    timings: Optional[Dict[str, float]] = None
     message: Optional[str] = None
@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from typing import Any, Dict, Optional
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    kb_id: str
+    url: str
+    status: str
+    phase: Optional[str] = None
+    pages_done: int = 0
+    chunks_done: int = 0
+    elapsed_seconds: float = 0.0
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class KBInfo(BaseModel):
+    kb_id: str
+    version: str
+    built_at: Optional[float] = None
+    chunks: Optional[int] = None
+    vectors: Optional[int] = None
+    dim: Optional[int] = None
+    index_type: Optional[str] = None
+    size_bytes: Optional[int] = None
+
+
+class KBListResponse(BaseModel):
+    total: int
+    offset: int
+    limit: int
+    items: List[KBInfo]
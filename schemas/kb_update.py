@@ -1,15 +1,27 @@
 from pydantic import BaseModel, HttpUrl
-from typing import Optional
+from typing import Any, Dict, Optional
 
 
 class KBUpdateRequest(BaseModel):
     url: HttpUrl
+    incremental: bool = True
 
 
 class KBUpdateResponse(BaseModel):
     status: str
     kb_id: str
+    job_id: Optional[str] = None
+    message: Optional[str] = None
 
     pages_crawled: Optional[int] = None
     chunks_created: Optional[int] = None
+    pages_unchanged: Optional[int] = None
+    pages_changed: Optional[int] = None
+    pages_added: Optional[int] = None
+    pages_removed: Optional[int] = None
+    chunks_reembedded: Optional[int] = None
     reason: Optional[str] = None
+    index_type: Optional[str] = None
+    fetch_stats: Optional[Dict[str, Any]] = None
+    embedding_cache: Optional[Dict[str, Any]] = None
+    timings: Optional[Dict[str, float]] = None
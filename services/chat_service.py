@@ -1,19 +1,187 @@
+import asyncio
 import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from core.kb.catalog import kb_catalog
+from core.rag.answer_cache import answer_cache
 from core.rag.qa_chain import RAGBot
+from core.rag.registry import get_embedder
 from utils.storage_factory import get_storage_backend
+from utils.executors import run_blocking
+from utils.metrics import timed
 
 
 def ask_question(kb_id: str, question: str):
     # Get storage backend (S3 or local)
     storage = get_storage_backend()
     
-    # Check if KB exists
-    if not storage.kb_exists(kb_id):
+    # Check if KB exists (in-memory catalog; storage only for unknown ids)
+    if kb_catalog.resolve(kb_id, storage) is None:
         raise FileNotFoundError(f"Knowledge base '{kb_id}' not found")
 
     # Load KB and create RAG bot
     bot = RAGBot(kb_id, storage)
-    answer, sources = bot.ask(question)
+    answer, sources, context = bot.ask(question)
+
+    return answer, sources, context
+
+
+async def require_kb(kb_id: str, storage) -> None:
+    """Raise FileNotFoundError for an unknown KB (catalog hit: no I/O)"""
+    if kb_catalog.exists(kb_id):
+        return
+    if await run_blocking("io", kb_catalog.resolve, kb_id, storage) is None:
+        raise FileNotFoundError(f"Knowledge base '{kb_id}' not found")
+
+
+async def ask_question_async(kb_id: str, question: str):
+    storage = get_storage_backend()
+    await require_kb(kb_id, storage)
+
+    # KB load may hit disk / S3
+    bot = await run_blocking("io", RAGBot, kb_id, storage)
+    answer, sources, context = await bot.aask(question)
+
+    return answer, sources, context
+
+
+async def stream_question(kb_id: str, question: str):
+    """
+    Resolve the KB up front (so a missing KB is still a plain 404) and
+    return the bot's async event stream.
+    """
+    storage = get_storage_backend()
+    await require_kb(kb_id, storage)
+
+    bot = await run_blocking("io", RAGBot, kb_id, storage)
+    return bot.astream(question)
+
+
+def _ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+async def ask_questions_batch(items: List[Dict], max_concurrency: Optional[int] = None):
+    """
+    Answer many (kb_id, question) pairs at once.
+
+    All questions are encoded in a single embedder call, each KB gets one
+    multi-row FAISS search, and LLM calls run concurrently under
+    ``max_concurrency`` (and the process-wide LLM cap). Answer-cache hits
+    skip search and the LLM. Unknown or unloadable KBs and failed LLM calls
+    are reported per question instead of failing the batch.
+    """
+    max_questions = int(os.getenv("CHAT_BATCH_MAX_QUESTIONS", "256"))
+    if not items:
+        raise ValueError("No questions given")
+    if len(items) > max_questions:
+        raise ValueError(f"At most {max_questions} questions per batch")
+    concurrency = max_concurrency or int(os.getenv("CHAT_BATCH_CONCURRENCY", "8"))
+    if concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
+    started = time.perf_counter()
+    storage = get_storage_backend()
+    results = [
+        {"kb_id": item["kb_id"], "question": item["question"], "sources": [], "timings": {}}
+        for item in items
+    ]
+
+    # 1️⃣ Load each distinct KB once
+    rows_by_kb: Dict[str, List[int]] = {}
+    for i, item in enumerate(items):
+        rows_by_kb.setdefault(item["kb_id"], []).append(i)
+
+    bots = {}
+    for kb_id in rows_by_kb:
+        error = None
+        if kb_catalog.exists(kb_id) or await run_blocking("io", kb_catalog.resolve, kb_id, storage):
+            try:
+                bots[kb_id] = await run_blocking("io", RAGBot, kb_id, storage)
+            except Exception as e:
+                # A broken KB fails its own questions, not the batch
+                error = f"Failed to load knowledge base '{kb_id}': {e}"
+        else:
+            error = f"Knowledge base '{kb_id}' not found"
+        if error is not None:
+            for i in rows_by_kb[kb_id]:
+                results[i]["error"] = error
+    load_ms = _ms(started)
+
+    # 2️⃣ One encode call for every answerable question
+    answerable = [i for kb_id in bots for i in rows_by_kb[kb_id]]
+    embed_started = time.perf_counter()
+    vectors = None
+    if answerable:
+        with timed("query_embed"):
+            vectors = np.asarray(await run_blocking(
+                "retrieval",
+                get_embedder().encode,
+                [items[i]["question"] for i in answerable],
+                batch_size=len(answerable),
+                show_progress_bar=False
+            ), dtype="float32")
+    embed_ms = _ms(embed_started)
+    position = {i: p for p, i in enumerate(answerable)}
+
+    # Semantic answer cache: exact or near-duplicate questions
+    pending = []
+    for i in answerable:
+        kb_id = items[i]["kb_id"]
+        cached = answer_cache.lookup(kb_id, items[i]["question"], vectors[position[i]], version=bots[kb_id].version)
+        if cached is None:
+            pending.append(i)
+        else:
+            results[i]["answer"], results[i]["sources"] = cached
+            results[i]["cached"] = True
+            results[i]["timings"]["total_ms"] = _ms(started)
+    pending_set = set(pending)
+
+    # 3️⃣ One multi-row search per KB
+    contexts = {}
+    search_started = time.perf_counter()
+    for kb_id, bot in bots.items():
+        rows = [i for i in rows_by_kb[kb_id] if i in pending_set]
+        if not rows:
+            continue
+        kb_started = time.perf_counter()
+        hits = await run_blocking(
+            "retrieval",
+            bot.search,
+            vectors[[position[i] for i in rows]],
+            queries=[items[i]["question"] for i in rows]
+        )
+        kb_search_ms = _ms(kb_started)
+        for i, (chunks, sources) in zip(rows, hits):
+            contexts[i] = (chunks, sources)
+            results[i]["timings"]["search_ms"] = kb_search_ms
+    search_ms = _ms(search_started)
+
+    # 4️⃣ Concurrent LLM calls under the batch cap
+    semaphore = asyncio.Semaphore(concurrency)
+    llm_started = time.perf_counter()
+
+    async def answer(i: int):
+        async with semaphore:
+            call_started = time.perf_counter()
+            chunks, sources = contexts[i]
+            try:
+                results[i]["answer"], results[i]["sources"], results[i]["context"] = await bots[
+                    items[i]["kb_id"]
+                ].agenerate(items[i]["question"], chunks, sources, query_vec=vectors[position[i]])
+            except Exception as e:
+                results[i]["error"] = f"LLM call failed: {e}"
+            results[i]["timings"]["llm_ms"] = _ms(call_started)
+            results[i]["timings"]["total_ms"] = _ms(started)
 
-    return answer, sources
+    await asyncio.gather(*(answer(i) for i in pending))
 
+    return results, {
+        "load_ms": load_ms,
+        "embed_ms": embed_ms,
+        "search_ms": search_ms,
+        "llm_ms": _ms(llm_started),
+        "total_ms": _ms(started),
+    }
@@ -1,30 +1,197 @@
+import logging
 import os
 import json
 import shutil
 import pickle
+import hashlib
+import tempfile
+import threading
+import time
+from functools import wraps
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
 
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-from core.crawler.playwright_crawler import crawl_website_playwright as crawl_website
+from core.crawler.playwright_crawler import iter_website
+from core.kb.bm25 import BM25_FILES, BM25Index
+from core.kb.catalog import kb_catalog
+from core.kb.chunk_store import ChunkStoreWriter
+from core.kb.embed_pipeline import EmbeddingPipeline
+from core.kb.embedding_cache import get_cached_embedder
+from core.kb.index_factory import (
+    INDEX_FLAT,
+    INDEX_HNSW,
+    LOAD_HEAP,
+    build_index,
+    finalize_index,
+    index_info,
+    index_type_of,
+    vectors_and_ids,
+)
+from core.rag.answer_cache import answer_cache
+from core.rag.registry import kb_cache
 from utils.url_hash import generate_kb_id
 from utils.storage_factory import get_storage_backend
+from utils.metrics import collect_timings, log_event, timed
 
+PAGE_INDEX_FILE = "page_index.json"
+RAW_PAGES_FILE = "raw_pages.jsonl"
+LEGACY_RAW_PAGES_FILE = "raw_pages.json"
 
-def crawl_and_build_kb(url, force_refresh: bool = False):
+
+def page_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def page_index_entry(page: Dict, chunk_ids: List[int], content_hash: Optional[str] = None) -> Dict:
+    """Per-page record stored in page_index.json for incremental refresh"""
+    return {
+        "hash": content_hash or page_hash(page.get("text", "")),
+        "etag": page.get("etag"),
+        "last_modified": page.get("last_modified"),
+        "links": page.get("links", []),
+        "chunk_ids": chunk_ids,
+    }
+
+
+def raw_page(page: Dict) -> Dict:
+    return {
+        "url": page.get("url", ""),
+        "title": page.get("title", ""),
+        "text": page.get("text", ""),
+    }
+
+
+def new_faiss_index(dim: int):
+    # ID-mapped so pages can later be removed / replaced in place.
+    # Builds always accumulate into Flat; finalize_index applies the ANN policy.
+    return faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+
+
+def flat_working_index(faiss_index, data: Dict, embedder):
+    """
+    Editable Flat copy of a saved KB index for incremental updates
+    (HNSW / IVF-PQ don't support removing ids).
+    """
+    index_type = index_type_of(faiss_index)
+    if index_type == INDEX_FLAT:
+        return faiss_index
+    if index_type == INDEX_HNSW:
+        vectors, ids = vectors_and_ids(faiss_index)
+    else:
+        # PQ codes are lossy; re-encode (normally all embedding-cache hits)
+        vectors = embedder.encode(data["texts"], show_progress_bar=False)
+        ids = np.array(data["ids"], dtype="int64")
+    return build_index(vectors, ids, INDEX_FLAT)
+
+
+def bm25_files(directory: str, texts: Sequence[str], ids: Optional[List[int]] = None) -> Dict[str, str]:
+    """
+    Build the KB's BM25 index in ``directory``; returns save_kb extra_files.
+    ``texts`` may be a ChunkStore (texts read from the mapped store).
+    """
+    BM25Index.write(directory, texts, ids)
+    return {name: os.path.join(directory, name) for name in BM25_FILES}
+
+
+def load_json_file(storage, kb_id: str, filename: str):
+    content = storage.load_file(kb_id, filename)
+    if content is None:
+        return None
+    return json.loads(content.decode("utf-8"))
+
+
+def iter_raw_pages(storage, kb_id: str) -> Iterator[Dict]:
+    """Stream a KB's raw pages (JSONL, or the legacy single JSON list)"""
+    path = storage.get_file_path(kb_id, RAW_PAGES_FILE)
+    if path is not None:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+    yield from load_json_file(storage, kb_id, LEGACY_RAW_PAGES_FILE) or []
+
+
+class RawPageSpool:
+    """Streams raw pages to a temporary JSONL file instead of holding them in memory"""
+
+    def __enter__(self):
+        self._file = tempfile.NamedTemporaryFile(
+            "w", suffix=".jsonl", encoding="utf-8", delete=False
+        )
+        self.path = self._file.name
+        return self
+
+    def write(self, page: Dict) -> None:
+        self._file.write(json.dumps(page, ensure_ascii=False))
+        self._file.write("\n")
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+    def __exit__(self, *exc):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class IndexWriter:
+    """Adds embedded batches to a (lazily created) ID-mapped FAISS index"""
+
+    def __init__(self, faiss_index=None):
+        self.index = faiss_index
+        self._lock = threading.Lock()
+
+    def add(self, embeddings: np.ndarray, chunk_ids: List[int]) -> None:
+        with self._lock:
+            if self.index is None:
+                self.index = new_faiss_index(embeddings.shape[1])
+            self.index.add_with_ids(embeddings, np.array(chunk_ids, dtype="int64"))
+
+
+def with_timings(build: Callable) -> Callable:
+    """Attach per-stage ``timings`` (ms, plus total_ms) to a build's result"""
+    @wraps(build)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        with collect_timings() as timings:
+            result = build(*args, **kwargs)
+        # A fallback to a full rebuild already reports its own timings
+        if "timings" not in result:
+            timings["total_ms"] = round((time.perf_counter() - started) * 1000, 3)
+            result["timings"] = timings
+        return result
+    return wrapper
+
+
+@with_timings
+def crawl_and_build_kb(url, force_refresh: bool = False, progress: Optional[Callable] = None):
+    """
+    Crawl a website and build its KB.
+
+    Crawl → chunk → embed → index run as a pipeline: pages are consumed as
+    the crawler yields them, embedding batches are encoded on a worker
+    while crawling continues, and raw pages and chunk texts are streamed
+    to disk (the chunk store is written as chunks are cut, BM25 is built
+    from the mapped store). Bounded queues between the stages apply
+    backpressure to the crawler. What stays in memory per chunk is the
+    vector in the FAISS index and a few bytes of chunk-store columns.
+
+    ``progress(phase, pages_done=None, chunks_done=None)`` is called as the
+    build moves through crawling / embedding / saving.
+    """
     url_str = str(url)
     kb_id = generate_kb_id(url_str)
-    
+
     # Get storage backend (S3 or local)
     storage = get_storage_backend()
 
-    # 🔁 Force refresh
-    if force_refresh and storage.kb_exists(kb_id):
-        storage.delete_kb(kb_id)
-
-    # ♻️ Reuse KB
+    # ♻️ Reuse KB (a forced refresh publishes a new version; the current
+    # one keeps serving until the rebuild is saved)
     if not force_refresh and storage.kb_exists(kb_id):
         return {
             "status": "exists",
@@ -40,77 +207,314 @@ def crawl_and_build_kb(url, force_refresh: bool = False):
         chunk_overlap=100
     )
 
-    embedder = SentenceTransformer("all-MiniLM-L6-v2")
+    embedder = get_cached_embedder()
+    index_writer = IndexWriter()
 
-    faiss_index = None
-    metadatas = []
-    texts = []
+    page_index = {}
     total_chunks = 0
+    pages_done = 0
+    crawling = True
 
-    # 1️⃣ Crawl website (already optimized & parallel)
-    pages = crawl_website(url_str, max_depth=2)
+    def on_batch(embeddings, chunk_ids):
+        # Runs on the embedding worker as each batch completes
+        with timed("index_add"):
+            index_writer.add(embeddings, chunk_ids)
+        if progress:
+            progress(
+                "crawling" if crawling else "embedding",
+                chunks_done=pipeline.chunks_embedded + len(chunk_ids)
+            )
 
-    if not pages:
-        return {
-            "status": "failed",
-            "kb_id": kb_id,
-            "reason": "No pages could be crawled from the given URL."
-        }
+    pipeline = EmbeddingPipeline(embedder, on_batch)
+    fetch_stats = {}
 
-    # 2️⃣ Process pages immediately
-    for page in pages:
-        text = page.get("text", "")
-        url = page.get("url", "")
+    with RawPageSpool() as spool, tempfile.TemporaryDirectory() as build_dir, \
+            ChunkStoreWriter(os.path.join(build_dir, "chunks")) as chunk_writer:
+        # 1️⃣ Crawl website; pages stream in as they finish
+        if progress:
+            progress("crawling", pages_done=0)
+        try:
+            for page in iter_website(url_str, max_depth=2, stats=fetch_stats):
+                pages_done += 1
+                if progress:
+                    progress("crawling", pages_done=pages_done)
+                spool.write(raw_page(page))
 
-        if not text or len(text) < 400:
-            continue
+                # 2️⃣ Chunk immediately; embedding batches span pages
+                text = page.get("text", "")
+                page_url = page.get("url", "")
 
-        chunks = splitter.split_text(text)
-        if not chunks:
-            continue
+                chunks = []
+                if text and len(text) >= 400:
+                    with timed("chunk"):
+                        chunks = splitter.split_text(text)
 
-        embeddings = embedder.encode(chunks, show_progress_bar=False)
-        embeddings = np.array(embeddings).astype("float32")
+                chunk_ids = list(range(total_chunks, total_chunks + len(chunks)))
+                chunk_writer.add(chunks, [page_url] * len(chunks), chunk_ids)
+                page_index[page_url] = page_index_entry(page, chunk_ids)
+                total_chunks += len(chunks)
 
-        # Lazy FAISS init
-        if faiss_index is None:
-            dim = embeddings.shape[1]
-            faiss_index = faiss.IndexFlatL2(dim)
+                if chunks:
+                    pipeline.add(chunks, chunk_ids)
+        finally:
+            crawling = False
+            if progress:
+                progress("embedding")
+            pipeline.close()
+            spool.close()
 
-        faiss_index.add(embeddings)
+        if pages_done == 0:
+            return {
+                "status": "failed",
+                "kb_id": kb_id,
+                "reason": "No pages could be crawled from the given URL.",
+                "fetch_stats": fetch_stats
+            }
 
-        for chunk in chunks:
-            metadatas.append({"source": url})
-            texts.append(chunk)
+        # ❌ No usable content
+        faiss_index = index_writer.index
+        if faiss_index is None or total_chunks == 0:
+            return {
+                "status": "failed",
+                "kb_id": kb_id,
+                "reason": "Crawled pages but no meaningful text was found.",
+                "fetch_stats": fetch_stats
+            }
 
-        total_chunks += len(chunks)
+        if progress:
+            progress("saving")
 
-    # ❌ No usable content
-    if faiss_index is None or total_chunks == 0:
-        return {
-            "status": "failed",
-            "kb_id": kb_id,
-            "reason": "Crawled pages but no meaningful text was found."
-        }
-
-    # 3️⃣ Persist FAISS + metadata using storage backend
-    metadata_dict = {"texts": texts, "metadatas": metadatas}
-    storage.save_kb(kb_id, faiss_index, metadata_dict, raw_pages=pages)
+        # 3️⃣ Persist FAISS + chunk store using storage backend
+        faiss_index = finalize_index(faiss_index)
+        chunk_store = chunk_writer.close(info={"index": index_info(faiss_index)})
+        storage.save_kb(
+            kb_id,
+            faiss_index,
+            chunk_store,
+            extra_files={
+                RAW_PAGES_FILE: spool.path,
+                PAGE_INDEX_FILE: json.dumps(page_index).encode("utf-8"),
+                **bm25_files(os.path.join(build_dir, "bm25"), chunk_store),
+            }
+        )
+    kb_cache.invalidate(kb_id)
+    answer_cache.invalidate(kb_id)
+    kb_catalog.update(kb_id, storage)
 
     return {
         "status": "success",
         "kb_id": kb_id,
-        "pages_crawled": len(pages),
-        "chunks_created": total_chunks
+        "pages_crawled": pages_done,
+        "chunks_created": total_chunks,
+        "index_type": index_type_of(faiss_index),
+        "fetch_stats": fetch_stats,
+        "embedding_cache": embedder.stats()
     }
 
 
-def update_knowledge_base(url):
+@with_timings
+def update_knowledge_base(url, incremental: bool = True, progress: Optional[Callable] = None):
     """
-    Force refresh KB for an existing website
+    Refresh KB for an existing website.
+
+    Incremental mode re-crawls (conditionally, using stored ETag /
+    Last-Modified), then only re-embeds pages whose content hash changed,
+    removes vectors of pages that disappeared and keeps everything else.
+    Falls back to a full rebuild for KBs without a page index or with a
+    positional (non ID-mapped) FAISS index.
     """
-    return crawl_and_build_kb(
-        url=url,
-        force_refresh=True
+    url_str = str(url)
+    kb_id = generate_kb_id(url_str)
+    storage = get_storage_backend()
+
+    if not incremental or not storage.kb_exists(kb_id):
+        return crawl_and_build_kb(url=url, force_refresh=True, progress=progress)
+
+    old_page_index = load_json_file(storage, kb_id, PAGE_INDEX_FILE)
+    # Heap copy: mapped indexes are read-only and can't add / remove ids
+    faiss_index, chunk_store = storage.load_kb(kb_id, load_mode=LOAD_HEAP)
+    if (
+        old_page_index is None
+        or not isinstance(faiss_index, (faiss.IndexIDMap, faiss.IndexIDMap2))
+    ):
+        log_event("kb_full_rebuild", logging.WARNING, kb_id=kb_id, reason="predates incremental updates")
+        return crawl_and_build_kb(url=url, force_refresh=True, progress=progress)
+    data = chunk_store.to_metadata()
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=600,
+        chunk_overlap=100
     )
 
+    embedder = get_cached_embedder()
+    faiss_index = flat_working_index(faiss_index, data, embedder)
+    index_writer = IndexWriter(faiss_index)
+    crawling = True
+
+    def on_batch(embeddings, chunk_ids):
+        with timed("index_add"):
+            index_writer.add(embeddings, chunk_ids)
+        if progress:
+            progress(
+                "crawling" if crawling else "embedding",
+                chunks_done=pipeline.chunks_embedded + len(chunk_ids)
+            )
+
+    pipeline = EmbeddingPipeline(embedder, on_batch)
+
+    page_index = {}
+    not_modified_urls = set()
+    remove_ids = []
+    new_texts = []
+    new_metadatas = []
+    new_ids = []
+    next_id = max(data["ids"], default=-1) + 1
+    pages_done = unchanged = changed = added = 0
+    fetch_stats = {}
+
+    with RawPageSpool() as spool:
+        # 1️⃣ Conditional re-crawl, diffing pages as they arrive
+        if progress:
+            progress("crawling", pages_done=0)
+        try:
+            for page in iter_website(
+                url_str,
+                max_depth=2,
+                stats=fetch_stats,
+                known_pages=old_page_index
+            ):
+                pages_done += 1
+                if progress:
+                    progress("crawling", pages_done=pages_done)
+
+                page_url = page["url"]
+                old_entry = old_page_index.get(page_url)
+
+                if page.get("not_modified") and old_entry is not None:
+                    page_index[page_url] = old_entry
+                    not_modified_urls.add(page_url)
+                    unchanged += 1
+                    continue
+
+                spool.write(raw_page(page))
+                content_hash = page_hash(page.get("text", ""))
+                if old_entry is not None and old_entry["hash"] == content_hash:
+                    # Same content, refresh validators / links only
+                    page_index[page_url] = page_index_entry(page, old_entry["chunk_ids"], content_hash)
+                    unchanged += 1
+                    continue
+
+                if old_entry is not None:
+                    remove_ids.extend(old_entry["chunk_ids"])
+                    changed += 1
+                else:
+                    added += 1
+
+                # 2️⃣ Embed only new / changed chunks
+                text = page.get("text", "")
+                chunks = []
+                if text and len(text) >= 400:
+                    with timed("chunk"):
+                        chunks = splitter.split_text(text)
+
+                chunk_ids = list(range(next_id, next_id + len(chunks)))
+                next_id += len(chunks)
+                page_index[page_url] = page_index_entry(page, chunk_ids, content_hash)
+                for chunk in chunks:
+                    new_texts.append(chunk)
+                    new_metadatas.append({"source": page_url})
+                new_ids.extend(chunk_ids)
+
+                if chunks:
+                    pipeline.add(chunks, chunk_ids)
+        finally:
+            crawling = False
+            if progress:
+                progress("embedding")
+            pipeline.close()
+
+        if pages_done == 0:
+            # Leave the existing KB untouched
+            return {
+                "status": "failed",
+                "kb_id": kb_id,
+                "reason": "No pages could be crawled from the given URL.",
+                "fetch_stats": fetch_stats
+            }
+
+        # Carry over raw text of 304 pages from the previous crawl
+        if not_modified_urls:
+            for old_page in iter_raw_pages(storage, kb_id):
+                if old_page.get("url") in not_modified_urls:
+                    spool.write(old_page)
+        spool.close()
+
+        removed_pages = [u for u in old_page_index if u not in page_index]
+        for page_url in removed_pages:
+            remove_ids.extend(old_page_index[page_url]["chunk_ids"])
+
+        # 3️⃣ Apply removals
+        if remove_ids:
+            faiss_index.remove_ids(np.array(remove_ids, dtype="int64"))
+            removed = set(remove_ids)
+            keep = [i for i, chunk_id in enumerate(data["ids"]) if chunk_id not in removed]
+            texts = [data["texts"][i] for i in keep]
+            metadatas = [data["metadatas"][i] for i in keep]
+            ids = [data["ids"][i] for i in keep]
+        else:
+            texts = list(data["texts"])
+            metadatas = list(data["metadatas"])
+            ids = list(data["ids"])
+
+        texts.extend(new_texts)
+        metadatas.extend(new_metadatas)
+        ids.extend(new_ids)
+
+        if faiss_index.ntotal == 0:
+            return {
+                "status": "failed",
+                "kb_id": kb_id,
+                "reason": "Crawled pages but no meaningful text was found.",
+                "fetch_stats": fetch_stats
+            }
+
+        # 4️⃣ Persist
+        if progress:
+            progress("saving")
+
+        faiss_index = finalize_index(faiss_index)
+        metadata_dict = {
+            "texts": texts,
+            "metadatas": metadatas,
+            "ids": ids,
+            "index": index_info(faiss_index),
+        }
+        with tempfile.TemporaryDirectory() as bm25_dir:
+            storage.save_kb(
+                kb_id,
+                faiss_index,
+                metadata_dict,
+                extra_files={
+                    RAW_PAGES_FILE: spool.path,
+                    PAGE_INDEX_FILE: json.dumps(page_index).encode("utf-8"),
+                    **bm25_files(bm25_dir, texts, ids),
+                }
+            )
+    kb_cache.invalidate(kb_id)
+    answer_cache.invalidate(kb_id)
+    kb_catalog.update(kb_id, storage)
+
+    return {
+        "status": "success",
+        "kb_id": kb_id,
+        "pages_crawled": pages_done,
+        "chunks_created": len(texts),
+        "pages_unchanged": unchanged,
+        "pages_changed": changed,
+        "pages_added": added,
+        "pages_removed": len(removed_pages),
+        "chunks_reembedded": len(new_texts),
+        "index_type": index_type_of(faiss_index),
+        "fetch_stats": fetch_stats,
+        "embedding_cache": embedder.stats()
+    }
@@ -0,0 +1,111 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from core.jobs.job_store import JobStore
+from services.crawl_service import crawl_and_build_kb, update_knowledge_base
+from utils.executors import get_executor
+from utils.url_hash import generate_kb_id
+from utils.metrics import log_event
+
+
+class JobManager:
+    """
+    Runs crawl / KB update jobs on the bounded crawl pool
+    (CRAWL_MAX_CONCURRENCY). Submissions for a KB that already has a
+    queued/running job of either kind (in any process sharing the job
+    store) coalesce onto that job instead of starting a second crawl.
+    """
+
+    def __init__(self, store: Optional[JobStore] = None):
+        self.store = store or JobStore()
+
+    def submit_crawl(self, url: str, force_refresh: bool = False) -> Dict[str, Any]:
+        return self._submit(url, crawl_and_build_kb, force_refresh=force_refresh)
+
+    def submit_update(self, url: str, incremental: bool = True) -> Dict[str, Any]:
+        return self._submit(url, update_knowledge_base, incremental=incremental)
+
+    def _submit(self, url: str, build: Callable, **options) -> Dict[str, Any]:
+        url_str = str(url)
+        kb_id = generate_kb_id(url_str)
+
+        job, created = self.store.create(kb_id, url_str)
+        if not created:
+            return job
+
+        get_executor("crawl").submit(self._run, job["id"], build, url_str, options)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    def _run(self, job_id: str, build: Callable, url: str, options: Dict[str, Any]) -> None:
+        self.store.update(job_id, status="running", started_at=time.time())
+
+        def progress(phase: str, pages_done: Optional[int] = None, chunks_done: Optional[int] = None):
+            fields = {"phase": phase}
+            if pages_done is not None:
+                fields["pages_done"] = pages_done
+            if chunks_done is not None:
+                fields["chunks_done"] = chunks_done
+            self.store.update(job_id, **fields)
+
+        try:
+            result = build(url, progress=progress, **options)
+        except Exception as e:
+            log_event("job_failed", logging.ERROR, job_id=job_id, error=str(e))
+            self.store.update(
+                job_id,
+                status="failed",
+                phase="done",
+                error=str(e),
+                finished_at=time.time()
+            )
+            return
+
+        self.store.update(
+            job_id,
+            status="failed" if result.get("status") == "failed" else "completed",
+            phase="done",
+            result=result,
+            error=result.get("reason"),
+            finished_at=time.time()
+        )
+
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = JobManager()
+    return _manager
+
+
+def job_status(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a stored job row for the API"""
+    started = job.get("started_at")
+    finished = job.get("finished_at")
+    if started is None:
+        elapsed = 0.0
+    else:
+        elapsed = (finished or time.time()) - started
+
+    return {
+        "job_id": job["id"],
+        "kb_id": job["kb_id"],
+        "url": job["url"],
+        "status": job["status"],
+        "phase": job["phase"],
+        "pages_done": job["pages_done"] or 0,
+        "chunks_done": job["chunks_done"] or 0,
+        "elapsed_seconds": round(elapsed, 3),
+        "result": job.get("result"),
+        "error": job.get("error"),
+    }
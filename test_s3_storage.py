@@ -0,0 +1,213 @@
+"""
+S3 storage backend against a local S3 stand-in (moto, no AWS needed):
+compressed artifacts + manifest, conditional revalidation that only
+re-fetches changed artifacts, versioned publishing (pointer swap, cache
+reload, grace-period GC), legacy (plain object) KBs and the bounded LRU
+cache directory.
+
+    pip install moto
+    python test_s3_storage.py
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ["S3_BUCKET_NAME"] = "rag-test-bucket"
+os.environ["S3_REVALIDATE_SECONDS"] = "0"
+
+import numpy as np
+import zstandard
+from moto import mock_aws
+
+from core.kb.chunk_store import CHUNK_STORE_FILES, ChunkStore
+from core.kb.index_factory import INDEX_FLAT, build_index, index_info, write_index
+from core.rag.registry import KBCache
+from core.storage.s3_storage import MANIFEST_FILE, S3Storage
+
+
+def make_kb(num_chunks: int = 500, dim: int = 32, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((num_chunks, dim)).astype("float32")
+    ids = np.arange(num_chunks, dtype="int64")
+    index = build_index(vectors, ids, INDEX_FLAT)
+    metadata = {
+        "texts": [f"chunk {i} " + "lorem ipsum dolor sit amet " * 10 for i in range(num_chunks)],
+        "metadatas": [{"source": f"https://example.com/page{i // 10}"} for i in range(num_chunks)],
+        "ids": ids.tolist(),
+        "index": index_info(index),
+    }
+    return index, metadata
+
+
+def storage_with_cache(cache_dir: str) -> S3Storage:
+    os.environ["S3_CACHE_DIR"] = cache_dir
+    storage = S3Storage()
+    storage.calls = []
+    storage.s3_client.meta.events.register(
+        "before-call.s3.*",
+        lambda model, **kwargs: storage.calls.append(model.name)
+    )
+    return storage
+
+
+def count(storage: S3Storage, operation: str) -> int:
+    return storage.calls.count(operation)
+
+
+def list_keys(storage: S3Storage, prefix: str):
+    return {
+        obj["Key"] for obj in
+        storage.s3_client.list_objects_v2(Bucket=storage.bucket_name, Prefix=prefix).get("Contents", [])
+    }
+
+
+def run():
+    with mock_aws(), tempfile.TemporaryDirectory() as tmp:
+        import boto3
+        boto3.client("s3").create_bucket(Bucket=os.environ["S3_BUCKET_NAME"])
+
+        writer = storage_with_cache(f"{tmp}/writer")
+        reader = storage_with_cache(f"{tmp}/reader")
+        index, metadata = make_kb()
+
+        print("🧪 Save: compressed artifacts under a version prefix + manifest")
+        writer.save_kb("kb1", index, metadata, extra_files={"page_index.json": b'{"v": 1}'})
+        first_version = writer.current_version("kb1")
+        keys = list_keys(writer, "kb1/")
+        assert f"kb1/{MANIFEST_FILE}" in keys
+        assert f"kb1/versions/{first_version}/faiss.index.zst" in keys and "kb1/faiss.index" not in keys
+        assert f"kb1/versions/{first_version}/page_index.json.zst" in keys
+        assert writer.kb_exists("kb1") and not writer.kb_exists("nope")
+        assert not (Path(tmp) / "writer" / "nope").exists()
+        info = reader.describe_kb("kb1")
+        assert (info["version"], info["vectors"], info["dim"]) == (first_version, 500, 32)
+        print(f"✅ {len(keys)} objects, all artifacts zstd-compressed")
+
+        print("\n🧪 Cold load from another instance")
+        loaded_index, chunk_store = reader.load_kb("kb1")
+        assert loaded_index.ntotal == 500 and len(chunk_store) == 500
+        assert chunk_store.text(42) == metadata["texts"][42]
+        assert reader.load_file("kb1", "page_index.json") == b'{"v": 1}'
+        assert reader.get_file_path("kb1", "missing.json") is None
+        print(f"✅ Loaded; {count(reader, 'GetObject')} GetObject calls")
+
+        print("\n🧪 Warm load: conditional GET, no downloads")
+        reader.calls.clear()
+        reader.load_kb("kb1")
+        assert count(reader, "GetObject") == 1, reader.calls  # manifest -> 304
+        assert count(reader, "HeadObject") == 0, reader.calls
+        state_file = Path(tmp) / "reader" / "kb1" / ".cache_state.json"
+        written = state_file.stat().st_mtime_ns
+        reader.current_version("kb1")
+        assert state_file.stat().st_mtime_ns == written  # 304: cache state not rewritten
+        print(f"✅ Revalidated with {reader.calls}")
+
+        print("\n🧪 Rebuild elsewhere: only changed artifacts re-fetched")
+        writer.save_kb("kb1", index, metadata, extra_files={"page_index.json": b'{"v": 2}'})
+        reader.calls.clear()
+        assert reader.load_file("kb1", "page_index.json") == b'{"v": 2}'
+        reader.load_kb("kb1")
+        # Manifest (200, then 304) + page_index.json only: index / chunk store unchanged
+        assert count(reader, "GetObject") == 3, reader.calls
+        assert count(reader, "HeadObject") == 1, reader.calls
+        print(f"✅ {reader.calls}")
+
+        new_index, new_metadata = make_kb(seed=1)
+        new_metadata["texts"][0] = "rebuilt chunk"
+        writer.save_kb("kb1", new_index, new_metadata)
+        _, chunk_store = reader.load_kb("kb1")
+        assert chunk_store.text(0) == "rebuilt chunk"
+        assert reader.get_file_path("kb1", "page_index.json") is None
+        print("✅ Stale cache replaced after rebuild")
+
+        print("\n🧪 Versions: pointer swap, cache reload, grace-period GC")
+        kb_cache = KBCache(max_bytes=1 << 30)
+        _, before = kb_cache.get("kb1", reader)
+        writer.save_kb("kb1", index, metadata)
+        _, after = kb_cache.get("kb1", reader)
+        assert after.version == writer.current_version("kb1") != before.version
+        assert kb_cache.stats()["reloads"] == 1
+        versions = {key.split("/")[2] for key in list_keys(writer, "kb1/versions/")}
+        assert len(versions) == 4 and first_version in versions  # superseded ones still in grace
+        writer.s3_client.put_object(Bucket=writer.bucket_name, Key="kb1/versions/crashed/faiss.index.zst", Body=b"")
+        os.environ["KB_VERSION_GRACE_SECONDS"] = "0"
+        writer.save_kb("kb1", index, metadata)
+        del os.environ["KB_VERSION_GRACE_SECONDS"]
+        versions = {key.split("/")[2] for key in list_keys(writer, "kb1/versions/")}
+        assert versions == {writer.current_version("kb1")}, versions
+        _, chunk_store = reader.load_kb("kb1")
+        assert len(chunk_store) == 500 and chunk_store.version == writer.current_version("kb1")
+        print(f"✅ Reloaded after publish, {len(versions)} version left after GC")
+
+        print("\n🧪 Legacy KB (plain objects, no manifest)")
+        legacy_dir = Path(tmp) / "legacy"
+        legacy_dir.mkdir()
+        write_index(index, legacy_dir / "faiss.index")
+        ChunkStore.write_metadata(legacy_dir, metadata)
+        for filename in ["faiss.index", *CHUNK_STORE_FILES]:
+            writer.s3_client.upload_file(str(legacy_dir / filename), writer.bucket_name, f"legacy/{filename}")
+        assert reader.kb_exists("legacy") and reader.current_version("legacy") == "legacy"
+        assert reader.list_kbs() == ["kb1", "legacy"]
+        assert reader.describe_kb("legacy")["version"] == "legacy"
+        _, chunk_store = reader.load_kb("legacy")
+        assert len(chunk_store) == 500
+        print("✅ Legacy KB loaded")
+
+        print("\n🧪 Legacy KB republished: root objects kept through the grace period")
+        writer.save_kb("legacy-copy", index, metadata)
+        for filename in ["faiss.index", *CHUNK_STORE_FILES]:
+            writer.s3_client.upload_file(str(legacy_dir / filename), writer.bucket_name, f"legacy-copy/{filename}")
+        writer.s3_client.delete_object(Bucket=writer.bucket_name, Key=f"legacy-copy/{MANIFEST_FILE}")
+        writer.save_kb("legacy-copy", index, metadata)
+        assert "legacy-copy/faiss.index" in list_keys(writer, "legacy-copy/")
+        os.environ["KB_VERSION_GRACE_SECONDS"] = "0"
+        writer.save_kb("legacy-copy", index, metadata)
+        del os.environ["KB_VERSION_GRACE_SECONDS"]
+        assert "legacy-copy/faiss.index" not in list_keys(writer, "legacy-copy/")
+        _, chunk_store = reader.load_kb("legacy-copy")
+        assert len(chunk_store) == 500
+        print("✅ Root objects removed once the grace period passed")
+
+        print("\n🧪 Tampered artifact: rejected before it reaches the cache")
+        writer.save_kb("tampered", index, metadata, extra_files={"page_index.json": b'{"v": 1}'})
+        version = writer.current_version("tampered")
+        writer.s3_client.put_object(
+            Bucket=writer.bucket_name,
+            Key=f"tampered/versions/{version}/page_index.json.zst",
+            Body=zstandard.ZstdCompressor().compress(b'{"v": 666}')
+        )
+        fresh = storage_with_cache(f"{tmp}/fresh")
+        try:
+            fresh.load_file("tampered", "page_index.json")
+            raise AssertionError("checksum mismatch not detected")
+        except ValueError:
+            pass
+        assert not (Path(tmp) / "fresh" / "tampered" / version / "page_index.json").exists()
+        print("✅ Mismatching download discarded")
+
+        print("\n🧪 Bounded cache: least recently used KB evicted")
+        bounded = storage_with_cache(f"{tmp}/bounded")
+        bounded.load_kb("kb1")
+        os.utime(Path(tmp) / "bounded" / "kb1", (0, 0))
+        bounded.cache_max_bytes = 1
+        bounded.load_kb("legacy")
+        assert not (Path(tmp) / "bounded" / "kb1").exists()
+        assert (Path(tmp) / "bounded" / "legacy" / "legacy" / "faiss.index").exists()
+        print("✅ kb1 evicted, legacy kept")
+
+        reader.delete_kb("kb1")
+        assert not reader.kb_exists("kb1")
+
+    print("\n✅ All S3 storage tests passed!")
+
+
+def test_s3_storage():
+    run()
+
+
+if __name__ == "__main__":
+    run()
@@ -24,12 +24,12 @@ if kbs:
     test_kb = kbs[0]
     print(f"\n🔍 Testing load of KB: {test_kb}")
     try:
-        index, metadata = storage.load_kb(test_kb)
+        index, chunk_store = storage.load_kb(test_kb)
         print(f"✅ Successfully loaded KB!")
         print(f"   - FAISS index dimension: {index.d}")
         print(f"   - Number of vectors: {index.ntotal}")
-        print(f"   - Number of chunks: {len(metadata.get('texts', []))}")
-        print(f"   - Number of metadatas: {len(metadata.get('metadatas', []))}")
+        print(f"   - Number of chunks: {len(chunk_store)}")
+        print(f"   - Number of sources: {len(chunk_store.sources)}")
     except Exception as e:
         print(f"❌ Error loading KB: {e}")
 else:
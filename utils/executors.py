@@ -0,0 +1,63 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+# Bounded worker pools per operation type so a burst of one kind of work
+# (e.g. crawls) cannot starve the others (e.g. chat retrieval).
+_POOL_SIZES = {
+    "retrieval": int(os.getenv("RETRIEVAL_MAX_WORKERS", "4")),
+    "io": int(os.getenv("IO_MAX_WORKERS", "8")),
+    "crawl": int(os.getenv("CRAWL_MAX_CONCURRENCY", "2")),
+}
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+_llm_semaphore = None
+
+
+def get_executor(kind: str) -> ThreadPoolExecutor:
+    """Return the shared executor for an operation type"""
+    executor = _executors.get(kind)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(kind)
+            if executor is None:
+                if kind not in _POOL_SIZES:
+                    raise ValueError(f"Unknown executor kind: {kind}")
+                executor = ThreadPoolExecutor(
+                    max_workers=_POOL_SIZES[kind],
+                    thread_name_prefix=f"{kind}-worker"
+                )
+                _executors[kind] = executor
+    return executor
+
+
+async def run_blocking(kind: str, fn: Callable, *args, **kwargs) -> Any:
+    """Run a blocking callable on the executor for ``kind`` without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    # Carry context vars (e.g. per-request stage timings) into the worker, like asyncio.to_thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_executor(kind),
+        functools.partial(context.run, fn, *args, **kwargs)
+    )
+
+
+def llm_semaphore() -> asyncio.Semaphore:
+    """Caps the number of in-flight LLM calls per process"""
+    global _llm_semaphore
+    if _llm_semaphore is None:
+        _llm_semaphore = asyncio.Semaphore(int(os.getenv("LLM_MAX_CONCURRENCY", "16")))
+    return _llm_semaphore
+
+
+def shutdown_executors() -> None:
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        _executors.clear()
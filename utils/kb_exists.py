@@ -1,8 +1,22 @@
+import json
 import os
 
+from core.kb.chunk_store import LEGACY_METADATA_FILE, META_FILE
+from core.storage.versions import POINTER_FILE, VERSIONS_DIR
+
 
 def kb_exists(kb_dir: str) -> bool:
+    # Versioned KBs: the pointer names the live version directory
+    try:
+        with open(os.path.join(kb_dir, POINTER_FILE), "r", encoding="utf-8") as f:
+            kb_dir = os.path.join(kb_dir, VERSIONS_DIR, json.load(f)["version"])
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+
     index_path = os.path.join(kb_dir, "faiss.index")
-    meta_path = os.path.join(kb_dir, "metadata.pkl")
+    meta_path = os.path.join(kb_dir, META_FILE)
+    legacy_meta_path = os.path.join(kb_dir, LEGACY_METADATA_FILE)
 
-    return os.path.exists(index_path) and os.path.exists(meta_path)
+    return os.path.exists(index_path) and (
+        os.path.exists(meta_path) or os.path.exists(legacy_meta_path)
+    )
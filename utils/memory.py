@@ -0,0 +1,72 @@
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+_SMAPS_FIELDS = {
+    "Rss": "rss_bytes",
+    "Pss": "pss_bytes",
+    "Shared_Clean": "shared_bytes",
+    "Shared_Dirty": "shared_bytes",
+    "Private_Clean": "private_bytes",
+    "Private_Dirty": "private_bytes",
+}
+
+
+def _empty_usage() -> Dict[str, int]:
+    return {"rss_bytes": 0, "pss_bytes": 0, "shared_bytes": 0, "private_bytes": 0}
+
+
+def read_smaps(smaps_path: str = "/proc/self/smaps") -> List[Tuple[str, Dict[str, int]]]:
+    """
+    (pathname, usage) for every file-backed mapping of this process.
+    Pss divides shared pages among the processes mapping them, so N workers
+    sharing one KB each report ~1/N of its Rss. Empty off Linux.
+    """
+    if not Path(smaps_path).exists():
+        return []
+
+    mappings = []
+    current = None
+    with open(smaps_path, "r") as f:
+        for line in f:
+            fields = line.split()
+            if not fields:
+                continue
+            if not fields[0].endswith(":"):
+                # Mapping header: address perms offset dev inode [pathname]
+                current = None
+                if len(fields) >= 6 and fields[5].startswith("/"):
+                    current = _empty_usage()
+                    mappings.append((" ".join(fields[5:]), current))
+            elif current is not None:
+                key = _SMAPS_FIELDS.get(fields[0][:-1])
+                if key:
+                    current[key] += int(fields[1]) * 1024
+    return mappings
+
+
+def mapped_usage(
+    mappings: List[Tuple[str, Dict[str, int]]],
+    prefixes: Iterable[str],
+) -> Dict[str, int]:
+    """Summed usage of the mappings whose path starts with any of prefixes"""
+    prefixes = tuple(str(p) for p in prefixes)
+    usage = _empty_usage()
+    for path, mapping_usage in mappings:
+        if prefixes and path.startswith(prefixes):
+            for key, value in mapping_usage.items():
+                usage[key] += value
+    return usage
+
+
+def process_memory(rollup_path: str = "/proc/self/smaps_rollup") -> Dict[str, int]:
+    """Whole-process Rss / Pss / anonymous bytes (empty off Linux)"""
+    if not Path(rollup_path).exists():
+        return {}
+    fields = {"Rss": "rss_bytes", "Pss": "pss_bytes", "Anonymous": "anonymous_bytes"}
+    usage = {}
+    with open(rollup_path, "r") as f:
+        for line in f:
+            parts = line.split()
+            if parts and parts[0][:-1] in fields:
+                usage[fields[parts[0][:-1]]] = int(parts[1]) * 1024
+    return usage
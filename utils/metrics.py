@@ -0,0 +1,197 @@
+import bisect
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Per-stage latency histograms and counters, exported in the Prometheus
+# text format (GET /metrics). Values are per process: with several
+# workers, scrape each one or aggregate with sum() in PromQL.
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [(name, value) for name, value in zip(names, values) if value != ""]
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values (thread-safe)"""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][position] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(values, list(counts), total) for values, (counts, total) in self._series.items()]
+        for values, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, values, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, values)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, values)} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by label values (thread-safe)"""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labelvalues, value in values:
+            lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {value}")
+        return lines
+
+
+_registry: list = []
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    return "\n".join(line for metric in _registry for line in metric.render()) + "\n"
+
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_duration_seconds",
+    "Latency of crawl / indexing / chat pipeline stages",
+    ("stage", "backend"),
+)
+LOG_EVENTS = Counter("rag_log_events_total", "Structured log events", ("level", "event"))
+
+
+# ----------------------------
+# Stage timers
+# ----------------------------
+class _Collector:
+    """Per-request ``<stage>_ms`` totals; written from several threads during a crawl"""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        key = f"{stage}_ms"
+        with self.lock:
+            self.timings[key] = round(self.timings.get(key, 0.0) + seconds * 1000, 3)
+
+
+# Collector of the current request / crawl, when someone is collecting timings
+_collector: "contextvars.ContextVar[Optional[_Collector]]" = contextvars.ContextVar(
+    "rag_timings", default=None
+)
+
+
+@contextmanager
+def collect_timings() -> Iterator[Dict[str, float]]:
+    """
+    Collect ``<stage>_ms`` totals of the stages observed in this context
+    (threads started through run_blocking / context-copying workers
+    included) into the yielded dict.
+    """
+    collector = _Collector()
+    token = _collector.set(collector)
+    try:
+        yield collector.timings
+    finally:
+        _collector.reset(token)
+
+
+def observe(stage: str, seconds: float, backend: str = "") -> None:
+    """Record a stage duration (histogram + the collecting request, if any)"""
+    STAGE_SECONDS.observe(seconds, stage, backend)
+    collector = _collector.get()
+    if collector is not None:
+        collector.add(stage, seconds)
+
+
+@contextmanager
+def timed(stage: str, backend: str = "") -> Iterator[None]:
+    """Time a block (or, as a decorator, a function) as ``stage``"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started, backend)
+
+
+# ----------------------------
+# Structured logs
+# ----------------------------
+class _JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps({
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+            **getattr(record, "fields", {}),
+        }, default=str)
+
+
+def get_logger() -> logging.Logger:
+    """JSON-lines logger (one object per event) at LOG_LEVEL"""
+    logger = logging.getLogger("rag")
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(_JsonFormatter())
+        logger.addHandler(handler)
+        logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+        logger.propagate = False
+    return logger
+
+
+def log_event(event: str, level: int = logging.INFO, **fields) -> None:
+    """Structured log line ``{"event": ..., **fields}``, also counted in /metrics"""
+    log = get_logger()
+    if log.isEnabledFor(level):
+        LOG_EVENTS.inc(logging.getLevelName(level).lower(), event)
+        log.log(level, event, extra={"fields": fields})
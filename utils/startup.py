@@ -0,0 +1,130 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from utils.metrics import log_event
+
+# lazy: heavy modules (faiss, torch / sentence-transformers, playwright,
+#       langchain, boto3) are imported when a subsystem is first used.
+# warm: the same work is done in the background right after startup, and
+#       /ready reports when the embedder and the hot KBs are loaded.
+STARTUP_MODES = ("lazy", "warm")
+
+
+def startup_mode() -> str:
+    mode = os.getenv("STARTUP_MODE", "lazy").lower()
+    if mode not in STARTUP_MODES:
+        log_event("startup_mode_unknown", logging.WARNING, mode=mode, fallback="lazy")
+        return "lazy"
+    return mode
+
+
+def warm_kb_ids() -> List[str]:
+    """Hot KBs to preload in warm mode (WARM_KB_IDS, comma separated)"""
+    return [kb_id.strip() for kb_id in os.getenv("WARM_KB_IDS", "").split(",") if kb_id.strip()]
+
+
+class Startup:
+    """
+    Startup lifecycle and readiness. In warm mode ``warm_up`` runs each
+    preload step on a background thread and records its duration; the
+    process is ready once every step has finished without error. Lazy
+    mode has nothing to preload and is ready immediately.
+    """
+
+    def __init__(self):
+        self.mode = "lazy"
+        self.started = time.monotonic()
+        self.finished = False
+        self.steps: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def begin(self, mode: str) -> None:
+        self.mode = mode
+        self.started = time.monotonic()
+        if mode == "warm":
+            threading.Thread(target=self.warm_up, name="warm-up", daemon=True).start()
+        else:
+            self.finished = True
+
+    def _step(self, name: str, fn: Callable[[], Any]) -> None:
+        started = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            with self._lock:
+                self.errors[name] = str(e)
+            log_event("warm_up_step_failed", logging.ERROR, step=name, error=str(e))
+        finally:
+            with self._lock:
+                self.steps[name] = round(time.perf_counter() - started, 3)
+
+    def warm_up(self) -> None:
+        """Import the serving stack, load models and hot KBs (blocking)"""
+        log_event("warm_up_started")
+        try:
+            self._step("imports", _import_services)
+            self._step("embedder", _load_embedder)
+            self._step("llm_client", _create_llm)
+            self._step("catalog", _refresh_catalog)
+            for kb_id in warm_kb_ids():
+                self._step(f"kb:{kb_id}", lambda kb_id=kb_id: _load_kb(kb_id))
+            if os.getenv("RERANK", "0") == "1":
+                self._step("reranker", _load_reranker)
+        finally:
+            self.finished = True
+            log_event("warm_up_finished", seconds=round(time.monotonic() - self.started, 3), errors=len(self.errors))
+
+    @property
+    def ready(self) -> bool:
+        return self.finished and not self.errors
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "status": "ready" if self.ready else ("failed" if self.finished else "warming"),
+                "mode": self.mode,
+                "seconds_since_start": round(time.monotonic() - self.started, 3),
+                "steps": dict(self.steps),
+                "errors": dict(self.errors),
+            }
+
+
+def _import_services() -> None:
+    import services.chat_service  # noqa: F401  faiss, numpy, RAG stack
+    import services.job_service  # noqa: F401  crawler, splitters
+
+
+def _load_embedder() -> None:
+    from core.rag.registry import get_embedder
+    get_embedder().encode(["warm up"], show_progress_bar=False)
+
+
+def _create_llm() -> None:
+    from core.rag.registry import get_llm
+    get_llm()
+
+
+def _refresh_catalog() -> None:
+    from core.kb.catalog import kb_catalog
+    kb_catalog.refresh()
+
+
+def _load_kb(kb_id: str) -> None:
+    from core.rag.registry import kb_cache
+    from utils.storage_factory import get_storage_backend
+
+    _, data = kb_cache.get(kb_id, get_storage_backend())
+    # Lexical index is opened lazily on the first hybrid query
+    data.bm25
+
+
+def _load_reranker() -> None:
+    from core.rag.registry import get_cross_encoder
+    get_cross_encoder()
+
+
+startup = Startup()
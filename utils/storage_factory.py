@@ -1,12 +1,18 @@
+import logging
 import os
-from typing import Union
-from core.storage.s3_storage import S3Storage
-from core.storage.local_storage import LocalStorage
+from typing import TYPE_CHECKING, Union
 
+from utils.metrics import log_event
 
-def get_storage_backend() -> Union[S3Storage, LocalStorage]:
+if TYPE_CHECKING:
+    from core.storage.s3_storage import S3Storage
+    from core.storage.local_storage import LocalStorage
+
+
+def get_storage_backend() -> Union["S3Storage", "LocalStorage"]:
     """
     Factory function to get the appropriate storage backend based on environment.
+    Backends are imported on first use (S3 pulls in boto3, local storage faiss).
     
     Returns:
         S3Storage or LocalStorage instance based on STORAGE_BACKEND env var
@@ -14,8 +20,10 @@ def get_storage_backend() -> Union[S3Storage, LocalStorage]:
     backend = os.getenv('STORAGE_BACKEND', 'local').lower()
     
     if backend == 's3':
-        print("🌐 Using S3 storage backend")
+        from core.storage.s3_storage import S3Storage
+        log_event("storage_backend", logging.DEBUG, backend="s3")
         return S3Storage()
     else:
-        print("💾 Using local storage backend")
+        from core.storage.local_storage import LocalStorage
+        log_event("storage_backend", logging.DEBUG, backend="local")
         return LocalStorage()